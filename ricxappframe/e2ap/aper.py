@@ -0,0 +1,177 @@
+# ==================================================================================
+#       Copyright (c) 2026 The O-RAN Software Community contributors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#          http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+# ==================================================================================
+"""
+Encodes, in aligned PER, the E2AP messages that the E2AP C library
+decodes but cannot encode: the RICindication and the
+RICsubscriptionResponse an E2 node sends. They serve to simulate E2
+nodes and to feed benchmarks and tests of the decoders.
+
+An E2AP-PDU is laid out as:
+
+  octet 0     CHOICE index in the upper three bits
+  octet 1     procedureCode
+  octet 2     criticality in the upper two bits
+  then        length determinant and the message, which is
+              an extension bit (one octet), the number of
+              protocol IEs (two octets) and the IEs, each with
+              id (two octets), criticality (one octet),
+              length determinant and value
+"""
+from typing import List, Optional
+
+# E2AP-PDU CHOICE index
+_INITIATING_MESSAGE = 0x00
+_SUCCESSFUL_OUTCOME = 0x20
+
+# criticality
+_REJECT = 0x00
+_IGNORE = 0x40
+
+# procedure codes
+_PROCEDURE_CODE_RIC_SUBSCRIPTION = 8
+_PROCEDURE_CODE_RIC_INDICATION = 5
+
+# protocol IE IDs
+_ID_RAN_FUNCTION_ID = 5
+_ID_RIC_ACTION_ADMITTED_ITEM = 14
+_ID_RIC_ACTION_ID = 15
+_ID_RIC_ACTION_ADMITTED = 17
+_ID_RIC_CALL_PROCESS_ID = 20
+_ID_RIC_INDICATION_HEADER = 25
+_ID_RIC_INDICATION_MESSAGE = 26
+_ID_RIC_INDICATION_SN = 27
+_ID_RIC_INDICATION_TYPE = 28
+_ID_RIC_REQUEST_ID = 29
+
+# maximum length this encoder writes without fragmentation
+_MAX_LENGTH = 16383
+
+
+def _length(length: int) -> bytes:
+    """
+    Returns an aligned PER length determinant.
+    """
+    if length < 0x80:
+        return bytes([length])
+    if length <= _MAX_LENGTH:
+        return bytes([0x80 | (length >> 8), length & 0xff])
+    raise ValueError("length {} needs fragmentation".format(length))
+
+
+def _uint16(value: int) -> bytes:
+    if not 0 <= value <= 0xffff:
+        raise ValueError("{} is out of range 0..65535".format(value))
+    return value.to_bytes(2, "big")
+
+
+def _ie(ie_id: int, value: bytes, criticality: int = _REJECT) -> bytes:
+    return _uint16(ie_id) + bytes([criticality]) + _length(len(value)) + value
+
+
+def _octet_string(value: bytes) -> bytes:
+    return _length(len(value)) + bytes(value)
+
+
+def _request_id(request_id: int, request_sequence_number: int) -> bytes:
+    # extension bit, then ricRequestorID and ricInstanceID
+    return b"\x00" + _uint16(request_id) + _uint16(request_sequence_number)
+
+
+def _pdu(choice: int, procedure_code: int, criticality: int, ies: List[bytes]) -> bytes:
+    message = b"\x00" + _uint16(len(ies)) + b"".join(ies)
+    return bytes([choice, procedure_code, criticality]) + _length(len(message)) + message
+
+
+def encode_indication(request_id: int, request_sequence_number: int, function_id: int, action_id: int,
+                      indication_sequence_number: Optional[int], indication_type: int,
+                      indication_header: bytes, indication_message: bytes,
+                      call_process_id: Optional[bytes] = None) -> bytes:
+    """
+    Function that returns the payload of an E2AP RICindication with the
+    fields of IndicationMsg.
+
+    Raise ValueError when a field is out of range.
+
+    Parameters
+    ----------
+    request_id: int
+    request_sequence_number: int
+    function_id: int
+        RAN function ID, 0..4095
+    action_id: int
+        0..255
+    indication_sequence_number: int
+        0..65535, or None to leave it out
+    indication_type: int
+        0 for report, 1 for insert
+    indication_header: bytes
+    indication_message: bytes
+    call_process_id: bytes (optional)
+
+    Returns
+    -------
+    bytes
+        RICindication type payload
+    """
+    if not 0 <= function_id <= 4095 or not 0 <= action_id <= 255 or indication_type not in (0, 1):
+        raise ValueError("RAN function ID, action ID or indication type is out of range")
+    ies = [_ie(_ID_RIC_REQUEST_ID, _request_id(request_id, request_sequence_number)),
+           _ie(_ID_RAN_FUNCTION_ID, _uint16(function_id)),
+           _ie(_ID_RIC_ACTION_ID, bytes([action_id]))]
+    if indication_sequence_number is not None:
+        ies.append(_ie(_ID_RIC_INDICATION_SN, _uint16(indication_sequence_number)))
+    # ENUMERATED {report, insert, ...}: extension bit, then the index
+    ies.append(_ie(_ID_RIC_INDICATION_TYPE, bytes([indication_type << 6])))
+    ies.append(_ie(_ID_RIC_INDICATION_HEADER, _octet_string(indication_header)))
+    ies.append(_ie(_ID_RIC_INDICATION_MESSAGE, _octet_string(indication_message)))
+    if call_process_id is not None:
+        ies.append(_ie(_ID_RIC_CALL_PROCESS_ID, _octet_string(call_process_id)))
+    return _pdu(_INITIATING_MESSAGE, _PROCEDURE_CODE_RIC_INDICATION, _IGNORE, ies)
+
+
+def encode_subscription_response(request_id: int, request_sequence_number: int, function_id: int,
+                                 admitted_action_ids: List[int]) -> bytes:
+    """
+    Function that returns the payload of an E2AP RICsubscriptionResponse
+    that admits the given actions.
+
+    Raise ValueError when a field is out of range.
+
+    Parameters
+    ----------
+    request_id: int
+    request_sequence_number: int
+    function_id: int
+        RAN function ID, 0..4095
+    admitted_action_ids: List[int]
+        1 to 16 action IDs, 0..255 each
+
+    Returns
+    -------
+    bytes
+        RICsubscriptionResponse type payload
+    """
+    if not 0 <= function_id <= 4095 or not 1 <= len(admitted_action_ids) <= 16:
+        raise ValueError("RAN function ID or number of admitted actions is out of range")
+    if not all(0 <= action_id <= 255 for action_id in admitted_action_ids):
+        raise ValueError("action ID is out of range")
+    # SEQUENCE (SIZE (1..16)): the count minus one in four bits, then the items
+    admitted = bytes([(len(admitted_action_ids) - 1) << 4]) + b"".join(
+        _ie(_ID_RIC_ACTION_ADMITTED_ITEM, bytes([0x00, action_id])) for action_id in admitted_action_ids)
+    ies = [_ie(_ID_RIC_REQUEST_ID, _request_id(request_id, request_sequence_number)),
+           _ie(_ID_RAN_FUNCTION_ID, _uint16(function_id)),
+           _ie(_ID_RIC_ACTION_ADMITTED, admitted)]
+    return _pdu(_SUCCESSFUL_OUTCOME, _PROCEDURE_CODE_RIC_SUBSCRIPTION, _REJECT, ies)
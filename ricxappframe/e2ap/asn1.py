@@ -14,11 +14,12 @@
 #  * limitations under the License.
 #  *
 #  *******************************************************************************
-from sys import getsizeof
-from typing import List, Tuple
-from ctypes import POINTER, ARRAY
+from threading import local
+from typing import Iterable, List, Optional, Tuple
+from ctypes import POINTER, ARRAY, cast, string_at
 from ctypes import c_ulong, c_void_p, c_long, c_size_t, c_int, c_ssize_t, c_uint8
 from ricxappframe.e2ap.asn1clib.asn1clib import asn1_c_lib
+from ricxappframe.e2ap.exceptions import DecodeFailed
 from ricxappframe.e2ap.asn1clib.types import indication_msg_t, subResp_msg_t, ric_action_definition_t, ric_subsequent_action_t
 
 
@@ -46,6 +47,69 @@ def _wrap_asn1_function(funcname, restype, argtypes):
     return func
 
 
+# initial and largest size of the output buffer of the encoders
+_ENCODE_BUFFER_SIZE = 1024
+_MAX_ENCODE_BUFFER_SIZE = 65536
+
+_encode_buffers = local()
+
+
+def _encode_buffer():
+    """
+    Returns the output buffer of the calling thread.
+    """
+    buf = getattr(_encode_buffers, "buf", None)
+    if buf is None:
+        buf = ARRAY(c_uint8, _ENCODE_BUFFER_SIZE)()
+        _encode_buffers.buf = buf
+    return buf
+
+
+def _encode(encode_func, *args) -> Tuple[int, bytes]:
+    """
+    Calls an encoder of the C library with the output buffer of the
+    calling thread. While the encoder reports an error, the call is
+    repeated with a buffer of twice the size, up to
+    _MAX_ENCODE_BUFFER_SIZE bytes; a larger buffer that succeeded
+    replaces the buffer of the thread.
+
+    Raise Exception when the payload cannot be created.
+
+    Parameters
+    ----------
+    encode_func: _FuncPointer
+        Encoder that takes the output buffer and its size, followed by args
+    args:
+        Remaining arguments of the encoder
+
+    Returns
+    -------
+    Tuple[int, bytes]
+        payload length and a copy of the encoded payload
+    """
+    buf = _encode_buffer()
+    while True:
+        size: int = encode_func(buf, c_size_t(len(buf)), *args)
+        if 0 <= size <= len(buf):
+            _encode_buffers.buf = buf
+            return size, string_at(buf, size)
+        # the C library reports a too small buffer like any other error
+        if len(buf) >= _MAX_ENCODE_BUFFER_SIZE:
+            raise Exception("Could not create payload.")
+        buf = ARRAY(c_uint8, min(max(size, 2 * len(buf)), _MAX_ENCODE_BUFFER_SIZE))()
+
+
+def _uint8_array(data):
+    """
+    Returns a c_uint8 array with the content of data, sharing the memory
+    of a bytearray and copying any other bytes-like object.
+    """
+    array_type = ARRAY(c_uint8, len(data))
+    if isinstance(data, bytearray):
+        return array_type.from_buffer(data)
+    return array_type.from_buffer_copy(data)
+
+
 _asn1_decode_indicationMsg = _wrap_asn1_function(
     'e2ap_decode_ric_indication_message', POINTER(indication_msg_t), [c_void_p, c_ulong])
 _asn1_free_indicationMsg = _wrap_asn1_function(
@@ -112,8 +176,9 @@ class IndicationMsg:
         """
         Function that sets fields of IndicationMsg class
         through msg payload (bytes) of RICIndication type.
+        The decoded C structure is freed before returning.
 
-        Raise Exception when payload is not RICIndication.
+        Raise DecodeFailed when payload is not RICIndication.
 
         Parameters
         ----------
@@ -124,27 +189,217 @@ class IndicationMsg:
         -------
         """
         indication: indication_msg_t = _asn1_decode_indicationMsg(
-            payload, getsizeof(payload))
-
-        if indication is None:
-            raise Exception("Payload is not matched with RICIndication")
-        indication.contents.request_id = 1
-        self.__request_id = indication.contents.request_id
-        self.__request_sequence_number = indication.contents.request_sequence_number
-        self.__function_id = indication.contents.function_id
-        self.__action_id = indication.contents.action_id
-        self.__indication_sequence_number = indication.contents.indication_sequence_number
-        self.__indication_type = indication.contents.indication_type
-        self.__indication_header = bytes(
-            indication.contents.indication_header[:indication.contents.indication_header_length])
-        self.__indication_message = bytes(
-            indication.contents.indication_message[:indication.contents.indication_message_length])
-        self.__call_process_id = bytes(
-            indication.contents.call_process_id[:indication.contents.call_process_id_length])
-
-        # _asn1_free_indicationMsg(indication)
+            payload, len(payload))
+
+        if not indication:
+            raise DecodeFailed("Payload is not matched with RICIndication")
+        try:
+            contents = indication.contents
+            self.__request_id = contents.request_id
+            self.__request_sequence_number = contents.request_sequence_number
+            self.__function_id = contents.function_id
+            self.__action_id = contents.action_id
+            self.__indication_sequence_number = contents.indication_sequence_number
+            self.__indication_type = contents.indication_type
+            self.__indication_header = bytes(
+                contents.indication_header[:contents.indication_header_length])
+            self.__indication_message = bytes(
+                contents.indication_message[:contents.indication_message_length])
+            self.__call_process_id = bytes(
+                contents.call_process_id[:contents.call_process_id_length])
+        finally:
+            _asn1_free_indicationMsg(indication)
         return
 
+    @staticmethod
+    def decode_many(payloads: Iterable[bytes]) -> List[Optional["IndicationMsg"]]:
+        """
+        Function that decodes a batch of msg payloads (bytes)
+        of RICIndication type, e.g. the payloads of the messages
+        returned by rmr_get_messages or wait_messages.
+
+        Parameters
+        ----------
+        payloads: Iterable[bytes]
+            RICIndication type payloads received via rmr
+
+        Returns
+        -------
+        List[Optional[IndicationMsg]]
+            One IndicationMsg per payload, in the same order;
+            None for a payload that is not RICIndication
+        """
+        indications = []
+        for payload in payloads:
+            indication = IndicationMsg()
+            try:
+                indication.decode(payload)
+            except DecodeFailed:
+                indication = None
+            indications.append(indication)
+        return indications
+
+
+class LazyIndicationMsg:
+    """
+    A class of E2AP's RICIndicationMessage that keeps the decoded
+    C structure until it is freed. The scalar fields are read at
+    decode time; the octet strings are copied on first access only,
+    or can be read without a copy through the *_view methods.
+    Handlers that route on request_id or function_id therefore do
+    not pay for copying the header and message.
+
+    The C structure is freed by free(), on leaving a with block, or
+    when the object is garbage-collected. Octet strings that were not
+    accessed before are not available afterwards.
+    """
+    __slots__ = ('__indication', '__request_id', '__request_sequence_number', '__function_id', '__action_id',
+                 '__indication_sequence_number', '__indication_type', '__indication_header', '__indication_message',
+                 '__call_process_id')
+    __request_id: int
+    __request_sequence_number: int
+    __function_id: int
+    __action_id: int
+    __indication_sequence_number: int
+    __indication_type: int
+
+    def __init__(self):
+        self.__indication = None
+        self.__indication_header = None
+        self.__indication_message = None
+        self.__call_process_id = None
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.free()
+
+    def __del__(self):
+        self.free()
+
+    @property
+    def request_id(self):
+        return self.__request_id
+
+    @property
+    def request_sequence_number(self):
+        return self.__request_sequence_number
+
+    @property
+    def function_id(self):
+        return self.__function_id
+
+    @property
+    def action_id(self):
+        return self.__action_id
+
+    @property
+    def indication_sequence_number(self):
+        return self.__indication_sequence_number
+
+    @property
+    def indication_type(self):
+        return self.__indication_type
+
+    @property
+    def indication_header(self):
+        if self.__indication_header is None:
+            self.__indication_header = bytes(self.indication_header_view())
+        return self.__indication_header
+
+    @property
+    def indication_message(self):
+        if self.__indication_message is None:
+            self.__indication_message = bytes(self.indication_message_view())
+        return self.__indication_message
+
+    @property
+    def call_process_id(self):
+        if self.__call_process_id is None:
+            self.__call_process_id = bytes(self.call_process_id_view())
+        return self.__call_process_id
+
+    def __contents(self):
+        if self.__indication is None:
+            raise Exception("RICIndication is already freed")
+        return self.__indication.contents
+
+    @staticmethod
+    def __view(pointer, length: int) -> memoryview:
+        if not length:
+            return memoryview(b"")
+        return memoryview(cast(pointer, POINTER(ARRAY(c_uint8, length))).contents).cast("B")
+
+    def indication_header_view(self) -> memoryview:
+        """
+        Returns the indication header without copying it.
+        The memoryview is valid only until the message is freed.
+        """
+        contents = self.__contents()
+        return self.__view(contents.indication_header, contents.indication_header_length)
+
+    def indication_message_view(self) -> memoryview:
+        """
+        Returns the indication message without copying it.
+        The memoryview is valid only until the message is freed.
+        """
+        contents = self.__contents()
+        return self.__view(contents.indication_message, contents.indication_message_length)
+
+    def call_process_id_view(self) -> memoryview:
+        """
+        Returns the call process ID without copying it.
+        The memoryview is valid only until the message is freed.
+        """
+        contents = self.__contents()
+        return self.__view(contents.call_process_id, contents.call_process_id_length)
+
+    def decode(self, payload: c_void_p):
+        """
+        Function that decodes msg payload (bytes) of RICIndication type
+        and sets the scalar fields of LazyIndicationMsg class.
+        A C structure decoded before is freed first.
+
+        Raise DecodeFailed when payload is not RICIndication.
+
+        Parameters
+        ----------
+        payload: c_void_p
+            RICIndication type payload received via rmr
+
+        Returns
+        -------
+        """
+        self.free()
+        self.__indication_header = None
+        self.__indication_message = None
+        self.__call_process_id = None
+        indication: indication_msg_t = _asn1_decode_indicationMsg(
+            payload, len(payload))
+
+        if not indication:
+            raise DecodeFailed("Payload is not matched with RICIndication")
+        self.__indication = indication
+        contents = indication.contents
+        self.__request_id = contents.request_id
+        self.__request_sequence_number = contents.request_sequence_number
+        self.__function_id = contents.function_id
+        self.__action_id = contents.action_id
+        self.__indication_sequence_number = contents.indication_sequence_number
+        self.__indication_type = contents.indication_type
+        return
+
+    def free(self):
+        """
+        Frees the decoded C structure. Calling it again has no effect.
+        """
+        indication = self.__indication
+        if indication is not None:
+            self.__indication = None
+            _asn1_free_indicationMsg(indication)
+
 
 class CauseItem:
     __slots__ = ('__cause_type', '__cause_id')
@@ -264,9 +519,9 @@ class SubResponseMsg:
         -------
         """
         subResp: subResp_msg_t = _asn1_decode_subRespMsg(
-            payload, getsizeof(payload))
+            payload, len(payload))
 
-        if subResp is None:
+        if not subResp:
             raise Exception(
                 "Payload is not matched with RICsubscriptionResponseMessage")
 
@@ -352,38 +607,24 @@ class SubRequestMsg:
           int :
             RICSubscriptionRequestMessage type payload length
           bytes :
-            RICSubscriptionRequestMessage type payload
+            RICSubscriptionRequestMessage type payload, exactly as long as the payload length
         -------
         """
         action_count = len(action_ids)
-        action_id_array = ARRAY(c_long, action_count)()
-        for idx in range(action_count):
-            action_id_array[idx] = c_long(action_ids[idx])
-
-        action_type_count = len(action_types)
-        action_type_array = ARRAY(c_long, action_type_count)()
-        for idx in range(action_type_count):
-            action_type_array[idx] = c_long(action_types[idx])
-
-        event_definition_count = len(event_trigger_definition)
-        event_trigger_definition_array = ARRAY(
-            c_uint8, event_definition_count)()
-        for idx in range(event_definition_count):
-            event_trigger_definition_array[idx] = c_uint8(
-                event_trigger_definition[idx])
+        action_id_array = ARRAY(c_long, action_count)(*action_ids)
+
+        action_type_array = ARRAY(c_long, len(action_types))(*action_types)
+
+        event_trigger_definition_array = _uint8_array(event_trigger_definition)
 
         action_definition_count = len(action_definitions)
         acttion_definition_array = ARRAY(
             ric_action_definition_t, action_definition_count)()
         for idx in range(action_definition_count):
-            action_definition_buffer = ARRAY(
-                c_uint8, action_definitions[idx].size)()
-            for buf_idx in range(action_definitions[idx].size):
-                action_definition_buffer[buf_idx] = c_uint8(
-                    action_definitions[idx].action_definition[buf_idx])
-            acttion_definition_array[idx].action_definition = action_definition_buffer
-            acttion_definition_array[idx].size = c_int(
-                action_definitions[idx].size)
+            size = action_definitions[idx].size
+            acttion_definition_array[idx].action_definition = _uint8_array(
+                bytes(action_definitions[idx].action_definition[:size]))
+            acttion_definition_array[idx].size = c_int(size)
 
         subsequent_action_count = len(sub_sequent_actions)
         subsequent_action_array = ARRAY(
@@ -393,15 +634,10 @@ class SubRequestMsg:
             subsequent_action_array[idx].subsequent_action_type = sub_sequent_actions[idx].subsequent_action_type
             subsequent_action_array[idx].time_to_wait = sub_sequent_actions[idx].time_to_wait
 
-        buf = ARRAY(c_uint8, 1024)()
-        size: int = _asn1_encode_subReqMsg(buf, c_size_t(1024), c_long(requestor_id), c_long(request_sequence_number),
-                                           c_long(ran_function_id), event_trigger_definition_array, c_size_t(
-                                               event_definition_count), c_size_t(action_count), action_id_array,
-                                           action_type_array, acttion_definition_array, subsequent_action_array)
-        if size < 0:
-            raise Exception("Could not create payload.")
-
-        return size, bytes(buf)
+        return _encode(_asn1_encode_subReqMsg, c_long(requestor_id), c_long(request_sequence_number),
+                       c_long(ran_function_id), event_trigger_definition_array,
+                       c_size_t(len(event_trigger_definition_array)), c_size_t(action_count), action_id_array,
+                       action_type_array, acttion_definition_array, subsequent_action_array)
 
 
 _asn1_encode_controlReqMsg = _wrap_asn1_function('e2ap_encode_ric_control_request_message', c_ssize_t, [
@@ -436,6 +672,167 @@ class ControlRequestMsg:
         control_message: bytes
         control_ack_request: int
 
+        Returns
+        Tuple[int, bytes]
+          int :
+            RICControlRequestMessage type payload length
+          bytes :
+            RICControlRequestMessage type payload, exactly as long as the payload length
+        -------
+        """
+        call_process_id_buffer = _uint8_array(call_process_id)
+        call_header_buffer = _uint8_array(control_header)
+        call_message_buffer = _uint8_array(control_message)
+
+        return _encode(_asn1_encode_controlReqMsg, c_long(requestor_id), c_long(request_sequence_number),
+                       c_long(ran_function_id), call_process_id_buffer, c_size_t(len(call_process_id_buffer)),
+                       call_header_buffer, c_size_t(len(call_header_buffer)), call_message_buffer,
+                       c_size_t(len(call_message_buffer)), c_long(control_ack_request))
+
+
+def _field_length(value) -> int:
+    """
+    Returns the number of octets a patchable field takes in APER:
+    two for an INTEGER (0..65535), the length for an OCTET STRING.
+    """
+    return 2 if isinstance(value, int) else len(value)
+
+
+def _field_octets(value) -> Optional[bytes]:
+    """
+    Returns the octets of a patchable field, or None if an integer is out of range.
+    """
+    if isinstance(value, int):
+        return value.to_bytes(2, "big") if 0 <= value <= 0xffff else None
+    return bytes(value)
+
+
+def _inverted(value):
+    """
+    Returns a value of the same length whose octets all differ from those of value.
+    """
+    if isinstance(value, int):
+        return value ^ 0xffff
+    return bytes(octet ^ 0xff for octet in value)
+
+
+def _find_patch_point(payload: bytes, variant: bytes, length: int) -> Optional[slice]:
+    """
+    Returns the slice of payload that holds a field, given the payload
+    encoded again with every octet of the field changed. None if the
+    payloads differ elsewhere or in length, so patching is not safe.
+    """
+    if len(payload) != len(variant):
+        return None
+    diff = [idx for idx, (a, b) in enumerate(zip(payload, variant)) if a != b]
+    if length == 0:
+        return slice(0, 0) if not diff else None
+    if len(diff) != length or diff[-1] - diff[0] + 1 != length:
+        return None
+    return slice(diff[0], diff[0] + length)
+
+
+class _EncodeTemplate:
+    """
+    Keeps a payload encoded once and the positions of its patchable
+    fields. A patch point is used only if encoding the message again
+    with every octet of the field changed altered exactly the octets
+    of the field; otherwise that field is encoded in full.
+    """
+    __slots__ = ('_encode_func', '_args', '_payload', '_patch_points')
+
+    def __init__(self, encode_func, args: dict, patchable: List[str]):
+        self._encode_func = encode_func
+        self._args = args
+        _, self._payload = encode_func(**args)
+        self._patch_points = {}
+        for name in patchable:
+            variant = dict(args)
+            variant[name] = _inverted(args[name])
+            try:
+                _, other = encode_func(**variant)
+            except Exception:
+                continue
+            point = _find_patch_point(self._payload, other, _field_length(args[name]))
+            if point is not None:
+                self._patch_points[name] = point
+
+    @property
+    def payload(self) -> bytes:
+        return self._payload
+
+    @property
+    def patchable_fields(self) -> List[str]:
+        """
+        Names of the fields that are patched instead of encoded
+        """
+        return sorted(self._patch_points)
+
+    def _encode(self, **fields) -> Tuple[int, bytes]:
+        payload = None
+        for name, value in fields.items():
+            if value is None or value == self._args[name]:
+                continue
+            point = self._patch_points.get(name)
+            octets = _field_octets(value)
+            if point is None or octets is None or len(octets) != point.stop - point.start:
+                args = dict(self._args)
+                args.update((k, v) for k, v in fields.items() if v is not None)
+                return self._encode_func(**args)
+            if payload is None:
+                payload = bytearray(self._payload)
+            payload[point] = octets
+        if payload is None:
+            return len(self._payload), self._payload
+        return len(payload), bytes(payload)
+
+
+class ControlRequestTemplate(_EncodeTemplate):
+    """
+    A class that encodes an e2ap RICControlRequestMessage once and then
+    produces variants of it that differ in request sequence number,
+    call process ID or control message by patching the encoded payload.
+
+    The call process ID and control message are patched when they keep
+    their length; any other change falls back to a full encode.
+
+    Raise Exception when the payload of RICControlRequestMessage cannot be created.
+
+    Parameters
+    ----------
+    requestor_id: int
+    request_sequence_number: int
+    ran_function_id: int
+    call_process_id: bytes
+    control_header: bytes
+    control_message: bytes
+    control_ack_request: int
+    """
+    __slots__ = ()
+
+    def __init__(self, requestor_id: int, request_sequence_number: int,
+                 ran_function_id: int, call_process_id: bytes,
+                 control_header: bytes, control_message: bytes,
+                 control_ack_request: int):
+        args = dict(requestor_id=requestor_id, request_sequence_number=request_sequence_number,
+                    ran_function_id=ran_function_id, call_process_id=bytes(call_process_id),
+                    control_header=bytes(control_header), control_message=bytes(control_message),
+                    control_ack_request=control_ack_request)
+        super().__init__(ControlRequestMsg().encode, args,
+                         ['request_sequence_number', 'call_process_id', 'control_message'])
+
+    def encode(self, request_sequence_number: int = None, call_process_id: bytes = None,
+               control_message: bytes = None) -> Tuple[int, bytes]:
+        """
+        Function that returns the payload of the template with the given fields replaced.
+
+        Parameters
+        ----------
+        request_sequence_number: int (optional)
+        call_process_id: bytes (optional)
+        control_message: bytes (optional)
+            Fields that are None keep the value of the template.
+
         Returns
         Tuple[int, bytes]
           int :
@@ -444,22 +841,49 @@ class ControlRequestMsg:
             RICControlRequestMessage type payload
         -------
         """
-        call_process_id_buffer = ARRAY(c_uint8, len(call_process_id))()
-        for idx in range(len(call_process_id)):
-            call_process_id_buffer[idx] = c_uint8(call_process_id[idx])
-
-        call_header_buffer = ARRAY(c_uint8, len(control_header))()
-        for idx in range(len(control_header)):
-            call_header_buffer[idx] = c_uint8(control_header[idx])
-
-        call_message_buffer = ARRAY(c_uint8, len(control_message))()
-        for idx in range(len(control_message)):
-            call_message_buffer[idx] = c_uint8(control_message[idx])
-
-        buf = ARRAY(c_uint8, 1024)()
-        size: int = _asn1_encode_controlReqMsg(buf, c_size_t(1024), c_long(requestor_id), c_long(request_sequence_number), c_long(ran_function_id), call_process_id_buffer, c_size_t(
-            len(call_process_id_buffer)), call_header_buffer, c_size_t(len(call_header_buffer)), call_message_buffer, c_size_t(len(call_message_buffer)), c_long(control_ack_request))
-        if size < 0:
-            raise Exception("Could not create payload.")
+        return self._encode(request_sequence_number=request_sequence_number,
+                            call_process_id=call_process_id, control_message=control_message)
+
+
+class SubRequestTemplate(_EncodeTemplate):
+    """
+    A class that encodes an e2ap RICSubscriptionRequestMessage once and
+    then produces variants of it that differ in request sequence number
+    by patching the encoded payload.
+
+    Raise Exception when the payload of RICSubscriptionRequestMessage cannot be created.
+
+    Parameters
+    ----------
+    Same as SubRequestMsg.encode
+    """
+    __slots__ = ()
+
+    def __init__(self, requestor_id: int, request_sequence_number: int,
+                 ran_function_id: int, event_trigger_definition: bytes, action_ids: List[int],
+                 action_types: List[int], action_definitions: List[ActionDefinition],
+                 sub_sequent_actions: List[SubsequentAction]):
+        args = dict(requestor_id=requestor_id, request_sequence_number=request_sequence_number,
+                    ran_function_id=ran_function_id, event_trigger_definition=event_trigger_definition,
+                    action_ids=action_ids, action_types=action_types, action_definitions=action_definitions,
+                    sub_sequent_actions=sub_sequent_actions)
+        super().__init__(SubRequestMsg().encode, args, ['request_sequence_number'])
+
+    def encode(self, request_sequence_number: int = None) -> Tuple[int, bytes]:
+        """
+        Function that returns the payload of the template with the given request sequence number.
 
-        return size, bytes(buf)
+        Parameters
+        ----------
+        request_sequence_number: int (optional)
+            None keeps the value of the template.
+
+        Returns
+        Tuple[int, bytes]
+          int :
+            RICSubscriptionRequestMessage type payload length
+          bytes :
+            RICSubscriptionRequestMessage type payload
+        -------
+        """
+        return self._encode(request_sequence_number=request_sequence_number)
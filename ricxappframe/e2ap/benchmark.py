@@ -0,0 +1,242 @@
+# ==================================================================================
+#       Copyright (c) 2026 The O-RAN Software Community contributors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#          http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+# ==================================================================================
+"""
+Benchmarks and fuzz-regression checks for the E2AP codec.
+
+For each case, the benchmark reports the operations per second, the
+Python bytes allocated per operation (the tracemalloc peak of a single
+operation) and the growth of the resident set size over all
+iterations. The resident set size covers native memory, so a decoder
+that does not free its C structure shows up as growth.
+
+The fuzz check decodes mutated payloads. A decoder must either decode
+them or raise Exception. For RICindications, it also counts the
+decoded payloads whose IDs peek_indication reads differently; a
+mutation that duplicates an IE can cause that legitimately.
+
+Run with:
+
+  python -m ricxappframe.e2ap.benchmark --iterations 1000000
+"""
+import argparse
+import json
+import os
+import random
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from ricxappframe.e2ap.aper import encode_indication, encode_subscription_response
+from ricxappframe.e2ap.asn1 import (ActionDefinition, ControlRequestMsg, IndicationMsg, SubRequestMsg,
+                                    SubResponseMsg, SubsequentAction)
+from ricxappframe.e2ap.exceptions import DecodeFailed
+from ricxappframe.e2ap.peek import peek_indication
+
+# operations run before measuring, so that caches and allocator pools are filled
+_WARMUP = 1000
+
+
+def _rss() -> int:
+    """
+    Returns the resident set size of this process in bytes, 0 if unknown.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def measure(operation: Callable[[], object], iterations: int) -> Dict[str, float]:
+    """
+    Function that runs an operation repeatedly and measures it.
+
+    Parameters
+    ----------
+    operation: function
+        Called without arguments
+    iterations: int
+        Number of measured calls
+
+    Returns
+    -------
+    dict
+        ops_per_sec: calls per second
+        bytes_per_op: Python bytes allocated by one call
+        rss_growth: growth of the resident set size over all calls, in bytes
+        rss_growth_per_op: rss_growth divided by iterations
+    """
+    for _ in range(_WARMUP):
+        operation()
+
+    tracemalloc.start()
+    operation()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    operation()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rss = _rss()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        operation()
+    elapsed = time.perf_counter() - start
+    growth = max(_rss() - rss, 0)
+    return {"ops_per_sec": iterations / elapsed if elapsed > 0 else 0.0,
+            "bytes_per_op": peak - baseline,
+            "rss_growth": growth,
+            "rss_growth_per_op": growth / iterations if iterations else 0.0}
+
+
+def _sub_request(action_count: int, definition_size: int) -> Callable[[], object]:
+    definitions = []
+    subsequent_actions = []
+    for _ in range(action_count):
+        definition = ActionDefinition()
+        definition.action_definition = bytes(definition_size)
+        definition.size = definition_size
+        definitions.append(definition)
+        subsequent_actions.append(SubsequentAction())
+    action_ids = list(range(action_count))
+    action_types = [0] * action_count
+    encoder = SubRequestMsg()
+    return lambda: encoder.encode(1, 1, 1, bytes(8), action_ids, action_types, definitions, subsequent_actions)
+
+
+def _control_request(message_size: int) -> Callable[[], object]:
+    header = bytes(16)
+    message = bytes(message_size)
+    encoder = ControlRequestMsg()
+    return lambda: encoder.encode(1, 1, 1, bytes(4), header, message, 1)
+
+
+def _indication(message_size: int) -> Callable[[], object]:
+    payload = encode_indication(1, 1, 1, 1, 1, 0, bytes(16), bytes(message_size), bytes(4))
+    return lambda: IndicationMsg().decode(payload)
+
+
+def _sub_response(action_count: int) -> Callable[[], object]:
+    payload = encode_subscription_response(1, 1, 1, list(range(action_count)))
+    return lambda: SubResponseMsg().decode(payload)
+
+
+def cases() -> Dict[str, Callable[[], object]]:
+    """
+    Returns the benchmark cases by name.
+    """
+    result = {}
+    for action_count in (1, 4, 16):
+        result["SubRequestMsg.encode actions={}".format(action_count)] = _sub_request(action_count, 64)
+    for size in (64, 512, 4096):
+        result["ControlRequestMsg.encode message={}".format(size)] = _control_request(size)
+    for size in (64, 512, 4096):
+        result["IndicationMsg.decode message={}".format(size)] = _indication(size)
+    for action_count in (1, 16):
+        result["SubResponseMsg.decode actions={}".format(action_count)] = _sub_response(action_count)
+    return result
+
+
+def _mutations(payload: bytes, rng: random.Random, count: int) -> List[bytes]:
+    """
+    Returns mutated copies of a payload: bit flips, truncations,
+    changed length octets and random tails.
+    """
+    result = []
+    for _ in range(count):
+        mutated = bytearray(payload)
+        kind = rng.randrange(4)
+        if kind == 0:
+            for _ in range(rng.randint(1, 4)):
+                mutated[rng.randrange(len(mutated))] ^= 1 << rng.randrange(8)
+        elif kind == 1:
+            del mutated[rng.randrange(len(mutated)):]
+        elif kind == 2:
+            mutated[rng.randrange(len(mutated))] = rng.choice((0x00, 0x7f, 0x80, 0xbf, 0xff))
+        else:
+            mutated[rng.randrange(len(mutated)):] = bytes(rng.randrange(256) for _ in range(rng.randint(0, 32)))
+        result.append(bytes(mutated))
+    return result
+
+
+def fuzz(iterations: int, seed: int = 0) -> Dict[str, int]:
+    """
+    Function that decodes mutated RICindication and
+    RICsubscriptionResponse payloads.
+
+    Parameters
+    ----------
+    iterations: int
+        Number of mutated payloads per message type
+    seed: int (optional)
+        Seed of the mutations; a seed reproduces a failure
+
+    Returns
+    -------
+    dict
+        Number of mutated payloads that decoded and that were rejected,
+        and of decoded RICindications whose peeked IDs differ
+    """
+    rng = random.Random(seed)
+    stats = {"decoded": 0, "rejected": 0, "peek_mismatch": 0}
+    indication = encode_indication(1001, 7, 300, 2, 1, 0, bytes(range(16)), bytes(range(64)), b"\x01\x02")
+    for payload in _mutations(indication, rng, iterations):
+        msg = IndicationMsg()
+        try:
+            msg.decode(payload)
+        except Exception:
+            stats["rejected"] += 1
+            continue
+        stats["decoded"] += 1
+        try:
+            peeked = peek_indication(payload)
+        except DecodeFailed:
+            peeked = None
+        if peeked is None or peeked.as_tuple() != (msg.request_id, msg.request_sequence_number,
+                                                   msg.function_id, msg.action_id):
+            stats["peek_mismatch"] += 1
+    response = encode_subscription_response(1001, 7, 300, [1, 2, 3])
+    for payload in _mutations(response, rng, iterations):
+        try:
+            SubResponseMsg().decode(payload)
+            stats["decoded"] += 1
+        except Exception:
+            stats["rejected"] += 1
+    return stats
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Benchmark and fuzz the E2AP codec")
+    parser.add_argument("--iterations", type=int, default=100000, help="measured calls per case")
+    parser.add_argument("--fuzz", type=int, default=10000, help="mutated payloads per message type")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the fuzz mutations")
+    parser.add_argument("--max-rss-growth-per-op", type=float, default=None,
+                        help="fail if any case grows the resident set size by more bytes per call")
+    options = parser.parse_args(args)
+
+    results = {name: measure(operation, options.iterations) for name, operation in cases().items()}
+    results["fuzz"] = fuzz(options.fuzz, options.seed)
+    print(json.dumps(results, indent=2))
+
+    if options.max_rss_growth_per_op is not None:
+        leaking = [name for name, result in results.items()
+                   if result.get("rss_growth_per_op", 0) > options.max_rss_growth_per_op]
+        if leaking:
+            raise SystemExit("native memory grows in: {}".format(", ".join(leaking)))
+
+
+if __name__ == "__main__":
+    main()
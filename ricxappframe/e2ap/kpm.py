@@ -0,0 +1,231 @@
+# ==================================================================================
+#       Copyright (c) 2026 The O-RAN Software Community contributors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#          http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+# ==================================================================================
+"""
+Turns E2SM-KPM indications into columnar NumPy arrays.
+
+The E2AP C library does not decode E2SM-KPM, so the ASN.1 decoding
+itself is done by a spec object with a method decode(type_name, data)
+that returns values in the layout of asn1tools: a SEQUENCE is a dict,
+a CHOICE a (name, value) tuple and a SEQUENCE OF a list. A spec
+compiled with asn1tools from the E2SM-KPM module, using the aligned
+PER codec "per", can be passed as is.
+
+Indication message formats 1 and 3 are supported; format 3 carries a
+report per UE. Each measurement data item of a report is one row.
+
+This module needs NumPy, which is installed with the "kpm" extra.
+"""
+from typing import Dict, Iterable, Optional, Union
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency, see KpmDecoder
+    np = None
+
+# the first integer ID of each UEID CHOICE alternative
+_UE_ID_KEYS = {
+    "gNB-UEID": "amf-UE-NGAP-ID",
+    "gNB-DU-UEID": "gNB-CU-UE-F1AP-ID",
+    "gNB-CU-UP-UEID": "gNB-CU-CP-UE-E1AP-ID",
+    "ng-eNB-UEID": "amf-UE-NGAP-ID",
+    "en-gNB-UEID": "m-eNB-UE-X2AP-ID",
+    "eNB-UEID": "mME-UE-S1AP-ID",
+}
+
+
+class KpmColumns:
+    """
+    Measurement records of one or more E2SM-KPM indications as columns.
+    All arrays have one element per row.
+
+    timestamp: numpy.ndarray of float64
+        colletStartTime of the indication plus the granularity period
+        times the position of the row in its report, in seconds. An
+        8-octet time stamp is read in NTP format (seconds and fraction),
+        a 4-octet one as seconds.
+    ue_id: numpy.ndarray of int64
+        First integer ID of the UEID of a format 3 report, -1 otherwise
+    cell_id: numpy.ndarray of int64
+        Cell ID given for the indication, -1 if none
+    measurements: dict
+        numpy.ndarray of float64 per measurement name, or per measurement
+        ID if the measurement was identified by ID; NaN where a record
+        has no value or the indication did not report the measurement.
+        A measurement with labels other than noLabel is keyed by the
+        tuple (name or ID, labels), labels being a tuple of the sorted
+        (label name, value) pairs of its labelInfoList, so the same
+        measurement reported for several labels gets a column per label.
+    """
+    __slots__ = ('timestamp', 'ue_id', 'cell_id', 'measurements')
+
+    def __init__(self, timestamp, ue_id, cell_id, measurements: Dict[Union[str, int], "np.ndarray"]):
+        self.timestamp = timestamp
+        self.ue_id = ue_id
+        self.cell_id = cell_id
+        self.measurements = measurements
+        return
+
+    def __len__(self):
+        return len(self.timestamp)
+
+
+def _timestamp(octets: bytes) -> float:
+    value = int.from_bytes(octets, "big")
+    if len(octets) == 8:
+        return (value >> 32) + (value & 0xffffffff) / 4294967296.0
+    return float(value)
+
+
+def _hashable(value):
+    if isinstance(value, dict):
+        return tuple(sorted((key, _hashable(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(item) for item in value)
+    return value
+
+
+def _column_key(info):
+    """
+    Returns the column of a MeasurementInfoItem: its name or ID, with
+    its labels if it has any, see KpmColumns.
+    """
+    _, meas_type = info["measType"]
+    labels = sorted((name, _hashable(value)) for label in info.get("labelInfoList", [])
+                    for name, value in label["measLabel"].items() if name != "noLabel")
+    return (meas_type, tuple(labels)) if labels else meas_type
+
+
+def _ue_id(ue_id) -> int:
+    name, value = ue_id
+    key = _UE_ID_KEYS.get(name)
+    if key is None or key not in value:
+        return -1
+    return value[key]
+
+
+class KpmDecoder:
+    """
+    Decodes E2SM-KPM indication headers and messages into KpmColumns.
+
+    Raise Exception when NumPy is not installed.
+
+    Parameters
+    ----------
+    spec: object
+        ASN.1 decoder of the E2SM-KPM module, see the module documentation
+    header_type: string (optional)
+        Name of the indication header type in spec
+    message_type: string (optional)
+        Name of the indication message type in spec
+    """
+
+    def __init__(self, spec, header_type: str = "E2SM-KPM-IndicationHeader",
+                 message_type: str = "E2SM-KPM-IndicationMessage"):
+        if np is None:
+            raise Exception("KpmDecoder needs numpy; install ricxappframe[kpm]")
+        self._spec = spec
+        self._header_type = header_type
+        self._message_type = message_type
+
+    def decode(self, indication, cell_id: int = -1) -> KpmColumns:
+        """
+        Function that decodes the measurement records of one indication.
+
+        Raise Exception when the indication is not E2SM-KPM format 1 or
+        3, or when a report lists a measurement twice with the same labels.
+
+        Parameters
+        ----------
+        indication: IndicationMsg
+            Decoded RICindication; any object with indication_header and
+            indication_message bytes will do, e.g. a LazyIndicationMsg
+        cell_id: int (optional)
+            Cell the indication reports on, e.g. from the subscription
+
+        Returns
+        -------
+        KpmColumns
+        """
+        return self.decode_many([indication], [cell_id])
+
+    def decode_many(self, indications: Iterable, cell_ids: Optional[Iterable[int]] = None) -> KpmColumns:
+        """
+        Function that decodes the measurement records of a batch of
+        indications and concatenates them, in order, into one set of
+        columns.
+
+        Raise Exception when an indication is not E2SM-KPM format 1 or
+        3, or when a report lists a measurement twice with the same labels.
+
+        Parameters
+        ----------
+        indications: Iterable[IndicationMsg]
+            Decoded RICindications, see decode
+        cell_ids: Iterable[int] (optional)
+            Cell of each indication; -1 for all if None
+
+        Returns
+        -------
+        KpmColumns
+        """
+        indications = list(indications)
+        cell_ids = [-1] * len(indications) if cell_ids is None else list(cell_ids)
+        if len(cell_ids) != len(indications):
+            raise ValueError("one cell ID per indication is needed")
+
+        timestamps = []
+        ue_ids = []
+        cells = []
+        values = {}
+        for indication, cell_id in zip(indications, cell_ids):
+            _, header = self._spec.decode(self._header_type, indication.indication_header)["indicationHeader-formats"]
+            start = _timestamp(header["colletStartTime"])
+            message_format, message = self._spec.decode(
+                self._message_type, indication.indication_message)["indicationMessage-formats"]
+            if message_format == "indicationMessage-Format1":
+                reports = [(-1, message)]
+            elif message_format == "indicationMessage-Format3":
+                reports = [(_ue_id(item["ueID"]), item["measReport"]) for item in message["ueMeasReportList"]]
+            else:
+                raise Exception("E2SM-KPM {} is not supported".format(message_format))
+
+            for ue_id, report in reports:
+                names = [_column_key(info) for info in report.get("measInfoList", [])]
+                if len(set(names)) != len(names):
+                    raise Exception("E2SM-KPM report lists a measurement twice with the same labels")
+                period = report.get("granulPeriod", 0) / 1000.0
+                first_row = len(timestamps)
+                for position, item in enumerate(report["measData"]):
+                    row = len(timestamps)
+                    timestamps.append(start + position * period)
+                    for name, (kind, value) in zip(names, item["measRecord"]):
+                        column = values.get(name)
+                        if column is None:
+                            column = values[name] = [np.nan] * row
+                        elif len(column) < row:
+                            column.extend([np.nan] * (row - len(column)))
+                        column.append(np.nan if kind == "noValue" else value)
+                rows = len(timestamps) - first_row
+                ue_ids.extend([ue_id] * rows)
+                cells.extend([cell_id] * rows)
+
+        rows = len(timestamps)
+        for column in values.values():
+            column.extend([np.nan] * (rows - len(column)))
+        return KpmColumns(np.array(timestamps, dtype=np.float64),
+                          np.array(ue_ids, dtype=np.int64),
+                          np.array(cells, dtype=np.int64),
+                          {name: np.array(column, dtype=np.float64) for name, column in values.items()})
@@ -0,0 +1,145 @@
+# ==================================================================================
+#       Copyright (c) 2026 The O-RAN Software Community contributors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#          http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+# ==================================================================================
+"""
+Reads the routing IDs of an APER-encoded E2AP RICindication without
+decoding the whole message. Unlike the asn1 module, this module does
+not need the E2AP C library.
+
+The parser follows the aligned PER layout of the E2AP-PDU:
+
+  octet 0     CHOICE index; initiatingMessage is 0
+  octet 1     procedureCode, RICindication is 5
+  octet 2     criticality
+  octets 3-   length determinant of the RICindication open type
+  then        extension bit of RICindication (one octet),
+              number of protocol IEs (two octets),
+              for each IE: id (two octets), criticality (one octet),
+              length determinant and value
+"""
+from typing import Optional, Tuple
+
+from ricxappframe.e2ap.exceptions import DecodeFailed
+
+# E2AP procedure code and protocol IE IDs
+_PROCEDURE_CODE_RIC_INDICATION = 5
+_ID_RAN_FUNCTION_ID = 5
+_ID_RIC_ACTION_ID = 15
+_ID_RIC_REQUEST_ID = 29
+# octets of the IE values read, see peek_indication
+_VALUE_LENGTHS = {_ID_RAN_FUNCTION_ID: 2, _ID_RIC_ACTION_ID: 1, _ID_RIC_REQUEST_ID: 5}
+
+
+class IndicationIds:
+    """
+    The routing IDs of a RICindication, named like the fields of IndicationMsg
+    """
+    __slots__ = ('request_id', 'request_sequence_number', 'function_id', 'action_id')
+
+    request_id: int
+    request_sequence_number: int
+    function_id: int
+    action_id: int
+
+    def __init__(self, request_id: int, request_sequence_number: int, function_id: int, action_id: int):
+        self.request_id = request_id
+        self.request_sequence_number = request_sequence_number
+        self.function_id = function_id
+        self.action_id = action_id
+        return
+
+    def __eq__(self, other):
+        return isinstance(other, IndicationIds) and self.as_tuple() == other.as_tuple()
+
+    def __hash__(self):
+        return hash(self.as_tuple())
+
+    def __repr__(self):
+        return "IndicationIds(request_id={}, request_sequence_number={}, function_id={}, action_id={})".format(
+            *self.as_tuple())
+
+    def as_tuple(self) -> Tuple[int, int, int, int]:
+        return self.request_id, self.request_sequence_number, self.function_id, self.action_id
+
+
+def _length(payload: bytes, offset: int) -> Tuple[Optional[int], int]:
+    """
+    Reads an aligned PER length determinant and returns the length and
+    the offset after it. Fragmented lengths (16K and above) are not
+    supported; their length is None.
+    """
+    first = payload[offset]
+    if first < 0x80:
+        return first, offset + 1
+    if first < 0xc0:
+        return ((first & 0x3f) << 8) | payload[offset + 1], offset + 2
+    return None, offset
+
+
+def peek_indication(payload: bytes) -> Optional[IndicationIds]:
+    """
+    Function that returns the RIC request ID, RAN function ID and RIC
+    action ID of an E2AP RICindication, reading only the octets that
+    hold them. Use IndicationMsg or LazyIndicationMsg to get the other
+    fields.
+
+    Raise DecodeFailed when payload is truncated, i.e. a length runs
+    past its end.
+
+    Parameters
+    ----------
+    payload: bytes
+        RICIndication type payload received via rmr
+
+    Returns
+    -------
+    IndicationIds
+        The IDs, or None if the payload is not a RICindication, lacks
+        one of the IDs or has a fragmented length
+    """
+    try:
+        if payload[0] & 0xe0 or payload[1] != _PROCEDURE_CODE_RIC_INDICATION:
+            return None
+        length, offset = _length(payload, 3)
+        if length is None:
+            return None
+        end = offset + length
+        if end > len(payload):
+            raise DecodeFailed("Payload is not matched with RICIndication")
+        # extension bit of RICindication, then the number of IEs
+        count = (payload[offset + 1] << 8) | payload[offset + 2]
+        offset += 3
+        request = function_id = action_id = None
+        for _ in range(count):
+            ie_id = (payload[offset] << 8) | payload[offset + 1]
+            length, offset = _length(payload, offset + 3)
+            if length is None:
+                return None
+            if offset + length > end or length < _VALUE_LENGTHS.get(ie_id, 0):
+                raise DecodeFailed("Payload is not matched with RICIndication")
+            if ie_id == _ID_RIC_REQUEST_ID:
+                # extension bit, then ricRequestorID and ricInstanceID of two octets each
+                request = ((payload[offset + 1] << 8) | payload[offset + 2],
+                           (payload[offset + 3] << 8) | payload[offset + 4])
+            elif ie_id == _ID_RAN_FUNCTION_ID:
+                function_id = (payload[offset] << 8) | payload[offset + 1]
+            elif ie_id == _ID_RIC_ACTION_ID:
+                action_id = payload[offset]
+            offset += length
+            if request is not None and function_id is not None and action_id is not None:
+                return IndicationIds(request[0], request[1], function_id, action_id)
+    except IndexError:
+        raise DecodeFailed("Payload is not matched with RICIndication")
+    return None
@@ -0,0 +1,369 @@
+# ==================================================================================
+#       Copyright (c) 2026 The O-RAN Software Community contributors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#          http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+# ==================================================================================
+"""
+Simulates E2 nodes that send RICindication messages, to load-test
+xapps.
+
+The E2NodeSimulator sends indications for many MEIDs at a target rate
+or through a rate profile, and reports sent and acknowledged rates.
+What counts as acknowledged depends on the transport:
+
+- RmrTransport sends through an RMR context of its own and counts
+  the messages it receives back, e.g. by rmr_rts from the xapp.
+- InProcessTransport puts messages straight into the receive queue
+  of an xapp in the same process and counts the messages the xapp
+  has taken from the queue, not those the queue dropped.
+
+Run with, e.g.:
+
+  python -m ricxappframe.e2ap.simulator --port 4600 --meids 100 --profile 10:1000,30:10000
+"""
+import argparse
+import json
+import math
+import os
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from mdclogpy import Logger
+
+from ricxappframe.e2ap.aper import encode_indication
+from ricxappframe.rmr import rmr, helpers
+from ricxappframe.xapp_rmr import RmrLoop
+
+mdc_logger = Logger(name=__name__)
+
+# RMR message type of RIC_INDICATION
+RIC_INDICATION = 12050
+
+
+class RmrTransport:
+    """
+    Sends messages through an RMR context of its own. A single message
+    buffer is reused for all sends.
+
+    Parameters
+    ----------
+    port: int
+        Port of the RMR context; replies to it count as acknowledgements
+    wait_for_ready: bool (optional, default is True)
+        If True, waits until RMR has a route table
+    retries: int (optional, default is 100)
+        Number of send attempts per message
+    """
+
+    def __init__(self, port: int, wait_for_ready: bool = True, retries: int = 100):
+        self._loop = RmrLoop(port, wait_for_ready)
+        self._sbuf = None
+        self._retries = retries
+        self._acked = 0
+
+    def send(self, meid: bytes, mtype: int, payload: bytes) -> bool:
+        """
+        Sends a message and returns whether RMR accepted it.
+        """
+        sbuf = self._sbuf
+        if sbuf is None:
+            sbuf = rmr.rmr_alloc_msg(self._loop.mrc, len(payload))
+        rmr.set_payload_and_length(payload, sbuf)
+        rmr.rmr_set_meid(sbuf, meid)
+        sbuf.contents.mtype = mtype
+        for _ in range(self._retries):
+            sbuf = rmr.rmr_send_msg(self._loop.mrc, sbuf)
+            if sbuf.contents.state == 0:
+                break
+        self._sbuf = sbuf
+        return sbuf.contents.state == 0
+
+    def acked(self) -> int:
+        """
+        Returns the number of messages received back so far.
+        """
+        for (_, sbuf) in self._loop.rcv_queue.get_batch(10000, timeout=0):
+            helpers.rmr_free_msg_tracked(sbuf)
+            self._acked += 1
+        return self._acked
+
+    def close(self):
+        """
+        Frees the message buffer and stops the RMR context.
+        """
+        if self._sbuf is not None:
+            rmr.rmr_free_msg(self._sbuf)
+            self._sbuf = None
+        self._loop.stop()
+
+
+class InProcessTransport:
+    """
+    Puts messages into the receive queue of an xapp in the same process,
+    bypassing the network. The xapp dispatches them like received
+    messages.
+
+    Acknowledged messages are those the xapp has taken from its receive
+    queue. Messages a MeidFairQueue dropped because a sub-queue was
+    full do not count; other messages the xapp receives meanwhile make
+    the count lower while they wait in the queue.
+
+    Parameters
+    ----------
+    xapp: RMRXapp or Xapp
+        The xapp to feed
+    context: int (optional, default is 0)
+        Index of the RMR context (see rmr_port) to feed
+    """
+
+    def __init__(self, xapp, context: int = 0):
+        self._loop = xapp._rmr_loops[context]
+        self._sent = 0
+        self._dropped = self._queue_dropped()
+
+    def send(self, meid: bytes, mtype: int, payload: bytes) -> bool:
+        """
+        Puts a message into the receive queue of the xapp.
+        """
+        sbuf = rmr.rmr_alloc_msg(self._loop.mrc, len(payload), payload=payload, mtype=mtype, meid=meid)
+        helpers.sbuf_tracker.track(sbuf)
+        self._loop.inject(rmr.message_summary(sbuf), sbuf)
+        self._sent += 1
+        return True
+
+    def acked(self) -> int:
+        """
+        Returns the number of messages the xapp has taken from its receive queue.
+        """
+        dropped = self._queue_dropped() - self._dropped
+        return max(self._sent - self._loop.rcv_queue.qsize() - dropped, 0)
+
+    def _queue_dropped(self) -> int:
+        """
+        Returns the number of messages the receive queue dropped, 0 if it does not drop.
+        """
+        stats = getattr(self._loop.rcv_queue, "stats", None)
+        return stats().get("dropped", 0) if stats is not None else 0
+
+    def close(self):
+        return
+
+
+class E2NodeSimulator:
+    """
+    Sends RICindication messages for many simulated E2 nodes.
+
+    The messages are spread round-robin over the MEIDs and the RAN
+    functions. Each MEID numbers its indications with its own
+    indication sequence number. The payloads are encoded up front, one
+    per RAN function and sequence number modulo variants, so the send
+    rate is not limited by encoding.
+
+    Parameters
+    ----------
+    transport: RmrTransport or InProcessTransport
+        Any object with send(meid, mtype, payload) -> bool, acked() -> int and close()
+    meids: Sequence[bytes]
+        MEIDs of the simulated E2 nodes
+    request_id: int (optional)
+        RIC requestor ID of the subscription the indications belong to
+    request_sequence_number: int (optional)
+        RIC instance ID of the subscription
+    function_ids: Sequence[int] (optional)
+        RAN function IDs
+    action_id: int (optional)
+    header_size: int (optional)
+        Size of the indication header in bytes
+    message_size: int (optional)
+        Size of the indication message in bytes
+    indication_type: int (optional)
+        0 for report, 1 for insert
+    mtype: int (optional)
+        RMR message type
+    variants: int (optional)
+        Number of sequence numbers encoded up front per RAN function
+    """
+
+    def __init__(self, transport, meids: Sequence[bytes], request_id: int = 1, request_sequence_number: int = 1,
+                 function_ids: Sequence[int] = (1,), action_id: int = 1, header_size: int = 16,
+                 message_size: int = 256, indication_type: int = 0, mtype: int = RIC_INDICATION,
+                 variants: int = 256):
+        if not meids or not function_ids:
+            raise ValueError("at least one MEID and one RAN function are needed")
+        self._transport = transport
+        self._meids = list(meids)
+        self._function_ids = list(function_ids)
+        self._mtype = mtype
+        self._payloads = {}
+        for function_id in self._function_ids:
+            header = os.urandom(header_size)
+            message = os.urandom(message_size)
+            self._payloads[function_id] = [
+                encode_indication(request_id, request_sequence_number, function_id, action_id, sn,
+                                  indication_type, header, message)
+                for sn in range(variants)]
+        self._sequence_numbers = [0] * len(self._meids)
+        self._next = 0
+        self._keep_going = True
+        self._sent = 0
+        self._failed = 0
+        self._elapsed = 0.0
+
+    def send_one(self) -> bool:
+        """
+        Sends the next indication and returns whether the transport accepted it.
+        """
+        index = self._next
+        self._next = (index + 1) % len(self._meids)
+        sn = self._sequence_numbers[index]
+        self._sequence_numbers[index] = sn + 1
+        payloads = self._payloads[self._function_ids[(index + sn) % len(self._function_ids)]]
+        if self._transport.send(self._meids[index], self._mtype, payloads[sn % len(payloads)]):
+            self._sent += 1
+            return True
+        self._failed += 1
+        return False
+
+    def run(self, profile: List[Tuple[float, float]], report: Callable[[Dict], None] = None,
+            report_interval: float = 1.0) -> Dict:
+        """
+        Sends indications following a rate profile, then returns the
+        final statistics. Returns early if stop is called.
+
+        Parameters
+        ----------
+        profile: List[Tuple[float, float]]
+            Steps of (duration in seconds, rate in messages per second
+            over all MEIDs), run in order
+        report: function (optional)
+            Called with the statistics (see stats) every report_interval seconds
+        report_interval: float (optional, default is 1.0)
+
+        Returns
+        -------
+        dict
+            See stats
+        """
+        start = time.monotonic()
+        next_report = start + report_interval
+        for duration, rate in profile:
+            step_start = time.monotonic()
+            step_sent = 0
+            while self._keep_going:
+                now = time.monotonic()
+                if now - step_start >= duration:
+                    break
+                due = int((now - step_start) * rate) - step_sent
+                for _ in range(due):
+                    self.send_one()
+                step_sent += max(due, 0)
+                if report is not None and now >= next_report:
+                    self._elapsed = now - start
+                    report(self.stats())
+                    next_report += report_interval
+                if due <= 0:
+                    time.sleep(min(1.0 / rate, 0.001) if rate > 0 else 0.001)
+        self._elapsed = time.monotonic() - start
+        return self.stats()
+
+    def stop(self):
+        """
+        Makes run return; may be called from another thread.
+        """
+        self._keep_going = False
+
+    def stats(self) -> Dict:
+        """
+        Returns the statistics of the current or last run.
+
+        Returns
+        -------
+        dict
+            sent: number of messages the transport accepted
+            failed: number of messages the transport did not accept
+            acked: number of acknowledged messages, see the transports
+            elapsed: seconds since the run started
+            sent_rate: sent per second
+            acked_rate: acked per second
+        """
+        acked = self._transport.acked()
+        elapsed = self._elapsed
+        return {"sent": self._sent, "failed": self._failed, "acked": acked, "elapsed": elapsed,
+                "sent_rate": self._sent / elapsed if elapsed else 0.0,
+                "acked_rate": acked / elapsed if elapsed else 0.0}
+
+
+def parse_profile(text: str) -> List[Tuple[float, float]]:
+    """
+    Parses a rate profile such as "10:1000,30:5000", a list of
+    duration in seconds and rate in messages per second.
+
+    Raises
+    ------
+    ValueError
+        If a step is not two numbers separated by ":", or a duration
+        or rate is negative or not finite
+    """
+    steps = []
+    for step in text.split(","):
+        try:
+            duration, rate = (float(number) for number in step.split(":"))
+        except ValueError:
+            raise ValueError("profile step {!r} is not seconds:rate".format(step)) from None
+        if not (0 <= duration < math.inf and 0 <= rate < math.inf):
+            raise ValueError("profile step {!r} needs a duration and rate of at least 0".format(step))
+        steps.append((duration, rate))
+    return steps
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Send RICindication load to xapps over RMR")
+    parser.add_argument("--port", type=int, default=4600, help="RMR port of the simulator")
+    parser.add_argument("--meids", type=int, default=10, help="number of simulated E2 nodes")
+    parser.add_argument("--meid-prefix", default="gnb_", help="MEIDs are this prefix and a number")
+    parser.add_argument("--functions", default="1", help="comma-separated RAN function IDs")
+    parser.add_argument("--request-id", type=int, default=1, help="RIC requestor ID")
+    parser.add_argument("--instance-id", type=int, default=1, help="RIC instance ID")
+    parser.add_argument("--action-id", type=int, default=1)
+    parser.add_argument("--header-size", type=int, default=16)
+    parser.add_argument("--message-size", type=int, default=256)
+    parser.add_argument("--mtype", type=int, default=RIC_INDICATION)
+    parser.add_argument("--profile", default="10:1000", help="steps of seconds:rate, e.g. 10:1000,30:5000")
+    options = parser.parse_args(args)
+    try:
+        profile = parse_profile(options.profile)
+    except ValueError as error:
+        parser.error("--profile: {}".format(error))
+    try:
+        function_ids = [int(f) for f in options.functions.split(",")]
+    except ValueError:
+        parser.error("--functions: {!r} is not a comma-separated list of integers".format(options.functions))
+    if options.meids < 1:
+        parser.error("--meids must be at least 1")
+
+    meids = ["{}{:05d}".format(options.meid_prefix, n).encode() for n in range(options.meids)]
+    transport = RmrTransport(options.port)
+    simulator = E2NodeSimulator(transport, meids, options.request_id, options.instance_id,
+                                function_ids, options.action_id,
+                                options.header_size, options.message_size, mtype=options.mtype)
+    try:
+        result = simulator.run(profile, report=lambda stats: print(json.dumps(stats)))
+        print(json.dumps(result))
+    except KeyboardInterrupt:
+        mdc_logger.info("E2 node simulator interrupted")
+    finally:
+        transport.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -19,9 +19,194 @@
 #   Abstract:   This is a collection of extensions to the RMR base package
 #               which are likely to be convenient for Python programs.
 
+import time
+import traceback
+from ctypes import addressof
+from threading import Lock
 from ricxappframe.rmr import rmr
 
 
+def _sbuf_key(sbuf):
+    """
+    Answers a key that identifies the message buffer, which is
+    the address of the C structure. Mock buffers (see rmr_mocks)
+    are not ctypes objects; they are identified by object id.
+    """
+    try:
+        return addressof(sbuf.contents)
+    except TypeError:
+        return id(sbuf)
+
+
+class SbufTracker:
+    """
+    Keeps account of received message buffers that were handed out
+    but not yet freed. Tracking is off by default and costs a single
+    flag test per message in that state. When enabled, every buffer
+    returned by the receive helpers is recorded with a timestamp and
+    the stack (or a description) of where it was handed out, and
+    buffers freed via rmr_free_msg_tracked, RmrMessage or the xapp
+    rmr_free method are removed again. Buffers that stay outstanding
+    longer than leak_age seconds are reported as leaks.
+
+    The module-level instance sbuf_tracker is used by the framework.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._leak_age = 60
+        self._outstanding = {}
+        self._lock = Lock()
+
+    def enable(self, enabled=True, leak_age=60):
+        """
+        Turns tracking on or off; turning it off forgets all records.
+
+        Parameters
+        ----------
+        enabled: bool (optional, default is True)
+            Whether to track buffers
+        leak_age: float (optional, default is 60)
+            Number of seconds after which an outstanding buffer counts as leaked
+        """
+        with self._lock:
+            self.enabled = enabled
+            self._leak_age = leak_age
+            self._outstanding = {}
+
+    def track(self, sbuf, where=None):
+        """
+        Records the buffer as outstanding, replacing any earlier record.
+
+        Parameters
+        ----------
+        sbuf: ctypes c_void_p
+            Pointer to an rmr message buffer
+        where: string (optional)
+            Description of the new owner; if None, the current stack is recorded
+        """
+        if not self.enabled:
+            return
+        if where is None:
+            where = "".join(traceback.format_stack()[:-1])
+        with self._lock:
+            self._outstanding[_sbuf_key(sbuf)] = (time.time(), where)
+
+    def untrack(self, sbuf):
+        """
+        Removes the record of the buffer, if any.
+
+        Parameters
+        ----------
+        sbuf: ctypes c_void_p
+            Pointer to an rmr message buffer
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._outstanding.pop(_sbuf_key(sbuf), None)
+
+    def leaks(self):
+        """
+        Returns a list of (age in seconds, where) tuples, one for each
+        buffer that has been outstanding longer than leak_age seconds.
+        """
+        now = time.time()
+        with self._lock:
+            records = list(self._outstanding.values())
+        return [(now - t, where) for (t, where) in records if now - t > self._leak_age]
+
+    def stats(self):
+        """
+        Returns a dict with the tracking state, the number of
+        outstanding buffers and the number of those that are leaks.
+        """
+        with self._lock:
+            outstanding = len(self._outstanding)
+        return {"enabled": self.enabled, "outstanding": outstanding, "leaked": len(self.leaks())}
+
+
+#: Tracker used by the receive helpers and the xapp framework
+sbuf_tracker = SbufTracker()
+
+
+def rmr_free_msg_tracked(sbuf):
+    """
+    Frees an rmr message buffer and removes it from sbuf_tracker.
+    Use this instead of rmr.rmr_free_msg for received buffers so that
+    leak tracking stays accurate.
+
+    Parameters
+    ----------
+        sbuf: ctypes c_void_p
+            Pointer to an rmr message buffer
+    """
+    sbuf_tracker.untrack(sbuf)
+    rmr.rmr_free_msg(sbuf)
+
+
+class RmrMessage:
+    """
+    Owns a received message buffer together with its summary and
+    frees the buffer when the owner is done with it, so handlers do
+    not need to remember rmr_free_msg. Use as a context manager::
+
+        with RmrMessage(summary, sbuf) as msg:
+            handle(msg.summary)
+
+    The buffer is freed when the with block exits, or when free() is
+    called. A handler that needs the buffer beyond that point, for
+    example to return it to the sender later, calls keep(); from then
+    on the handler owns the buffer and must free it itself.
+    Calling free() more than once is safe.
+
+    Parameters
+    ----------
+    summary: dict
+        The message summary
+    sbuf: ctypes c_void_p
+        Pointer to the rmr message buffer
+    """
+    __slots__ = ('summary', 'sbuf', '_owned')
+
+    def __init__(self, summary, sbuf):
+        self.summary = summary
+        self.sbuf = sbuf
+        self._owned = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.free()
+
+    def owns(self, sbuf):
+        """
+        Returns True if this message still owns the specified buffer.
+        """
+        return self._owned and _sbuf_key(sbuf) == _sbuf_key(self.sbuf)
+
+    def keep(self):
+        """
+        Transfers ownership of the buffer to the caller, who must free it.
+
+        Returns
+        -------
+        ctypes c_void_p
+            Pointer to the rmr message buffer
+        """
+        self._owned = False
+        return self.sbuf
+
+    def free(self):
+        """
+        Frees the buffer unless it was kept or freed already.
+        """
+        if self._owned:
+            self._owned = False
+            rmr_free_msg_tracked(self.sbuf)
+
+
 def rmr_rcvall_msgs(mrc, pass_filter=None, timeout=0):
     """
     Assembles an array of all messages which can be received without blocking
@@ -88,6 +273,7 @@ def rmr_rcvall_msgs_raw(mrc, pass_filter=None, timeout=0):
     list of tuple:
         List of tuples [(S, sbuf),...] where S is a message summary (dict), and sbuf is the raw message; may be empty.
         The caller MUST call rmr.rmr_free_msg(sbuf) when finished with each sbuf to prevent memory leaks!
+        Wrapping each tuple in an RmrMessage does that automatically.
     """
 
     new_messages = []
@@ -102,6 +288,7 @@ def rmr_rcvall_msgs_raw(mrc, pass_filter=None, timeout=0):
             break
 
         if pass_filter is None or len(pass_filter) == 0 or mbuf.contents.mtype in pass_filter:  # no filter, or passes; capture it
+            sbuf_tracker.track(mbuf)
             new_messages.append((summary, mbuf))  # caller is responsible for freeing the buffer
         else:
             rmr.rmr_free_msg(mbuf)  # free the filtered-out message buffer
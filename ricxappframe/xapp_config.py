@@ -0,0 +1,254 @@
+# ==================================================================================
+#       Copyright (c) 2026 The O-RAN Software Community contributors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#          http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+# ==================================================================================
+
+"""
+Contains the xapp configuration-file watcher.
+"""
+
+import json
+from threading import Thread, current_thread
+
+import inotify_simple
+from mdclogpy import Logger
+
+
+mdc_logger = Logger(name=__name__)
+
+
+class ConfigWatcher:
+    """
+    Watches the xapp configuration file in a thread of its own and
+    calls a handler with the parsed JSON content after each change.
+
+    Editors and config-map updates often write a file in several
+    steps, each producing an inotify MODIFY event. The watcher waits
+    until no event arrived for the debounce interval, then reads and
+    parses the file once and calls the handler once. If the file does
+    not hold valid JSON at that moment, the error is logged and the
+    handler is not called; the next write triggers a new attempt.
+
+    Parameters
+    ----------
+    path: string
+        Path of the configuration file
+    handler: function
+        Called with the parsed JSON content; its signature should be handler(data).
+        It runs in the watcher thread.
+    debounce: float (optional, default is 0.1)
+        Number of seconds without events after which a change is considered complete
+    inotify: inotify_simple.INotify (optional, default is None)
+        Watcher to read events from, with a watch on path already
+        added; if None, a new one is created. The ConfigWatcher takes
+        ownership and closes it in stop().
+    """
+
+    # milliseconds to wait for an event before checking the stop flag
+    _POLL_TIMEOUT = 1000
+
+    def __init__(self, path, handler, debounce=0.1, inotify=None):
+        self._path = path
+        self._handler = handler
+        self._debounce_ms = int(debounce * 1000)
+        if inotify is None:
+            inotify = inotify_simple.INotify()
+            inotify.add_watch(path, inotify_simple.flags.MODIFY)
+        self._inotify = inotify
+        self._keep_going = True
+        self._thread = Thread(target=self._loop)
+        self._thread.start()
+
+    def _loop(self):
+        mdc_logger.debug("Config watcher starts on {}".format(self._path))
+        while self._keep_going:
+            if not list(self._inotify.read(timeout=self._POLL_TIMEOUT)):
+                continue
+            # coalesce a burst of events into a single change
+            while self._keep_going and list(self._inotify.read(timeout=self._debounce_ms)):
+                pass
+            if self._keep_going:
+                self._deliver()
+        mdc_logger.debug("Config watcher ends")
+
+    def _deliver(self):
+        try:
+            with open(self._path) as json_file:
+                data = json.load(json_file)
+        except (OSError, ValueError) as error:
+            mdc_logger.error("config watcher: cannot read {}: {}".format(self._path, error))
+            return
+        try:
+            self._handler(data)
+        except Exception as error:
+            mdc_logger.error("config watcher: configuration handler failed: {}".format(error))
+
+    def stop(self):
+        """
+        Stops the watcher thread and closes the inotify watcher. The
+        handler may call stop; the thread then ends once the handler
+        returns.
+        """
+        self._keep_going = False
+        if current_thread() is not self._thread:
+            self._thread.join()
+        self._inotify.close()
+
+
+def _split_path(json_path):
+    """
+    Splits a JSON pointer (RFC 6901) such as "/controls/threshold"
+    into a tuple of keys. The empty string denotes the whole document.
+    """
+    if json_path == "":
+        return ()
+    if not json_path.startswith("/"):
+        raise ValueError("JSON pointer must be empty or start with '/': {}".format(json_path))
+    return tuple(key.replace("~1", "/").replace("~0", "~") for key in json_path[1:].split("/"))
+
+
+def _join_path(keys):
+    return "".join("/" + str(key).replace("~", "~0").replace("/", "~1") for key in keys)
+
+
+def config_get(config, json_path):
+    """
+    Returns the part of a configuration at the specified path.
+
+    Parameters
+    ----------
+    config: dict
+        Parsed configuration
+    json_path: string
+        JSON pointer, e.g. "/controls/threshold"; "" is the whole configuration.
+        List elements are addressed by their index.
+
+    Returns
+    -------
+    The value at the path, or None if the path does not exist
+    """
+    value = config
+    for key in _split_path(json_path):
+        if isinstance(value, dict):
+            value = value.get(key)
+        elif isinstance(value, list) and key.isdigit() and int(key) < len(value):
+            value = value[int(key)]
+        else:
+            return None
+    return value
+
+
+def _diff_keys(old, new):
+    """
+    Returns the key tuples of the smallest subtrees that differ; see config_diff.
+    """
+    changed = []
+
+    def diff(a, b, keys):
+        if isinstance(a, dict) and isinstance(b, dict):
+            for key in list(a) + [k for k in b if k not in a]:
+                if key not in a or key not in b:
+                    changed.append(keys + (key,))
+                else:
+                    diff(a[key], b[key], keys + (key,))
+        elif a != b or type(a) is not type(b):
+            changed.append(keys)
+
+    diff(old, new, ())
+    return changed
+
+
+def config_diff(old, new):
+    """
+    Compares two configurations and returns the paths of the smallest
+    subtrees that differ. Objects are compared key by key; any other
+    values, including lists, are compared as a whole.
+
+    Parameters
+    ----------
+    old: dict
+        Previous configuration; may be None
+    new: dict
+        Current configuration; may be None
+
+    Returns
+    -------
+    list of string
+        JSON pointers of changed, added or removed subtrees; empty if
+        the configurations are equal
+    """
+    return [_join_path(keys) for keys in _diff_keys(old, new)]
+
+
+class ConfigSections:
+    """
+    Keeps the current configuration snapshot and the handlers
+    registered for sections of it. On update, the new configuration
+    is compared structurally with the snapshot, the snapshot is
+    replaced in a single assignment, and only the handlers whose
+    section changed are called. Readers of the snapshot therefore
+    never need a lock, but must treat it as read-only.
+
+    Parameters
+    ----------
+    config: dict (optional, default is None)
+        Initial configuration snapshot
+    """
+
+    def __init__(self, config=None):
+        self.snapshot = config
+        self._handlers = {}
+
+    def register(self, json_path, handler):
+        """
+        Registers handler(value) to be called when the section at
+        json_path changes. If this method is called multiple times for
+        a single path, the "last one wins".
+
+        Parameters
+        ----------
+        json_path: string
+            JSON pointer of the section, e.g. "/controls/threshold"
+        handler: function
+            Called with the new value of the section, None if it was removed
+        """
+        self._handlers[_split_path(json_path)] = handler
+
+    def update(self, config):
+        """
+        Installs a new configuration and calls the handlers of the
+        sections that changed.
+
+        Parameters
+        ----------
+        config: dict
+            New configuration
+
+        Returns
+        -------
+        list of string
+            JSON pointers of the changed subtrees; empty if nothing changed
+        """
+        changed = _diff_keys(self.snapshot, config)
+        if not changed:
+            return []
+        self.snapshot = config
+        for keys, handler in list(self._handlers.items()):
+            # the section changed if a change lies within it or replaced a subtree containing it
+            if any(keys[:len(c)] == c or c[:len(keys)] == keys for c in changed):
+                try:
+                    handler(config_get(config, _join_path(keys)))
+                except Exception as error:
+                    mdc_logger.error("config sections: handler for {} failed: {}".format(_join_path(keys), error))
+        return [_join_path(c) for c in changed]
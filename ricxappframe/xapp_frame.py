@@ -30,6 +30,7 @@ import inotify_simple
 from mdclogpy import Logger
 
 from ricxappframe import xapp_rmr
+from ricxappframe.xapp_config import ConfigSections, ConfigWatcher, config_get
 from ricxappframe.constants import sdl_namespaces
 
 import ricxappframe.entities.rnib.nodeb_info_pb2 as pb_nbi
@@ -37,7 +38,7 @@ import ricxappframe.entities.rnib.cell_pb2 as pb_cell
 from ricxappframe.entities.rnib.nb_identity_pb2 import NbIdentity
 from ricxappframe.entities.rnib.nodeb_info_pb2 import Node
 
-from ricxappframe.rmr import rmr
+from ricxappframe.rmr import rmr, helpers
 from ricxappframe.util.constants import Constants
 from ricxappframe.xapp_sdl import SDLWrapper
 import requests
@@ -59,8 +60,15 @@ class _BaseXapp:
 
     Parameters
     ----------
-    rmr_port: int (optional, default is 4562)
+    rmr_port: int or list of int (optional, default is 4562)
         Port on which the RMR library listens for incoming messages.
+        If a list is given, one RMR context with its own receive thread
+        is created per port, and all of them feed the same receive
+        queue; the index of a port in the list is the context number
+        accepted by rmr_send and rmr_rts. This allows splitting the
+        route table, e.g. indications on one port and control and
+        health messages on another, so one busy or stalled receive
+        path does not hold up the others.
 
     rmr_wait_for_ready: bool (optional, default is True)
         If this is True, then init waits until RMR is ready to send,
@@ -85,10 +93,19 @@ class _BaseXapp:
         self.logger = Logger(name=__name__)
         self._appthread = None
 
-        # Start rmr rcv thread
-        self._rmr_loop = xapp_rmr.RmrLoop(port=rmr_port, wait_for_ready=rmr_wait_for_ready)
+        # Start rmr rcv threads, one per port; all share the queue of the first
+        ports = rmr_port if isinstance(rmr_port, (list, tuple)) else [rmr_port]
+        self._rmr_loops = []
+        for context, port in enumerate(ports):
+            rcv_queue = self._rmr_loops[0].rcv_queue if self._rmr_loops else None
+            self._rmr_loops.append(xapp_rmr.RmrLoop(port=port, wait_for_ready=rmr_wait_for_ready, rcv_queue=rcv_queue,
+                                                    context=context))
+        self._rmr_loop = self._rmr_loops[0]
         self._mrc = self._rmr_loop.mrc  # for convenience
 
+        # message being dispatched by RMRXapp.run when it frees buffers automatically
+        self._dispatched_message = None
+
         # SDL
         self.sdl = SDLWrapper(use_fake_sdl)
 
@@ -293,19 +310,67 @@ class _BaseXapp:
 
     # Public rmr methods
 
-    def rmr_get_messages(self):
+    def rmr_get_messages(self, auto_free=False):
         """
         Returns a generator iterable over all items in the queue that
         have not yet been read by the client xapp. Each item is a tuple
         (S, sbuf) where S is a message summary dict and sbuf is the raw
         message. The caller MUST call rmr.rmr_free_msg(sbuf) when
         finished with each sbuf to prevent memory leaks!
+
+        Parameters
+        ----------
+        auto_free: bool (optional, default is False)
+            If True, each item is an rmr.helpers.RmrMessage instead of
+            a tuple, and its buffer is freed when the iteration moves
+            on to the next item or ends, unless the caller invoked
+            keep() on it. The caller must not free those buffers.
+        """
+        message = None
+        try:
+            while not self._rmr_loop.rcv_queue.empty():
+                (summary, sbuf) = self._rmr_loop.rcv_queue.get()
+                helpers.sbuf_tracker.track(sbuf)
+                if auto_free:
+                    message = helpers.RmrMessage(summary, sbuf)
+                    yield message
+                    message.free()
+                else:
+                    yield (summary, sbuf)
+        finally:
+            if message is not None:
+                message.free()
+
+    def wait_messages(self, timeout=None, max_batch=100):
+        """
+        Waits until at least one message is in the queue, then removes
+        and returns up to max_batch of them at once. Unlike polling
+        rmr_get_messages with a sleep in between, this returns as soon
+        as a message arrives and uses no CPU while the xapp is idle.
+        Each item is a tuple (S, sbuf) where S is a message summary
+        dict and sbuf is the raw message. The caller MUST free each
+        sbuf, e.g. with rmr_free or by wrapping the tuple in an
+        rmr.helpers.RmrMessage.
+
+        Parameters
+        ----------
+        timeout: float (optional, default is None)
+            Maximum number of seconds to wait; None waits forever
+        max_batch: int (optional, default is 100)
+            Maximum number of messages to return
+
+        Returns
+        -------
+        list of tuple
+            The messages in queue order; empty if the timeout expired
         """
-        while not self._rmr_loop.rcv_queue.empty():
-            (summary, sbuf) = self._rmr_loop.rcv_queue.get()
-            yield (summary, sbuf)
+        messages = self._rmr_loop.rcv_queue.get_batch(max_batch, timeout)
+        if helpers.sbuf_tracker.enabled:
+            for (_, sbuf) in messages:
+                helpers.sbuf_tracker.track(sbuf)
+        return messages
 
-    def rmr_send(self, payload, mtype, retries=100):
+    def rmr_send(self, payload, mtype, retries=100, context=0):
         """
         Allocates a buffer, sets payload and mtype, and sends
 
@@ -317,17 +382,20 @@ class _BaseXapp:
             message type
         retries: int (optional)
             Number of times to retry at the application level before excepting RMRFailure
+        context: int (optional, default is 0)
+            Index of the RMR context (see rmr_port) to send on
 
         Returns
         -------
         bool
             whether or not the send worked after retries attempts
         """
-        sbuf = rmr.rmr_alloc_msg(vctx=self._mrc, size=len(payload), payload=payload, gen_transaction_id=True,
+        mrc = self._rmr_loops[context].mrc
+        sbuf = rmr.rmr_alloc_msg(vctx=mrc, size=len(payload), payload=payload, gen_transaction_id=True,
                                  mtype=mtype)
 
         for _ in range(retries):
-            sbuf = rmr.rmr_send_msg(self._mrc, sbuf)
+            sbuf = rmr.rmr_send_msg(mrc, sbuf)
             if sbuf.contents.state == 0:
                 self.rmr_free(sbuf)
                 return True
@@ -335,7 +403,7 @@ class _BaseXapp:
         self.rmr_free(sbuf)
         return False
 
-    def rmr_rts(self, sbuf, new_payload=None, new_mtype=None, retries=100):
+    def rmr_rts(self, sbuf, new_payload=None, new_mtype=None, retries=100, context=0):
         """
         Allows the xapp to return to sender, possibly adjusting the
         payload and message type before doing so.  This does NOT free
@@ -352,14 +420,19 @@ class _BaseXapp:
             New message type (replaces the received message)
         retries: int (optional, default 100)
             Number of times to retry at the application level
+        context: int (optional, default is 0)
+            Index of the RMR context (see rmr_port) to reply on; this
+            should be the context the message arrived on, which is
+            available in the summary as xapp_rmr.RMR_MS_CONTEXT
 
         Returns
         -------
         bool
             whether or not the send worked after retries attempts
         """
+        mrc = self._rmr_loops[context].mrc
         for _ in range(retries):
-            sbuf = rmr.rmr_rts_msg(self._mrc, sbuf, payload=new_payload, mtype=new_mtype)
+            sbuf = rmr.rmr_rts_msg(mrc, sbuf, payload=new_payload, mtype=new_mtype)
             if sbuf.contents.state == 0:
                 return True
 
@@ -370,16 +443,55 @@ class _BaseXapp:
         """
         Frees an rmr message buffer after use
 
-        Note: this does not need to be a class method, self is not
-        used. However if we break it out as a function we need a home
-        for it.
+        If the buffer belongs to the message currently dispatched by
+        RMRXapp.run with automatic freeing, it is only marked as freed,
+        so existing handlers that free their buffers keep working.
 
         Parameters
         ----------
         sbuf: ctypes c_void_p
              Pointer to an rmr message buffer
         """
-        rmr.rmr_free_msg(sbuf)
+        message = self._dispatched_message
+        if message is not None and message.owns(sbuf):
+            message.free()
+        else:
+            helpers.rmr_free_msg_tracked(sbuf)
+
+    def rmr_keep(self, sbuf):
+        """
+        Tells RMRXapp.run not to free the buffer of the message being
+        dispatched when the handler returns, for example because the
+        handler wants to return it to the sender later. The caller
+        then owns the buffer and must call rmr_free when done.
+        This has no effect if automatic freeing is not in use.
+
+        Parameters
+        ----------
+        sbuf: ctypes c_void_p
+             Pointer to an rmr message buffer
+        """
+        message = self._dispatched_message
+        if message is not None and message.owns(sbuf):
+            message.keep()
+
+    def stats(self):
+        """
+        Returns run-time statistics of the framework as a dict. The
+        "rmr" entry holds the state of the receive queue and the
+        message buffer accounting; see rmr.helpers.SbufTracker, which
+        must be enabled to count outstanding and leaked buffers. The
+        "sdl" entry holds the latency, payload and error statistics of
+        the SDL calls and the slow call log; see SDLWrapper.stats.
+
+        Returns
+        -------
+        dict
+        """
+        rcv_queue = self._rmr_loop.rcv_queue
+        queue_stats = rcv_queue.stats() if hasattr(rcv_queue, "stats") else {"queued": rcv_queue.qsize()}
+        return {"rmr": {"rcv_queue": queue_stats, "sbufs": helpers.sbuf_tracker.stats()},
+                "sdl": self.sdl.stats()}
 
     # Convenience (pass-thru) function for invoking SDL.
 
@@ -772,7 +884,7 @@ class _BaseXapp:
         """
         this needs to be understood how this is supposed to work
         """
-        return self._rmr_loop.healthcheck() and self.sdl.healthcheck()
+        return all(loop.healthcheck() for loop in self._rmr_loops) and self.sdl.healthcheck()
 
     # Convenience function for discovering config change events
 
@@ -781,6 +893,10 @@ class _BaseXapp:
         Checks the watcher for configuration-file events. The watcher
         prerequisites and event mask are documented in __init__().
 
+        RMRXapp.run hands the watcher over to a thread that calls the
+        config handler on changes; from then on, this method always
+        returns an empty list.
+
         Parameters
         ----------
         timeout: int (optional)
@@ -814,12 +930,18 @@ class _BaseXapp:
 
         self.xapp_shutdown()
 
-        self._rmr_loop.stop()
+        for loop in self._rmr_loops:
+            loop.stop()
 
 
 # Public classes that Xapp writers should instantiate or subclass
 # to implement an Xapp.
 
+#: Dispatch received messages in arrival order
+SCHEDULING_FIFO = "fifo"
+#: Dispatch received messages round robin per E2 node (MEID)
+SCHEDULING_ROUND_ROBIN = "round_robin"
+
 
 class RMRXapp(_BaseXapp):
     """
@@ -829,12 +951,16 @@ class RMRXapp(_BaseXapp):
     and calls the appropriate client-registered consume callback on each.
 
     If environment variable CONFIG_FILE is defined, and that variable
-    contains a path to an existing file, this class polls a watcher
-    defined on that file to detect file-write events, and invokes a
-    configuration-change handler on each event. The handler is also
-    invoked at startup.  If no handler function is supplied to the
-    constructor, this class defines a default handler that only logs a
-    message.
+    contains a path to an existing file, this class watches that file
+    in a separate thread once run is called, and invokes a
+    configuration-change handler after each change; a burst of writes
+    is reported as one change, and a write that leaves the content
+    unchanged is not reported. The handler is also invoked at startup.
+    If no handler function is supplied to the constructor, this class
+    defines a default handler that only logs a message. Handlers for
+    sections of the configuration may be registered with
+    register_config_handler; they are only invoked when their section
+    changed. The current configuration is available as attribute config.
 
     Parameters
     ----------
@@ -848,11 +974,12 @@ class RMRXapp(_BaseXapp):
     config_handler: function (optional, default is documented above)
         A function with the signature (json) to be called at startup and each time
         a configuration-file change event is detected. The JSON object is read from
-        the configuration file, if the prerequisites are met.
+        the configuration file, if the prerequisites are met. Change events are
+        handled in the config watcher thread, concurrently with message handlers.
     config_handler argument json: dict
         The contents of the configuration file, parsed as JSON.
-    rmr_port: integer (optional, default is 4562)
-        Initialize RMR to listen on this port
+    rmr_port: integer or list of integers (optional, default is 4562)
+        Initialize RMR to listen on this port; see class _BaseXapp
     rmr_wait_for_ready: boolean (optional, default is True)
         Wait for RMR to signal ready before starting the dispatch loop
     use_fake_sdl: boolean (optional, default is False)
@@ -879,6 +1006,8 @@ class RMRXapp(_BaseXapp):
 
         # used for thread control
         self._keep_going = True
+        self._config_watcher = None
+        self._config_sections = ConfigSections()
 
         # register a default healthcheck handler
         # this default checks that rmr is working and SDL is working
@@ -887,7 +1016,8 @@ class RMRXapp(_BaseXapp):
         def handle_healthcheck(self, summary, sbuf):
             healthy = self.healthcheck()
             payload = b"OK\n" if healthy else b"ERROR [RMR or SDL is unhealthy]\n"
-            self.rmr_rts(sbuf, new_payload=payload, new_mtype=Constants.RIC_HEALTH_CHECK_RESP)
+            self.rmr_rts(sbuf, new_payload=payload, new_mtype=Constants.RIC_HEALTH_CHECK_RESP,
+                         context=summary.get(xapp_rmr.RMR_MS_CONTEXT, 0))
             self.rmr_free(sbuf)
 
         self.register_callback(handle_healthcheck, Constants.RIC_HEALTH_CHECK_REQ)
@@ -903,9 +1033,44 @@ class RMRXapp(_BaseXapp):
         if self._inotify:
             with open(self._config_path) as json_file:
                 data = json.load(json_file)
+            self._config_sections.update(data)
             self.logger.debug("run: invoking config handler at start")
             self._config_handler(self, data)
 
+    @property
+    def config(self):
+        """
+        The current configuration, parsed from the configuration file,
+        or None if no file is watched. A change replaces the whole
+        object at once, so handlers in any thread may read it without
+        locking, but must not modify it.
+        """
+        return self._config_sections.snapshot
+
+    def register_config_handler(self, json_path, handler):
+        """
+        Registers handler(self, value) to be called when the section of
+        the configuration at json_path changes, with the new value of
+        that section (None if it was removed). Sections that did not
+        change do not trigger their handlers, so a handler only needs
+        to rebuild the state that depends on its section. If the
+        configuration was already read, the handler is called once at
+        registration with the current value.
+
+        Parameters
+        ----------
+        json_path: string
+            JSON pointer (RFC 6901) of the section, e.g. "/controls/threshold";
+            the empty string denotes the whole configuration.
+        handler: function
+            a function with the signature (self, value)
+
+        Note if this method is called multiple times for a single path, the "last one wins".
+        """
+        self._config_sections.register(json_path, lambda value: handler(self, value))
+        if self.config is not None:
+            handler(self, config_get(self.config, json_path))
+
     def register_callback(self, handler, message_type):
         """
         registers this xapp to call handler(summary, buf) when an rmr message is received of type message_type
@@ -927,7 +1092,8 @@ class RMRXapp(_BaseXapp):
         """
         self._dispatch[message_type] = handler
 
-    def run(self, thread=False, rmr_timeout=5, inotify_timeout=0):
+    def run(self, thread=False, rmr_timeout=5, inotify_timeout=0, scheduling=SCHEDULING_FIFO, meid_weights=None,
+            meid_queue_size=1000, auto_free=False, meid_queue_total_size=100000):
         """
         This function should be called when the reactive Xapp is ready to start.
         After start, the Xapp's handlers will be called on received messages.
@@ -944,8 +1110,59 @@ class RMRXapp(_BaseXapp):
             Length of time to wait for an RMR message to arrive.
 
         inotify_timeout: integer (optional, default is 0 seconds)
-            Length of time to wait for an inotify event to arrive.
-        """
+            Unused; configuration changes are detected by a separate
+            watcher thread. Kept for compatibility.
+
+        scheduling: string (optional, default is SCHEDULING_FIFO)
+            Order in which received messages are dispatched. With
+            SCHEDULING_FIFO messages are dispatched in arrival order.
+            With SCHEDULING_ROUND_ROBIN messages are queued per E2 node
+            (MEID) and the nodes are served in turn, so a node that
+            floods the xapp only delays its own messages; see
+            xapp_rmr.MeidFairQueue.
+
+        meid_weights: dict (optional, default is None)
+            Only used with SCHEDULING_ROUND_ROBIN. Maps MEID (bytes) to
+            the number of messages dispatched for that node per round;
+            nodes not listed get weight 1.
+
+        meid_queue_size: integer (optional, default is 1000)
+            Only used with SCHEDULING_ROUND_ROBIN. Maximum number of
+            messages queued per node; when exceeded, the oldest message
+            of that node is dropped.
+
+        auto_free: bool (optional, default is False)
+            If True, the framework frees the buffer of each message when
+            its handler returns. A handler that needs the buffer later
+            calls rmr_keep(sbuf) and frees it itself afterwards.
+            Handlers that call rmr_free on their buffer also work.
+
+        meid_queue_total_size: integer (optional, default is 100000)
+            Only used with SCHEDULING_ROUND_ROBIN. Maximum number of
+            messages queued over all nodes, None for no limit; when
+            exceeded, the oldest message of the node with the most
+            queued messages is dropped.
+        """
+        if scheduling == SCHEDULING_ROUND_ROBIN:
+            fair_queue = xapp_rmr.MeidFairQueue(maxsize_per_meid=meid_queue_size, weights=meid_weights,
+                                                maxsize=meid_queue_total_size)
+            for rmr_loop in self._rmr_loops:
+                rmr_loop.set_rcv_queue(fair_queue)
+        elif scheduling != SCHEDULING_FIFO:
+            raise ValueError("run: unknown scheduling mode {}".format(scheduling))
+
+        # watch the configuration file off the dispatch path
+        if self._inotify:
+            def config_changed(data):
+                changed = self._config_sections.update(data)
+                if not changed:
+                    self.logger.debug("run: config file written without changes")
+                    return
+                self.logger.debug("run: invoking config handler on change of {}".format(changed))
+                self._config_handler(self, data)
+
+            self._config_watcher = ConfigWatcher(self._config_path, config_changed, inotify=self._inotify)
+            self._inotify = None  # the watcher owns it now
 
         def loop():
             while self._keep_going:
@@ -958,22 +1175,22 @@ class RMRXapp(_BaseXapp):
                     if not func:
                         func = self._default_handler
                     self.logger.debug("run: invoking msg handler on type {}".format(summary[rmr.RMR_MS_MSG_TYPE]))
-                    func(self, summary, sbuf)
+                    if helpers.sbuf_tracker.enabled:
+                        helpers.sbuf_tracker.track(sbuf, "handler {} for message type {}".format(
+                            getattr(func, "__qualname__", func), summary[rmr.RMR_MS_MSG_TYPE]))
+                    if auto_free:
+                        self._dispatched_message = helpers.RmrMessage(summary, sbuf)
+                        try:
+                            func(self, summary, sbuf)
+                        finally:
+                            self._dispatched_message.free()
+                            self._dispatched_message = None
+                    else:
+                        func(self, summary, sbuf)
                 except queue.Empty:
                     # the get timed out
                     pass
 
-                # poll configuration file watcher
-                try:
-                    events = self.config_check(timeout=inotify_timeout)
-                    for event in events:
-                        with open(self._config_path) as json_file:
-                            data = json.load(json_file)
-                        self.logger.debug("run: invoking config handler on change event {}".format(event))
-                        self._config_handler(self, data)
-                except Exception as error:
-                    self.logger.error("run: configuration handler failed: {}".format(error))
-
         if thread:
             Thread(target=loop).start()
         else:
@@ -986,6 +1203,9 @@ class RMRXapp(_BaseXapp):
         super().stop()
         self.logger.debug("Setting flag to end framework work loop.")
         self._keep_going = False
+        if self._config_watcher:
+            self._config_watcher.stop()
+            self._config_watcher = None
 
 
 class Xapp(_BaseXapp):
@@ -1002,8 +1222,8 @@ class Xapp(_BaseXapp):
     entrypoint: function
         This function is called when the Xapp class's run method is invoked.
         The function signature must be just function(self)
-    rmr_port: integer (optional, default is 4562)
-        Initialize RMR to listen on this port
+    rmr_port: integer or list of integers (optional, default is 4562)
+        Initialize RMR to listen on this port; see class _BaseXapp
     rmr_wait_for_ready: boolean (optional, default is True)
         Wait for RMR to signal ready before starting the dispatch loop
     use_fake_sdl: boolean (optional, default is False)
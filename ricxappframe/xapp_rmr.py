@@ -22,13 +22,49 @@ The general rmr API is via "rmr"
 
 import time
 import queue
-from threading import Thread
+from collections import OrderedDict, deque
+from threading import Condition, Lock, Thread
 from mdclogpy import Logger
 from ricxappframe.rmr import rmr, helpers
 
 
 mdc_logger = Logger(name=__name__)
 
+#: Key added to every message summary put on the receive queue; its value
+#: is the index of the RMR context (listen port) the message arrived on
+RMR_MS_CONTEXT = "rmr context"
+
+
+class RcvQueue(queue.Queue):
+    """
+    The default receive queue: a FIFO queue.Queue that can also hand
+    out a batch of items in a single lock acquisition.
+    """
+
+    def get_batch(self, max_items, timeout=None):
+        """
+        Waits until at least one item is available, then removes and
+        returns up to max_items items.
+
+        Parameters
+        ----------
+        max_items: int
+            Maximum number of items to return
+        timeout: float (optional, default is None)
+            Maximum number of seconds to wait; None waits forever
+
+        Returns
+        -------
+        list
+            The items in queue order; empty if the timeout expired
+        """
+        with self.not_empty:
+            if not self.not_empty.wait_for(self._qsize, timeout):
+                return []
+            items = [self._get() for _ in range(min(max_items, self._qsize()))]
+            self.not_full.notify()
+            return items
+
 
 class RmrLoop:
     """
@@ -39,7 +75,7 @@ class RmrLoop:
     running consume function does not block the reading of new messages.
     """
 
-    def __init__(self, port, wait_for_ready=True):
+    def __init__(self, port, wait_for_ready=True, rcv_queue=None, context=0):
         """
         sets up RMR, then launches a thread that reads and injects
         messages into a queue.
@@ -53,6 +89,15 @@ class RmrLoop:
             If True, then this function hangs until RMR is ready to
             send, which includes having a valid routing file. This can
             be set to False if the client only wants to *receive only*.
+
+        rcv_queue: queue-like object (optional)
+            Queue to put received messages into. Pass the queue of
+            another RmrLoop to have several RMR contexts feed a single
+            dispatcher. A new RcvQueue is created if not given.
+
+        context: int (optional, default is 0)
+            Index of this loop among the loops of an xapp; stored with
+            key RMR_MS_CONTEXT in the summary of every received message.
         """
 
         # Public
@@ -60,7 +105,8 @@ class RmrLoop:
         # We use a thread and a queue so that a long running consume callback function can
         # never block reads. IE a consume implementation could take a long time and the ring
         # size for rmr blows up here and messages are lost.
-        self.rcv_queue = queue.Queue()
+        self.rcv_queue = rcv_queue if rcv_queue is not None else RcvQueue()
+        self.context = context
 
         # RMR context; RMRFL_MTCALL puts RMR into a multithreaded mode, where a thread
         # populates a ring of messages that receive calls read from
@@ -72,6 +118,7 @@ class RmrLoop:
                 time.sleep(0.1)
 
         # Private
+        self._rcv_queue_lock = Lock()  # guards replacement of rcv_queue, see set_rcv_queue
         self._keep_going = True  # used to tell this thread to stop
         self._last_ran = time.time()  # used for healthcheck
         self._loop_is_running = False  # used in stop to know when it's safe to kill the mrc
@@ -89,8 +136,11 @@ class RmrLoop:
                 # Use a non-trivial timeout to avoid spinning the CPU.
                 # The function returns if no messages arrive for that
                 # interval, which allows a stop request to be processed.
-                for (msg, sbuf) in helpers.rmr_rcvall_msgs_raw(self.mrc, timeout=5000):
-                    self.rcv_queue.put((msg, sbuf))
+                new_messages = helpers.rmr_rcvall_msgs_raw(self.mrc, timeout=5000)
+                with self._rcv_queue_lock:
+                    for (msg, sbuf) in new_messages:
+                        msg[RMR_MS_CONTEXT] = self.context
+                        self.rcv_queue.put((msg, sbuf))
 
                 self._last_ran = time.time()
 
@@ -102,6 +152,40 @@ class RmrLoop:
         self._thread = Thread(target=loop)
         self._thread.start()
 
+    def set_rcv_queue(self, rcv_queue):
+        """
+        Replaces the queue that received messages are put into. Messages
+        still waiting in the current queue are moved to the new queue,
+        so nothing is lost or reordered by the switch.
+
+        Parameters
+        ----------
+        rcv_queue: queue-like object
+            Must offer the put/get/empty methods of queue.Queue and
+            the get_batch method of RcvQueue; for example a MeidFairQueue.
+        """
+        with self._rcv_queue_lock:
+            old_queue = self.rcv_queue
+            while not old_queue.empty():
+                rcv_queue.put(old_queue.get())
+            self.rcv_queue = rcv_queue
+
+    def inject(self, msg, sbuf):
+        """
+        Puts a message into the receive queue as if this loop had
+        received it, so that a test tool can feed an xapp in-process.
+
+        Parameters
+        ----------
+        msg: dict
+            Message summary, see rmr.message_summary
+        sbuf: ctypes c_void_p
+            Pointer to an rmr message buffer allocated on this loop's context
+        """
+        msg[RMR_MS_CONTEXT] = self.context
+        with self._rcv_queue_lock:
+            self.rcv_queue.put((msg, sbuf))
+
     def stop(self):
         """
         sets a flag that will cleanly stop the thread
@@ -133,3 +217,230 @@ class RmrLoop:
             the rmr loop is determined healthy if it has completed in the last (seconds)
         """
         return self._thread.is_alive() and ((time.time() - self._last_ran) < seconds)
+
+
+class MeidFairQueue:
+    """
+    A replacement for the FIFO receive queue that keeps a separate
+    sub-queue per E2 node (managed entity ID, MEID) and serves the
+    sub-queues in weighted round-robin order. A node that floods the
+    xapp with messages therefore only raises the latency of its own
+    messages.
+
+    Sub-queues are created when a MEID is first seen and discarded as
+    soon as they are drained, so the set of MEIDs may change at any
+    time. Each sub-queue holds at most maxsize_per_meid messages; when
+    a full sub-queue receives another message, its oldest message is
+    dropped and the buffer is freed. All sub-queues together hold at
+    most maxsize messages, so that a flood of distinct or spoofed MEIDs
+    cannot grow the queue without limit; when the queue is full, the
+    oldest message of the longest sub-queue is dropped. Put therefore
+    never blocks the RMR receive thread.
+
+    The class offers the subset of the queue.Queue interface used by
+    the framework: put, get, get_nowait, empty and qsize, as well as
+    get_batch of RcvQueue.
+
+    Parameters
+    ----------
+    maxsize_per_meid: int (optional, default is 1000)
+        Maximum number of messages held for a single MEID
+    weights: dict (optional, default is None)
+        Maps MEID (bytes) to the number of messages served from that
+        MEID per round; MEIDs not in the dict get weight 1.
+    maxsize: int (optional, default is 100000)
+        Maximum number of messages held over all MEIDs; None for no limit
+    """
+
+    def __init__(self, maxsize_per_meid=1000, weights=None, maxsize=100000):
+        if maxsize_per_meid < 1:
+            raise ValueError("maxsize_per_meid must be at least 1")
+        if maxsize is not None and maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self._maxsize_per_meid = maxsize_per_meid
+        self._maxsize = maxsize
+        self._weights = dict(weights) if weights else {}
+        self._not_empty = Condition()
+        # sub-queues in service order; the first entry is the one being served
+        self._queues = OrderedDict()
+        self._served = 0  # messages served from the first sub-queue in this round
+        self._size = 0
+        self._dropped = 0
+        self._dropped_overflow = 0
+        # with maxsize: sub-queue length -> MEIDs with sub-queues of that length, as dict keys
+        self._meids_by_length = {}
+        self._max_length = 0
+
+    def put(self, item, block=True, timeout=None):
+        """
+        Appends an item to the sub-queue of its MEID. The block and
+        timeout parameters exist for queue.Queue compatibility and are
+        ignored, because put never blocks.
+
+        Parameters
+        ----------
+        item: tuple
+            (summary, sbuf) as produced by the RMR receive loop
+        """
+        meid = item[0].get(rmr.RMR_MS_MEID)
+        with self._not_empty:
+            sub_queue = self._queues.get(meid)
+            if sub_queue is None:
+                sub_queue = self._queues[meid] = deque()
+            if len(sub_queue) >= self._maxsize_per_meid:
+                self._drop(meid)
+            elif self._maxsize is not None and self._size >= self._maxsize:
+                longest = next(iter(self._meids_by_length[self._max_length]))
+                self._drop(longest)
+                self._dropped_overflow += 1
+                if longest != meid and not self._queues[longest]:
+                    if next(iter(self._queues)) == longest:
+                        self._served = 0
+                    del self._queues[longest]
+            sub_queue.append(item)
+            self._size += 1
+            self._resized(meid, len(sub_queue) - 1, len(sub_queue))
+            self._not_empty.notify()
+
+    def get(self, block=True, timeout=None):
+        """
+        Removes and returns the next item in round-robin order.
+
+        Parameters
+        ----------
+        block: bool (optional, default is True)
+            Wait for an item if the queue is empty
+        timeout: float (optional, default is None)
+            Maximum number of seconds to wait; None waits forever
+
+        Returns
+        -------
+        tuple
+            (summary, sbuf)
+
+        Raises
+        ------
+        queue.Empty
+            If no item is available
+        """
+        with self._not_empty:
+            if not self._not_empty.wait_for(lambda: self._size > 0, timeout if block else 0):
+                raise queue.Empty
+            return self._pop()
+
+    def get_nowait(self):
+        """
+        Same as get(block=False).
+        """
+        return self.get(block=False)
+
+    def get_batch(self, max_items, timeout=None):
+        """
+        Waits until at least one item is available, then removes and
+        returns up to max_items items in round-robin order.
+
+        Parameters
+        ----------
+        max_items: int
+            Maximum number of items to return
+        timeout: float (optional, default is None)
+            Maximum number of seconds to wait; None waits forever
+
+        Returns
+        -------
+        list
+            The items; empty if the timeout expired
+        """
+        with self._not_empty:
+            if not self._not_empty.wait_for(lambda: self._size > 0, timeout):
+                return []
+            return [self._pop() for _ in range(min(max_items, self._size))]
+
+    def empty(self):
+        """
+        Returns True if no items are queued for any MEID.
+        """
+        return self._size == 0
+
+    def qsize(self):
+        """
+        Returns the number of items queued over all MEIDs.
+        """
+        return self._size
+
+    def set_weight(self, meid, weight):
+        """
+        Sets the number of messages served from the specified MEID per round.
+
+        Parameters
+        ----------
+        meid: bytes
+            Managed entity ID
+        weight: int
+            Positive number of messages
+        """
+        if weight < 1:
+            raise ValueError("weight must be at least 1")
+        with self._not_empty:
+            self._weights[meid] = weight
+
+    def stats(self):
+        """
+        Returns a dict with the current number of queued messages,
+        the number of MEIDs that have messages queued, the total number
+        of messages dropped, and how many of those were dropped because
+        the whole queue was full (dropped_overflow); the others were
+        dropped because their sub-queue was full.
+        """
+        with self._not_empty:
+            return {"queued": self._size, "meids": len(self._queues), "dropped": self._dropped,
+                    "dropped_overflow": self._dropped_overflow}
+
+    def _drop(self, meid):
+        """
+        Drops and frees the oldest message of a MEID. Caller must hold the lock.
+        """
+        sub_queue = self._queues[meid]
+        (_, old_sbuf) = sub_queue.popleft()
+        helpers.rmr_free_msg_tracked(old_sbuf)
+        self._size -= 1
+        self._dropped += 1
+        self._resized(meid, len(sub_queue) + 1, len(sub_queue))
+
+    def _resized(self, meid, old_length, length):
+        """
+        Moves a MEID to the length bucket of its sub-queue after the
+        length changed by one; only needed with maxsize. Caller must hold the lock.
+        """
+        if self._maxsize is None:
+            return
+        if old_length:
+            meids = self._meids_by_length[old_length]
+            del meids[meid]
+            if not meids:
+                del self._meids_by_length[old_length]
+        if length:
+            self._meids_by_length.setdefault(length, {})[meid] = None
+        if length > self._max_length:
+            self._max_length = length
+        elif self._max_length not in self._meids_by_length:
+            self._max_length -= 1
+
+    def _pop(self):
+        """
+        Takes the next item from the first sub-queue and rotates that
+        sub-queue to the back once it used up its weight or emptied.
+        Caller must hold the lock.
+        """
+        meid, sub_queue = next(iter(self._queues.items()))
+        item = sub_queue.popleft()
+        self._size -= 1
+        self._served += 1
+        if not sub_queue:
+            del self._queues[meid]
+            self._served = 0
+        elif self._served >= self._weights.get(meid, 1):
+            self._queues.move_to_end(meid)
+            self._served = 0
+        self._resized(meid, len(sub_queue) + 1, len(sub_queue))
+        return item
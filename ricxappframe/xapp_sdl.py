@@ -19,9 +19,856 @@
 sdl functionality
 """
 
+import asyncio
+import json
+import time
+import zlib
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from threading import Condition, Event, Lock, Thread, local
+
 import msgpack
+import ricsdl
+from mdclogpy import Logger
+from redis import exceptions as redis_exceptions
+from ricsdl.backend.redis import RedisBackend
+from ricsdl.exceptions import BackendError, NotConnected, RejectedByBackend, SdlException
 from ricsdl.syncstorage import SyncStorage
 
+mdc_logger = Logger(name=__name__)
+
+
+class Serializer:
+    """
+    Turns values into the bytes stored in SDL and back. SDLWrapper uses
+    a serializer per namespace or per call, see SDLWrapper.set_serializer.
+
+    Subclasses implement dumps and loads, and set format_id, the
+    number FramedSerializer writes into its header.
+    """
+    format_id = None
+
+    def dumps(self, value):
+        """
+        Returns value serialized to bytes.
+        """
+        raise NotImplementedError
+
+    def loads(self, data):
+        """
+        Returns the value that dumps turned into data.
+        """
+        raise NotImplementedError
+
+
+class RawSerializer(Serializer):
+    """
+    Stores bytes as they are; what usemsgpack=False does.
+    """
+    format_id = 0
+
+    def dumps(self, value):
+        return value
+
+    def loads(self, data):
+        return data
+
+
+class MsgpackSerializer(Serializer):
+    """
+    Serializes with msgpack, like usemsgpack=True, but reuses one
+    msgpack Packer per thread instead of creating one per value.
+    """
+    format_id = 1
+
+    def __init__(self):
+        self._local = local()
+
+    def dumps(self, value):
+        packer = getattr(self._local, "packer", None)
+        if packer is None:
+            packer = self._local.packer = msgpack.Packer(use_bin_type=True)
+        return packer.pack(value)
+
+    def loads(self, data):
+        return msgpack.unpackb(data, raw=False)
+
+
+class JsonSerializer(Serializer):
+    """
+    Serializes to compact UTF-8 JSON, which clients in any language can read.
+    """
+    format_id = 2
+
+    def dumps(self, value):
+        return json.dumps(value, separators=(",", ":")).encode()
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class ProtobufSerializer(Serializer):
+    """
+    Serializes protobuf messages of one class.
+
+    Parameters
+    ----------
+    message_class: class
+        The generated protobuf message class that loads returns
+    """
+    format_id = 3
+
+    def __init__(self, message_class):
+        self._message_class = message_class
+
+    def dumps(self, value):
+        return value.SerializeToString()
+
+    def loads(self, data):
+        return self._message_class.FromString(data)
+
+
+# serializers that FramedSerializer can use for a value written in another format
+_SERIALIZERS = {serializer.format_id: serializer for serializer in
+                (RawSerializer(), MsgpackSerializer(), JsonSerializer())}
+
+
+class FramedSerializer(Serializer):
+    """
+    Wraps another serializer and makes the stored values
+    self-describing, optionally compressing large ones with zlib.
+
+    Each value starts with a three-byte header: the marker 0xc1, which
+    msgpack never uses, the format_id of the serializer and flags, of
+    which bit 0 marks zlib compression. loads reads values written in
+    another raw, msgpack or JSON format by their header, and values
+    without the header, e.g. stored before the wrapper was used, with
+    the wrapped serializer.
+
+    Parameters
+    ----------
+    serializer: Serializer
+        Serializes the values
+    compress_threshold: int (optional, default is None)
+        Values of at least this many bytes are compressed, if that makes
+        them smaller; None never compresses
+    level: int (optional, default is 1)
+        zlib compression level, 1 (fastest) to 9 (smallest)
+    """
+    format_id = None
+
+    _MARKER = 0xc1
+    _COMPRESSED = 0x01
+
+    def __init__(self, serializer, compress_threshold=None, level=1):
+        if serializer.format_id is None:
+            raise ValueError("the serializer has no format_id")
+        self._serializer = serializer
+        self._compress_threshold = compress_threshold
+        self._level = level
+
+    def dumps(self, value):
+        body = self._serializer.dumps(value)
+        flags = 0
+        if self._compress_threshold is not None and len(body) >= self._compress_threshold:
+            compressed = zlib.compress(body, self._level)
+            if len(compressed) < len(body):
+                body = compressed
+                flags |= self._COMPRESSED
+        return bytes((self._MARKER, self._serializer.format_id, flags)) + body
+
+    def loads(self, data):
+        if len(data) < 3 or data[0] != self._MARKER:
+            return self._serializer.loads(data)
+        format_id = data[1]
+        body = data[3:]
+        if data[2] & self._COMPRESSED:
+            body = zlib.decompress(body)
+        if format_id == self._serializer.format_id:
+            return self._serializer.loads(body)
+        serializer = _SERIALIZERS.get(format_id)
+        if serializer is None:
+            raise ValueError("unknown serialization format {}".format(format_id))
+        return serializer.loads(body)
+
+
+_RAW = _SERIALIZERS[RawSerializer.format_id]
+_MSGPACK = _SERIALIZERS[MsgpackSerializer.format_id]
+
+
+class SDLCache:
+    """
+    A local cache of serialized SDL values, evicting the least recently
+    used entry when full and expiring entries after a time to live.
+    Caching is enabled per namespace. Absent keys are cached too.
+
+    Values are kept as the bytes stored in SDL, so callers get a fresh
+    object on every read and cannot alter the cached value.
+
+    Every invalidation advances a generation counter. A value read from
+    SDL is stored only if no invalidation happened since the read
+    started, so a concurrent write is never hidden by a stale value.
+
+    Parameters
+    ----------
+    maxsize: int (optional, default is 10000)
+        Maximum number of cached keys over all namespaces
+    """
+
+    def __init__(self, maxsize=10000):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self._maxsize = maxsize
+        self._entries = OrderedDict()  # (ns, key) -> (expiry time, value or None if absent)
+        self._ttls = {}
+        self._counts = {}  # ns -> [hits, misses]
+        self._lock = Lock()
+        self._generation = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def enable(self, ns, ttl=5.0):
+        """
+        Enables caching for a namespace.
+
+        Parameters
+        ----------
+        ns: string
+            SDL namespace
+        ttl: float (optional, default is 5.0)
+            Seconds a value stays cached
+        """
+        with self._lock:
+            self._ttls[ns] = ttl
+            self._counts.setdefault(ns, [0, 0])
+
+    def disable(self, ns):
+        """
+        Disables caching for a namespace and drops its entries.
+        """
+        with self._lock:
+            self._ttls.pop(ns, None)
+        self.invalidate(ns)
+
+    def enabled(self, ns):
+        return ns in self._ttls
+
+    def generation(self):
+        return self._generation
+
+    def lookup(self, ns, key, stale=False):
+        """
+        Returns a tuple (found, value); value is None if the key was
+        cached as absent. Counts a hit or a miss. If stale is True,
+        expired entries that were not evicted or invalidated are found too.
+        """
+        with self._lock:
+            entry = self._entries.get((ns, key))
+            counts = self._counts.setdefault(ns, [0, 0])
+            if entry is not None and (stale or entry[0] > time.monotonic()):
+                self._entries.move_to_end((ns, key))
+                counts[0] += 1
+                return True, entry[1]
+            counts[1] += 1
+            return False, None
+
+    def store(self, ns, key, value, generation):
+        """
+        Caches a value read from SDL, unless the namespace is not
+        enabled or an invalidation happened after generation was taken.
+        """
+        with self._lock:
+            ttl = self._ttls.get(ns)
+            if ttl is None or generation != self._generation:
+                return
+            self._entries[(ns, key)] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end((ns, key))
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, ns, keys=None):
+        """
+        Drops cached keys of a namespace.
+
+        Parameters
+        ----------
+        ns: string
+            SDL namespace
+        keys: iterable of string (optional, default is None)
+            Keys to drop; None drops the whole namespace
+        """
+        with self._lock:
+            self._generation += 1
+            self._invalidations += 1
+            if keys is None:
+                for entry in [entry for entry in self._entries if entry[0] == ns]:
+                    del self._entries[entry]
+            else:
+                for key in keys:
+                    self._entries.pop((ns, key), None)
+
+    def stats(self):
+        """
+        Returns the cache statistics.
+
+        Returns
+        -------
+        dict
+            size: number of cached keys
+            hits, misses: over all namespaces
+            evictions: entries dropped because the cache was full
+            invalidations: invalidate calls
+            namespaces: dict of {"hits", "misses"} per namespace
+        """
+        with self._lock:
+            return {"size": len(self._entries),
+                    "hits": sum(counts[0] for counts in self._counts.values()),
+                    "misses": sum(counts[1] for counts in self._counts.values()),
+                    "evictions": self._evictions,
+                    "invalidations": self._invalidations,
+                    "namespaces": {ns: {"hits": counts[0], "misses": counts[1]} for ns, counts in self._counts.items()}}
+
+
+class SDLWriteBuffer:
+    """
+    A write-behind buffer that collects key-value writes per namespace
+    and hands them to the backend as one multi-key write. A later write
+    to a pending key replaces the pending value, so only the last write
+    per key within a window reaches the backend.
+
+    A background thread flushes when the number of pending keys reaches
+    max_pending, or max_delay seconds after the first pending write.
+    Writes are flushed in order: a flush waits for a running one.
+
+    Parameters
+    ----------
+    write: function
+        Writes one namespace; its signature should be write(ns, data)
+        where data is a dict of key to value.
+    max_pending: int (optional, default is 1000)
+        Number of pending keys that triggers a flush
+    max_delay: float (optional, default is 0.1)
+        Seconds a write may stay pending
+    on_error: function (optional, default is None)
+        Called as on_error(ns, data, error) in the flushing thread when a
+        write fails; the data is not retried. If None, the error is logged.
+    """
+
+    def __init__(self, write, max_pending=1000, max_delay=0.1, on_error=None):
+        if max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+        self._write = write
+        self._max_pending = max_pending
+        self._max_delay = max_delay
+        self._on_error = on_error
+        self._pending = {}  # ns -> {key: value}
+        self._inflight = {}  # ns -> {key: value} being written
+        self._count = 0
+        self._first_time = None
+        self._cond = Condition()
+        self._write_lock = Lock()  # keeps flushes in order
+        self._keep_going = True
+        self._stats = {"writes": 0, "coalesced": 0, "flushes": 0, "keys_written": 0, "errors": 0}
+        self._thread = Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._keep_going and not self._due():
+                    timeout = None if self._first_time is None else \
+                        max(self._first_time + self._max_delay - time.monotonic(), 0)
+                    self._cond.wait(timeout)
+                if not self._keep_going:
+                    return
+            self.flush()
+
+    def _due(self):
+        return self._count >= self._max_pending or \
+            (self._first_time is not None and time.monotonic() >= self._first_time + self._max_delay)
+
+    def put(self, ns, key, value):
+        """
+        Adds a write; replaces the pending value of the key, if any.
+        """
+        with self._cond:
+            data = self._pending.setdefault(ns, {})
+            self._stats["writes"] += 1
+            if key in data:
+                self._stats["coalesced"] += 1
+            else:
+                self._count += 1
+            data[key] = value
+            if self._first_time is None:
+                self._first_time = time.monotonic()
+            if self._count >= self._max_pending:
+                self._cond.notify()
+            elif self._count == 1:
+                self._cond.notify()  # start the timer of the flushing thread
+
+    def lookup(self, ns, key):
+        """
+        Returns a tuple (found, value) for a key that is pending or being written.
+        """
+        with self._cond:
+            for data in (self._pending.get(ns), self._inflight.get(ns)):
+                if data is not None and key in data:
+                    return True, data[key]
+        return False, None
+
+    def has_pending(self, ns):
+        with self._cond:
+            return ns in self._pending or ns in self._inflight
+
+    def flush(self, ns=None):
+        """
+        Writes the pending keys of a namespace, or of all namespaces, now.
+
+        Parameters
+        ----------
+        ns: string (optional, default is None)
+            SDL namespace; None flushes all namespaces
+        """
+        with self._write_lock:
+            with self._cond:
+                if ns is None:
+                    batch = self._pending
+                    self._pending = {}
+                else:
+                    batch = {ns: self._pending.pop(ns)} if ns in self._pending else {}
+                self._count -= sum(len(data) for data in batch.values())
+                if self._count == 0:
+                    self._first_time = None
+                self._inflight = batch
+            try:
+                for batch_ns, data in batch.items():
+                    self._stats["flushes"] += 1
+                    try:
+                        self._write(batch_ns, data)
+                        self._stats["keys_written"] += len(data)
+                    except Exception as error:
+                        self._stats["errors"] += 1
+                        if self._on_error is not None:
+                            self._on_error(batch_ns, data, error)
+                        else:
+                            mdc_logger.error("SDL write-behind of {} keys in {} failed: {}".format(
+                                len(data), batch_ns, error))
+            finally:
+                with self._cond:
+                    self._inflight = {}
+
+    def close(self):
+        """
+        Stops the flushing thread and flushes the pending writes.
+        """
+        with self._cond:
+            self._keep_going = False
+            self._cond.notify()
+        self._thread.join()
+        self.flush()
+
+    def stats(self):
+        """
+        Returns the buffer statistics.
+
+        Returns
+        -------
+        dict
+            pending: number of pending keys
+            writes: number of put calls
+            coalesced: writes that replaced a pending value
+            flushes: multi-key writes to the backend
+            keys_written: keys written successfully
+            errors: failed multi-key writes
+        """
+        with self._cond:
+            return dict(self._stats, pending=self._count)
+
+
+class SDLStats:
+    """
+    Records the SDL calls of an SDLWrapper: per namespace and operation
+    a latency histogram, the bytes written and read, and the errors,
+    plus a ring buffer of the most recent slow calls.
+
+    Operations are the calls to the SDL backend, e.g. "get" or
+    "set_and_publish", so reads answered by the cache or writes still
+    in the write-behind buffer are not counted. Slow calls record only
+    a prefix of the key, to keep UE identities out of the log.
+
+    Parameters
+    ----------
+    slow_threshold: float (optional, default is 0.05)
+        Calls that take at least this many seconds are slow calls
+    slow_calls: int (optional, default is 100)
+        Number of most recent slow calls kept
+    key_prefix_length: int (optional, default is 16)
+        Number of characters of the key kept per slow call
+    """
+
+    # upper bounds, in seconds, of the latency histogram buckets; the last bucket is unbounded
+    BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+    def __init__(self, slow_threshold=0.05, slow_calls=100, key_prefix_length=16):
+        self._slow_threshold = slow_threshold
+        self._key_prefix_length = key_prefix_length
+        # (ns, operation) -> [calls, errors, seconds, max seconds, bytes written, bytes read, buckets]
+        self._operations = {}
+        self._slow = deque(maxlen=slow_calls)
+        self._lock = Lock()
+
+    def record(self, ns, operation, key, seconds, written=0, read=0, error=None):
+        """
+        Records one call.
+
+        Parameters
+        ----------
+        ns: string
+            SDL namespace
+        operation: string
+            Name of the SDL call
+        key: string
+            The (first) key or group of the call
+        seconds: float
+            Latency of the call
+        written: int (optional)
+            Bytes of the values sent
+        read: int (optional)
+            Bytes of the values received
+        error: Exception (optional)
+            The error the call raised, if any
+        """
+        with self._lock:
+            counts = self._operations.get((ns, operation))
+            if counts is None:
+                counts = self._operations[(ns, operation)] = [0, 0, 0.0, 0.0, 0, 0, [0] * (len(self.BUCKETS) + 1)]
+            counts[0] += 1
+            if error is not None:
+                counts[1] += 1
+            counts[2] += seconds
+            counts[3] = max(counts[3], seconds)
+            counts[4] += written
+            counts[5] += read
+            counts[6][bisect_left(self.BUCKETS, seconds)] += 1
+            if seconds >= self._slow_threshold:
+                self._slow.append({"time": time.time(), "ns": ns, "operation": operation,
+                                   "key_prefix": str(key)[:self._key_prefix_length], "seconds": seconds,
+                                   "error": None if error is None else type(error).__name__})
+
+    def reset(self):
+        """
+        Drops all recorded calls.
+        """
+        with self._lock:
+            self._operations.clear()
+            self._slow.clear()
+
+    def stats(self):
+        """
+        Returns the recorded calls.
+
+        Returns
+        -------
+        dict
+            buckets: the upper bounds of the histogram buckets, see BUCKETS
+            namespaces: per namespace, per operation a dict of calls,
+            errors, seconds (total), max_seconds, bytes_written, bytes_read
+            and histogram, the number of calls per bucket with one more
+            entry for the calls above the last bound
+            slow_calls: the most recent slow calls, oldest first, each a
+            dict of time, ns, operation, key_prefix, seconds and error
+        """
+        with self._lock:
+            namespaces = {}
+            for (ns, operation), counts in self._operations.items():
+                namespaces.setdefault(ns, {})[operation] = {
+                    "calls": counts[0], "errors": counts[1], "seconds": counts[2], "max_seconds": counts[3],
+                    "bytes_written": counts[4], "bytes_read": counts[5], "histogram": list(counts[6])}
+            return {"buckets": list(self.BUCKETS), "namespaces": namespaces, "slow_calls": list(self._slow)}
+
+
+def _payload_size(value):
+    """
+    Returns the number of bytes of the values in an SDL argument or result.
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        value = value.values()
+    elif not isinstance(value, (set, frozenset, list, tuple)):
+        return 0
+    return sum(len(item) for item in value if isinstance(item, (bytes, bytearray)))
+
+
+class SDLUpdateConflict(SdlException):
+    """
+    Raised by SDLWrapper.update and increment when other clients kept
+    changing a key for all attempts.
+    """
+
+
+def _add(delta, value):
+    return (value or 0) + delta
+
+
+def _item(name, value):
+    return value.get(name) if isinstance(value, dict) else None
+
+
+def _loads_or_none(serializer, data):
+    try:
+        return None if data is None else serializer.loads(data)
+    except Exception:
+        return None
+
+
+def _index_group(index, value):
+    """
+    Returns the name of the index group of an attribute value; JSON
+    keeps e.g. 1 and "1" apart.
+    """
+    return "{}:{}".format(index, json.dumps(value, sort_keys=True, default=str))
+
+
+class SDLCircuitOpen(NotConnected):
+    """
+    Raised instead of calling SDL while the circuit breaker is open,
+    see SDLWrapper.enable_circuit_breaker.
+    """
+
+
+class SDLCircuitBreaker:
+    """
+    Stops calls to a failing SDL backend. After failure_threshold
+    consecutive calls failed with one of failure_types, the circuit
+    opens: calls raise SDLCircuitOpen at once instead of waiting for the
+    backend to time out. While open, a background thread calls probe
+    every probe_interval seconds and closes the circuit as soon as it
+    returns True.
+
+    Parameters
+    ----------
+    probe: function
+        Health check without arguments that returns True when the
+        backend is usable, e.g. SyncStorage.is_active
+    failure_threshold: int (optional, default is 5)
+        Number of consecutive failures that opens the circuit
+    probe_interval: float (optional, default is 1.0)
+        Seconds between health probes while open
+    failure_types: tuple (optional, default is (NotConnected, BackendError))
+        Exception types that count as failures; others, e.g.
+        RejectedByBackend for a bad request, do not
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+
+    def __init__(self, probe, failure_threshold=5, probe_interval=1.0, failure_types=(NotConnected, BackendError)):
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1")
+        self._probe = probe
+        self._failure_threshold = failure_threshold
+        self._probe_interval = probe_interval
+        self._failure_types = failure_types
+        self._state = self.CLOSED
+        self._failures = 0
+        self._stopped = Event()
+        self._lock = Lock()
+        self._stats = {"opened": 0, "rejected": 0, "probes": 0}
+
+    @property
+    def state(self):
+        return self._state
+
+    def before_call(self):
+        """
+        Raises SDLCircuitOpen if the circuit is open.
+        """
+        if self._state == self.OPEN:
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise SDLCircuitOpen("SDL circuit breaker is open")
+
+    def success(self):
+        self._failures = 0
+
+    def failure(self, error):
+        """
+        Counts a failed call and opens the circuit at the threshold.
+        """
+        if isinstance(error, SDLCircuitOpen) or not isinstance(error, self._failure_types):
+            return
+        with self._lock:
+            self._failures += 1
+            if self._state == self.OPEN or self._failures < self._failure_threshold:
+                return
+            self._state = self.OPEN
+            self._stats["opened"] += 1
+        mdc_logger.error("SDL circuit breaker opened after {} failures: {}".format(self._failures, error))
+        Thread(target=self._probe_loop, daemon=True).start()
+
+    def _probe_loop(self):
+        while not self._stopped.wait(self._probe_interval):
+            with self._lock:
+                self._stats["probes"] += 1
+            try:
+                healthy = self._probe()
+            except Exception:
+                healthy = False
+            if healthy:
+                with self._lock:
+                    self._state = self.CLOSED
+                    self._failures = 0
+                mdc_logger.info("SDL circuit breaker closed")
+                return
+
+    def stop(self):
+        """
+        Stops probing; an open circuit stays open.
+        """
+        self._stopped.set()
+
+    def stats(self):
+        """
+        Returns the breaker statistics.
+
+        Returns
+        -------
+        dict
+            state: "closed" or "open"
+            failures: current number of consecutive failures
+            opened: number of times the circuit opened
+            rejected: calls failed fast while open
+            probes: health probes made
+        """
+        with self._lock:
+            return dict(self._stats, state=self._state, failures=self._failures)
+
+
+class _InstrumentedStorage:
+    """
+    Wraps an SDL SyncStorage and records the latency, payload sizes and
+    errors of its namespace calls in an SDLStats. If a breaker is set,
+    it guards the namespace calls. Other attributes are passed through.
+    """
+
+    _OPERATIONS = frozenset((
+        "set", "set_if", "set_if_not_exists", "get", "find_keys", "find_and_get", "remove", "remove_if",
+        "remove_all", "add_member", "remove_member", "remove_group", "get_members", "is_member", "group_size",
+        "set_and_publish", "set_if_and_publish", "set_if_not_exists_and_publish", "remove_and_publish",
+        "remove_if_and_publish", "remove_all_and_publish"))
+
+    # ricsdl versions whose Redis backend layout scan_keys relies on
+    _SCAN_RICSDL_VERSIONS = ("3.1",)
+
+    def __init__(self, storage, stats):
+        self._storage = storage
+        self._stats = stats
+        self._redis_clients = None
+        self.breaker = None
+
+    def __getattr__(self, name):
+        attribute = getattr(self._storage, name)
+        if name not in self._OPERATIONS:
+            return attribute
+
+        def instrumented(ns, *args):
+            # the keys follow the channels and events of the *_and_publish calls
+            keys = args[1:] if name.endswith("_and_publish") else args
+            key = keys[0] if keys else ""
+            if isinstance(key, (dict, set, frozenset, list)):
+                key = next(iter(key), "")
+            return self._call(name, ns, key, attribute, ns, *args)
+
+        return instrumented
+
+    def _call(self, name, ns, key, func, *args):
+        breaker = self.breaker
+        start = time.perf_counter()
+        try:
+            if breaker is not None:
+                breaker.before_call()
+            result = func(*args)
+        except Exception as error:
+            self._stats.record(ns, name, key, time.perf_counter() - start, error=error)
+            if breaker is not None:
+                breaker.failure(error)
+            raise
+        if breaker is not None:
+            breaker.success()
+        self._stats.record(ns, name, key, time.perf_counter() - start,
+                           sum(_payload_size(arg) for arg in args), _payload_size(result))
+        return result
+
+    def scan_keys(self, ns, pattern, count):
+        """
+        Yields the keys of a namespace that match pattern. With the Redis
+        backend of a known ricsdl version, each Redis SCAN call is made
+        and recorded as a "scan" operation; else find_keys lists the keys
+        at once.
+        """
+        client = self._redis_client(ns)
+        if client is None:
+            yield from self.find_keys(ns, pattern)
+            return
+        ns_prefix = "{" + ns + "},"
+        cursor = None
+        while cursor != 0:
+            cursor, keys = self._call("scan", ns, pattern, _redis_scan, client, cursor or 0,
+                                      ns_prefix + pattern, count)
+            for key in keys:
+                yield key.decode("utf-8")[len(ns_prefix):]
+
+    def _redis_client(self, ns):
+        """
+        Returns the Redis client of the namespace, with the same namespace
+        to client mapping as the ricsdl Redis backend, or None.
+        """
+        if self._redis_clients is None:
+            self._redis_clients = self._find_redis_clients()
+        clients = self._redis_clients
+        if not clients:
+            return None
+        return clients[zlib.crc32(ns.encode()) % len(clients)]
+
+    def _find_redis_clients(self):
+        """
+        Returns the Redis clients of the ricsdl Redis backend, which are
+        not part of the ricsdl interface; an empty list, and a logged
+        warning, if this ricsdl version is not known to lay them out as
+        expected.
+        """
+        get_backend = getattr(self._storage, "get_backend", None)
+        if get_backend is None or not isinstance(get_backend(), RedisBackend):
+            return []
+        backend = get_backend()
+        version = ".".join(getattr(ricsdl, "__version__", "").split(".")[:2])
+        clients = getattr(backend, "clients", None)
+        if version not in self._SCAN_RICSDL_VERSIONS or not clients or \
+                not all(hasattr(client, "redis_client") for client in clients):
+            mdc_logger.warning("SDL key scanning is not supported with ricsdl {}, "
+                               "using find_keys".format(getattr(ricsdl, "__version__", "unknown")))
+            return []
+        return [client.redis_client for client in clients]
+
+
+def _redis_scan(client, cursor, match, count):
+    """
+    Makes one Redis SCAN call and raises the SDL exceptions for Redis errors,
+    like the ricsdl Redis backend.
+    """
+    try:
+        return client.scan(cursor, match=match, count=count)
+    except (redis_exceptions.ConnectionError, redis_exceptions.TimeoutError) as error:
+        raise NotConnected(str(error)) from error
+    except redis_exceptions.ResponseError as error:
+        raise RejectedByBackend(str(error)) from error
+    except redis_exceptions.RedisError as error:
+        raise BackendError(str(error)) from error
+
 
 class SDLWrapper:
     """
@@ -33,7 +880,7 @@ class SDLWrapper:
     framework classes) so these features can be used outside Xapps.
     """
 
-    def __init__(self, use_fake_sdl=False):
+    def __init__(self, use_fake_sdl=False, stats=None, storage=None):
         """
         init
 
@@ -46,13 +893,270 @@ class SDLWrapper:
             This can be used while developing an xapp and also
             for monkeypatching during unit testing; e.g., the xapp
             framework unit tests do this.
+        stats: SDLStats (optional, default None)
+            Records the SDL calls; if None, an SDLStats with the
+            default settings is used. See stats.
+        storage: object (optional, default None)
+            The storage to use instead of SDL, with the interface of
+            ricsdl SyncStorage, e.g. a SharedMemoryStorage shared by the
+            processes of an xapp; see ricxappframe.xapp_sdl_shm.
+            use_fake_sdl is ignored if a storage is given.
+        """
+        if storage is None:
+            storage = SyncStorage(fake_db_backend="dict") if use_fake_sdl else SyncStorage()
+        self._stats = stats if stats is not None else SDLStats()
+        self._sdl = _InstrumentedStorage(storage, self._stats)
+        self._cache = None
+        self._channel_cbs = {}  # (ns, channel) -> callback of the client
+        self._cache_channels = {}  # (ns, channel) -> event_keys function of the cache
+        self._write_buffer = None
+        self._serializers = {}  # ns -> Serializer used when usemsgpack is True
+        self._serve_from_cache = False
+        self._update_counts = {}  # ns -> [updated, conflicts, failed]
+        self._indexes = {}  # ns -> {index: (attribute function, index namespace)}
+        self._update_lock = Lock()
+
+    def set_serializer(self, ns, serializer):
+        """
+        Sets how the values and group members of a namespace are
+        serialized when usemsgpack is True, the default. A serializer
+        passed to a method call takes precedence; usemsgpack=False still
+        stores bytes as they are.
+
+        Parameters
+        ----------
+        ns: string
+            SDL namespace
+        serializer: Serializer
+            E.g. FramedSerializer(JsonSerializer(), compress_threshold=4096);
+            None restores msgpack
         """
-        if use_fake_sdl:
-            self._sdl = SyncStorage(fake_db_backend="dict")
+        if serializer is None:
+            self._serializers.pop(ns, None)
         else:
-            self._sdl = SyncStorage()
+            self._serializers[ns] = serializer
+
+    def _serializer(self, ns, usemsgpack, serializer):
+        if serializer is not None:
+            return serializer
+        if not usemsgpack:
+            return _RAW
+        return self._serializers.get(ns, _MSGPACK)
+
+    def enable_write_behind(self, max_pending=1000, max_delay=0.1, on_error=None):
+        """
+        Makes set buffer its writes in an SDLWriteBuffer and write them
+        to SDL in the background as one multi-key set per namespace;
+        see SDLWriteBuffer for the parameters.
+
+        Reads through this wrapper see the buffered values. Any other
+        write to a namespace first flushes its buffered writes, so that
+        writes reach SDL in the order they were made. Other clients see
+        a buffered write only after the flush.
+        """
+        if self._write_buffer is None:
+            self._write_buffer = SDLWriteBuffer(self._write_many, max_pending, max_delay, on_error)
+
+    def disable_write_behind(self):
+        """
+        Flushes the buffered writes and makes set write directly again.
+        """
+        if self._write_buffer is not None:
+            self._write_buffer.close()
+            self._write_buffer = None
+
+    def flush(self, ns=None):
+        """
+        Writes the buffered writes of a namespace, or of all namespaces,
+        to SDL now. Does nothing unless write-behind is enabled.
+
+        Parameters
+        ----------
+        ns: string (optional, default is None)
+            SDL namespace; None flushes all namespaces
+        """
+        if self._write_buffer is not None:
+            self._write_buffer.flush(ns)
+
+    def write_behind_stats(self):
+        """
+        Returns the statistics of the write-behind buffer, see
+        SDLWriteBuffer.stats; an empty dictionary if it is not enabled.
+        """
+        return self._write_buffer.stats() if self._write_buffer is not None else {}
+
+    def stats(self):
+        """
+        Returns the statistics of the SDL calls, see SDLStats.stats,
+        with the statistics of the cache, of the write-behind buffer, of
+        the circuit breaker and of update and increment under "cache",
+        "write_behind", "circuit_breaker" and "updates".
+
+        Returns
+        -------
+        dict
+        """
+        breaker = self._sdl.breaker
+        return dict(self._stats.stats(), cache=self.cache_stats(), write_behind=self.write_behind_stats(),
+                    circuit_breaker=breaker.stats() if breaker is not None else {}, updates=self.update_stats())
+
+    def enable_circuit_breaker(self, failure_threshold=5, probe_interval=1.0, serve_from_cache=True):
+        """
+        Guards the SDL calls with an SDLCircuitBreaker that probes the
+        backend with is_active; see SDLCircuitBreaker for the parameters.
+        While the circuit is open, calls raise SDLCircuitOpen at once,
+        instead of blocking until SDL times out.
+
+        Parameters
+        ----------
+        serve_from_cache: bool (optional, default True)
+            While the circuit is open, get and get_many answer from the
+            cache, see enable_cache, including expired values; they raise
+            SDLCircuitOpen only for keys that are not cached.
+        """
+        if self._sdl.breaker is not None:
+            self._sdl.breaker.stop()
+        self._sdl.breaker = SDLCircuitBreaker(self.healthcheck, failure_threshold, probe_interval)
+        self._serve_from_cache = serve_from_cache
+
+    def disable_circuit_breaker(self):
+        """
+        Removes the circuit breaker; calls go to SDL again at once.
+        """
+        if self._sdl.breaker is not None:
+            self._sdl.breaker.stop()
+            self._sdl.breaker = None
+
+    def _get_values(self, ns, keys):
+        """
+        Gets keys from SDL; while the circuit is open, answers from the
+        cache if allowed and every key is cached. Returns a tuple of the
+        values and whether they came from the cache.
+        """
+        try:
+            return self._sdl.get(ns, keys), False
+        except SDLCircuitOpen:
+            cache = self._cache
+            if not self._serve_from_cache or cache is None or not cache.enabled(ns):
+                raise
+            values = {}
+            for key in keys:
+                found, value = cache.lookup(ns, key, stale=True)
+                if not found:
+                    raise
+                if value is not None:
+                    values[key] = value
+            return values, True
+
+    def _write_many(self, ns, data):
+        self._sdl.set(ns, data)
+        self._invalidate_many(ns, list(data))
+
+    def _flush_pending(self, ns):
+        """
+        Flushes the buffered writes of a namespace before another
+        write to it, or a read that buffered values cannot answer.
+        """
+        if self._write_buffer is not None and self._write_buffer.has_pending(ns):
+            self._write_buffer.flush(ns)
+
+    def enable_cache(self, ns, ttl=5.0, channels=None, event_keys=None, maxsize=10000):
+        """
+        Enables the local read-through cache for a namespace: get answers
+        from local memory while the cached value is younger than ttl.
+
+        Writes through this wrapper invalidate the cache. Writes by other
+        clients are seen after ttl, or as soon as an event arrives on one
+        of the channels, if the writers use the *_and_publish methods.
+        Events are delivered only while the event listener runs, see
+        start_event_listener and handle_events.
+
+        Parameters
+        ----------
+        ns: string
+            SDL namespace
+        ttl: float (optional, default is 5.0)
+            Seconds a value stays cached
+        channels: list of string (optional)
+            Channels whose events invalidate the namespace
+        event_keys: function (optional)
+            Maps an event to the keys it invalidates; its signature should be
+            event_keys(event) and return an iterable of keys, or None for
+            the whole namespace. If not given, every event invalidates the
+            whole namespace.
+        maxsize: int (optional, default is 10000)
+            Maximum number of cached keys; only used when the first
+            namespace is enabled
+
+        Raises
+        ------
+        RejectedByBackend
+            If channels are given and the storage does not support
+            events, e.g. SharedMemoryStorage
+        """
+        if channels and not getattr(self._sdl, "supports_events", True):
+            raise RejectedByBackend("the SDL storage does not support channels and events")
+        if self._cache is None:
+            self._cache = SDLCache(maxsize)
+        self._cache.enable(ns, ttl)
+        for channel in channels or []:
+            self._cache_channels[(ns, channel)] = event_keys
+            self._subscribe(ns, channel)
+
+    def disable_cache(self, ns):
+        """
+        Disables the cache for a namespace and drops its entries.
+
+        Parameters
+        ----------
+        ns: string
+            SDL namespace
+        """
+        if self._cache is not None:
+            self._cache.disable(ns)
+        for (cache_ns, channel) in [k for k in self._cache_channels if k[0] == ns]:
+            del self._cache_channels[(cache_ns, channel)]
+            self._subscribe(cache_ns, channel)
 
-    def set(self, ns, key, value, usemsgpack=True):
+    def cache_stats(self):
+        """
+        Returns the statistics of the cache, see SDLCache.stats;
+        an empty dictionary if the cache was never enabled.
+        """
+        return self._cache.stats() if self._cache is not None else {}
+
+    def _invalidate(self, ns, key=None):
+        if self._cache is not None and self._cache.enabled(ns):
+            self._cache.invalidate(ns, None if key is None else [key])
+
+    def _invalidate_many(self, ns, keys):
+        if keys and self._cache is not None and self._cache.enabled(ns):
+            self._cache.invalidate(ns, keys)
+
+    def _subscribe(self, ns, channel):
+        """
+        (Re)subscribes one callback to a channel that serves both the
+        client callback and the cache, as SDL keeps one callback per channel.
+        """
+        cb = self._channel_cbs.get((ns, channel))
+        watched = (ns, channel) in self._cache_channels
+        if cb is None and not watched:
+            self._sdl.unsubscribe_channel(ns, {channel})
+            return
+
+        def on_event(channel_name, events):
+            if (ns, channel) in self._cache_channels and self._cache is not None:
+                event_keys = self._cache_channels[(ns, channel)]
+                for event in events:
+                    keys = event_keys(event) if event_keys is not None else None
+                    self._cache.invalidate(ns, None if keys is None else list(keys))
+            client_cb = self._channel_cbs.get((ns, channel))
+            if client_cb is not None:
+                client_cb(channel_name, events)
+
+        self._sdl.subscribe_channel(ns, on_event, {channel})
+
+    def set(self, ns, key, value, usemsgpack=True, serializer=None):
         """
         Stores a key-value pair,
         optionally serializing the value to bytes using msgpack.
@@ -78,12 +1182,51 @@ class SDLWrapper:
             Stated differently, if usemsgpack is True, the value can be anything
             that is serializable by msgpack.
             If usemsgpack is False, the value must be bytes.
+        serializer: Serializer (optional, default is None)
+            Used instead of the serializer that usemsgpack selects, see set_serializer.
+        """
+        serializer = self._serializer(ns, usemsgpack, serializer)
+        data = serializer.dumps(value)
+        old = self._old_values(ns, [key]) if ns in self._indexes else None
+        if self._write_buffer is not None:
+            self._write_buffer.put(ns, key, data)
+        else:
+            self._sdl.set(ns, {key: data})
+            self._invalidate(ns, key)
+        if old is not None:
+            self._update_indexes(ns, old, self._indexed_values(ns, {key: value}, {key: data}, serializer))
+
+    def set_many(self, ns, mapping, usemsgpack=True, serializer=None):
         """
-        if usemsgpack:
-            value = msgpack.packb(value, use_bin_type=True)
-        self._sdl.set(ns, {key: value})
+        Stores many key-value pairs with one SDL call,
+        optionally serializing the values to bytes using msgpack.
 
-    def set_if(self, ns, key, old_value, new_value, usemsgpack=True):
+        Parameters
+        ----------
+        ns: string
+            SDL namespace
+        mapping: dict
+            Keys and the objects or byte arrays to store.  See the `usemsgpack` parameter.
+        usemsgpack: boolean (optional, default is True)
+            Determines whether the values are serialized using msgpack before storing,
+            see set.
+        serializer: Serializer (optional, default is None)
+            Used instead of the serializer that usemsgpack selects, see set_serializer.
+        """
+        serializer = self._serializer(ns, usemsgpack, serializer)
+        data = {key: serializer.dumps(value) for key, value in mapping.items()}
+        if not data:
+            return
+        old = self._old_values(ns, list(data)) if ns in self._indexes else None
+        if self._write_buffer is not None:
+            for key, value in data.items():
+                self._write_buffer.put(ns, key, value)
+        else:
+            self._write_many(ns, data)
+        if old is not None:
+            self._update_indexes(ns, old, self._indexed_values(ns, mapping, data, serializer))
+
+    def set_if(self, ns, key, old_value, new_value, usemsgpack=True, serializer=None):
         """
         Conditionally modify the value of a key if the current value in data storage matches the
         user's last known value.
@@ -105,6 +1248,8 @@ class SDLWrapper:
             Stated differently, if usemsgpack is True, the value can be anything
             that is serializable by msgpack.
             If usemsgpack is False, the value must be bytes.
+        serializer: Serializer (optional, default is None)
+            Used instead of the serializer that usemsgpack selects, see set_serializer.
 
         Returns
         -------
@@ -112,12 +1257,17 @@ class SDLWrapper:
             True for successful modification, false if the user's last known data did not
             match the current value in data storage.
         """
-        if usemsgpack:
-            old_value = msgpack.packb(old_value, use_bin_type=True)
-            new_value = msgpack.packb(new_value, use_bin_type=True)
-        return self._sdl.set_if(ns, key, old_value, new_value)
+        serializer = self._serializer(ns, usemsgpack, serializer)
+        old_value = serializer.dumps(old_value)
+        new_value = serializer.dumps(new_value)
+        self._flush_pending(ns)
+        result = self._sdl.set_if(ns, key, old_value, new_value)
+        self._invalidate(ns, key)
+        if result:
+            self._update_indexes_from_data(ns, key, old_value, new_value)
+        return result
 
-    def set_if_not_exists(self, ns, key, value, usemsgpack=True):
+    def set_if_not_exists(self, ns, key, value, usemsgpack=True, serializer=None):
         """
         Write data to SDL storage if key does not exist.
 
@@ -136,6 +1286,8 @@ class SDLWrapper:
             Stated differently, if usemsgpack is True, the value can be anything
             that is serializable by msgpack.
             If usemsgpack is False, the value must be bytes.
+        serializer: Serializer (optional, default is None)
+            Used instead of the serializer that usemsgpack selects, see set_serializer.
 
         Returns
         -------
@@ -143,11 +1295,15 @@ class SDLWrapper:
             True for successful modification, false if the user's last known data did not
             match the current value in data storage.
         """
-        if usemsgpack:
-            value = msgpack.packb(value, use_bin_type=True)
-        return self._sdl.set_if_not_exists(ns, key, value)
+        value = self._serializer(ns, usemsgpack, serializer).dumps(value)
+        self._flush_pending(ns)
+        result = self._sdl.set_if_not_exists(ns, key, value)
+        self._invalidate(ns, key)
+        if result:
+            self._update_indexes_from_data(ns, key, None, value)
+        return result
 
-    def get(self, ns, key, usemsgpack=True):
+    def get(self, ns, key, usemsgpack=True, serializer=None):
         """
         Gets the value for the specified namespace and key,
         optionally deserializing stored bytes using msgpack.
@@ -163,6 +1319,8 @@ class SDLWrapper:
             using msgpack to yield the original object that was stored.
             If usemsgpack is False, the byte array stored by SDL is returned
             without further processing.
+        serializer: Serializer (optional, default is None)
+            Used instead of the serializer that usemsgpack selects, see set_serializer.
 
         Returns
         -------
@@ -170,12 +1328,384 @@ class SDLWrapper:
             See the usemsgpack parameter for an explanation of the returned value type.
             Answers None if the key is not found.
         """
-        result = None
-        ret_dict = self._sdl.get(ns, {key})
-        if key in ret_dict:
-            result = ret_dict[key]
-            if usemsgpack:
-                result = msgpack.unpackb(result, raw=False)
+        found = False
+        if self._write_buffer is not None:
+            found, result = self._write_buffer.lookup(ns, key)
+        cache = self._cache
+        if not found and cache is not None and cache.enabled(ns):
+            found, result = cache.lookup(ns, key)
+            if not found:
+                generation = cache.generation()
+                values, stale = self._get_values(ns, {key})
+                result = values.get(key)
+                if not stale:
+                    cache.store(ns, key, result, generation)
+        elif not found:
+            result = self._get_values(ns, {key})[0].get(key)
+        if result is not None:
+            result = self._serializer(ns, usemsgpack, serializer).loads(result)
+        return result
+
+    def get_many(self, ns, keys, usemsgpack=True, serializer=None):
+        """
+        Gets the values of many keys with one SDL call,
+        optionally deserializing stored bytes using msgpack.
+
+        Parameters
+        ----------
+        ns: string
+            SDL namespace
+        keys: iterable of string
+            SDL keys
+        usemsgpack: boolean (optional, default is True)
+            If usemsgpack is True, every byte array stored by SDL is deserialized
+            using msgpack to yield the original object that was stored.
+            If usemsgpack is False, every byte array stored by SDL is returned
+            without further processing.
+        serializer: Serializer (optional, default is None)
+            Used instead of the serializer that usemsgpack selects, see set_serializer.
+
+        Returns
+        -------
+        list
+            The value of each key, in the order of keys; None where a
+            key is not found.
+        """
+        keys = list(keys)
+        found = {}
+        if self._write_buffer is not None:
+            for key in keys:
+                hit, value = self._write_buffer.lookup(ns, key)
+                if hit:
+                    found[key] = value
+        cache = self._cache
+        cached = cache is not None and cache.enabled(ns)
+        if cached:
+            for key in keys:
+                if key not in found:
+                    hit, value = cache.lookup(ns, key)
+                    if hit:
+                        found[key] = value
+        missing = {key for key in keys if key not in found}
+        if missing:
+            generation = cache.generation() if cached else None
+            values, stale = self._get_values(ns, missing)
+            for key in missing:
+                found[key] = values.get(key)
+                if cached and not stale:
+                    cache.store(ns, key, found[key], generation)
+        loads = self._serializer(ns, usemsgpack, serializer).loads
+        values = {key: loads(value) for key, value in found.items() if value is not None}
+        return [values.get(key) for key in keys]
+
+    def update(self, ns, key, fn, max_retries=10, backoff=0.001, usemsgpack=True, serializer=None):
+        """
+        Atomically replaces the value of a key with fn(value), by
+        compare-and-set: the new value is written with set_if, or with
+        set_if_not_exists if the key did not exist, and fn runs again on
+        the current value if another client wrote the key meanwhile.
+
+        The first attempt uses the cached value if the namespace is
+        cached, so an uncontended update of a cached key costs one SDL
+        call; a stale cached value makes set_if fail and the update read
+        the stored value. If fn returns the stored value, nothing is
+        written, unless the value came from the cache: then set_if
+        writes it to confirm it. The old value is compared in its stored bytes, so it does
+        not depend on serializing the same value twice the same way.
+
+        Raise SDLUpdateConflict when all attempts conflict.
+
+        Parameters
+        ----------
+        ns: string
+            SDL namespace
+        key: string
+            SDL key
+        fn: function
+            Called with the current value, None if the key does not
+            exist, and returns the new value; it may run more than once
+        max_retries: int (optional, default is 10)
+            Number of attempts after the first one
+        backoff: float (optional, default is 0.001)
+            Seconds to wait before the first retry, doubled for every
+            further retry; 0 retries at once
+        usemsgpack: boolean (optional, default is True)
+            See set.
+        serializer: Serializer (optional, default is None)
+            Used instead of the serializer that usemsgpack selects, see set_serializer.
+
+        Returns
+        -------
+        Value
+            The value written
+        """
+        return self._compare_and_set(ns, {key: fn}, max_retries, backoff,
+                                     self._serializer(ns, usemsgpack, serializer))[key]
+
+    def increment(self, ns, deltas, max_retries=10, backoff=0.001):
+        """
+        Atomically adds to counters, see update. All counters are read
+        with one SDL call per attempt; only conflicting counters are
+        read and written again. A counter that does not exist starts at 0.
+
+        Raise SDLUpdateConflict when all attempts of a counter conflict;
+        the other counters are updated.
+
+        Parameters
+        ----------
+        ns: string
+            SDL namespace
+        deltas: dict
+            The number to add per counter key
+        max_retries: int (optional, default is 10)
+            See update.
+        backoff: float (optional, default is 0.001)
+            See update.
+
+        Returns
+        -------
+        dict
+            The new value per counter key
+        """
+        return self._compare_and_set(ns, {key: partial(_add, delta) for key, delta in deltas.items()},
+                                     max_retries, backoff, self._serializer(ns, True, None))
+
+    def update_stats(self):
+        """
+        Returns the compare-and-set statistics of update and increment.
+
+        Returns
+        -------
+        dict
+            Per namespace, the number of keys updated, of conflicts (set_if
+            calls that found another value), of keys given up after
+            max_retries and the conflict_rate, conflicts per attempt
+        """
+        with self._update_lock:
+            return {ns: {"updated": counts[0], "conflicts": counts[1], "failed": counts[2],
+                         "conflict_rate": counts[1] / (counts[0] + counts[1]) if counts[0] + counts[1] else 0.0}
+                    for ns, counts in self._update_counts.items()}
+
+    def add_index(self, ns, index, attribute, index_ns=None):
+        """
+        Adds a secondary index to a namespace, so that query finds the
+        keys whose values have an attribute value without scanning the
+        namespace. The index keeps one SDL group of keys per attribute
+        value, in a namespace of its own.
+
+        All writes through this wrapper maintain the index. The
+        conditional writes, such as set_if and delete_if, and update
+        and increment know the old value once they succeed; the other
+        writes read the old values of indexed keys first, to move the
+        keys between groups, and remove_all_and_publish reads the whole
+        namespace. Other clients do not maintain the index unless they
+        do it the same way; query leaves out keys whose value no longer
+        matches, but cannot find keys missing from the index. Values are read with the serializer of the
+        namespace, see set_serializer. Use rebuild_index to index the
+        values already stored.
+
+        Parameters
+        ----------
+        ns: string
+            SDL namespace
+        index: string
+            Index name
+        attribute: function or string
+            Returns the indexed attribute of a value, or None to leave
+            the value out of the index; its signature should be
+            attribute(value). A string selects that item of dict values.
+        index_ns: string (optional, default is None)
+            SDL namespace of the groups; ns with ".idx" appended if None.
+            Redis keeps groups in the key space of their namespace, so
+            they are kept apart from the values.
+        """
+        if isinstance(attribute, str):
+            attribute = partial(_item, attribute)
+        self._indexes.setdefault(ns, {})[index] = (attribute, index_ns if index_ns is not None else ns + ".idx")
+
+    def remove_index(self, ns, index):
+        """
+        Stops maintaining an index; its groups stay in SDL.
+
+        Parameters
+        ----------
+        ns: string
+            SDL namespace
+        index: string
+            Index name
+        """
+        indexes = self._indexes.get(ns, {})
+        indexes.pop(index, None)
+        if not indexes:
+            self._indexes.pop(ns, None)
+
+    def rebuild_index(self, ns, index, page_size=1000):
+        """
+        Adds the values stored in a namespace to an index, one page of
+        values at a time, see iter_find_and_get.
+
+        Parameters
+        ----------
+        ns: string
+            SDL namespace
+        index: string
+            Index name
+        page_size: int (optional, default is 1000)
+            Number of values per page
+        """
+        indexes = {index: self._indexes[ns][index]}
+        page = {}
+        for key, value in self.iter_find_and_get(ns, "", page_size):
+            page[key] = value
+            if len(page) >= page_size:
+                self._update_indexes(ns, {}, page, indexes)
+                page = {}
+        self._update_indexes(ns, {}, page, indexes)
+
+    def query(self, ns, index, value):
+        """
+        Gets the key-value pairs of a namespace whose indexed attribute
+        equals value, with one SDL call for the keys and one for the
+        values; see add_index.
+
+        Parameters
+        ----------
+        ns: string
+            SDL namespace
+        index: string
+            Index name
+        value:
+            The attribute value to look up
+
+        Returns
+        -------
+        Dictionary of key-value pairs
+            Ordered by key; answers an empty dictionary if no value matches.
+        """
+        attribute, index_ns = self._indexes[ns][index]
+        keys = sorted(member.decode() for member in self._sdl.get_members(index_ns, _index_group(index, value)))
+        values = self.get_many(ns, keys)
+        return {key: found for key, found in zip(keys, values) if found is not None and attribute(found) == value}
+
+    def _old_values(self, ns, keys):
+        """
+        Returns the current values of keys of an indexed namespace,
+        None for absent keys and values that cannot be deserialized.
+        """
+        serializer = self._serializer(ns, True, None)
+        values = self.get_many(ns, keys, usemsgpack=False)
+        return {key: _loads_or_none(serializer, data) for key, data in zip(keys, values)}
+
+    def _indexed_values(self, ns, values, data, serializer):
+        """
+        Returns the values as the serializer of the namespace reads them
+        back, deserializing only those written with another serializer.
+        """
+        ns_serializer = self._serializer(ns, True, None)
+        if serializer is ns_serializer:
+            return dict(values)
+        return {key: _loads_or_none(ns_serializer, value) for key, value in data.items()}
+
+    def _loaded_values(self, ns, data):
+        """
+        Returns stored values as the serializer of the namespace reads
+        them; None stays None.
+        """
+        serializer = self._serializer(ns, True, None)
+        return {key: None if value is None else _loads_or_none(serializer, value) for key, value in data.items()}
+
+    def _update_indexes_from_data(self, ns, key, old_data, new_data):
+        """
+        Moves a key between the index groups after a conditional write
+        succeeded, given its old and new stored values; None stands for
+        an absent key.
+        """
+        if ns in self._indexes:
+            self._update_indexes(ns, self._loaded_values(ns, {key: old_data}), self._loaded_values(ns, {key: new_data}))
+
+    def _update_indexes(self, ns, old, new, indexes=None):
+        """
+        Moves keys between the index groups, given their old and new
+        values; None stands for an absent key. A key is added to the
+        group of its new value even if it should be there already,
+        which repairs the index after unmaintained writes.
+        """
+        adds = {}  # (index_ns, group) -> members
+        removes = {}
+        for index, (attribute, index_ns) in (indexes or self._indexes.get(ns, {})).items():
+            for key, new_value in new.items():
+                old_value = old.get(key)
+                old_attribute = None if old_value is None else attribute(old_value)
+                new_attribute = None if new_value is None else attribute(new_value)
+                if old_attribute is not None and old_attribute != new_attribute:
+                    removes.setdefault((index_ns, _index_group(index, old_attribute)), set()).add(key.encode())
+                if new_attribute is not None:
+                    adds.setdefault((index_ns, _index_group(index, new_attribute)), set()).add(key.encode())
+        for (index_ns, group), members in removes.items():
+            self._sdl.remove_member(index_ns, group, members)
+        for (index_ns, group), members in adds.items():
+            self._sdl.add_member(index_ns, group, members)
+
+    def _compare_and_set(self, ns, fns, max_retries, backoff, serializer):
+        """
+        Applies fn per key of fns with compare-and-set and returns the
+        new values; see update.
+        """
+        self._flush_pending(ns)
+        current = {}
+        # cached values are only a guess of the stored ones: set_if checks them
+        guessed = set()
+        cache = self._cache
+        if cache is not None and cache.enabled(ns):
+            for key in fns:
+                found, value = cache.lookup(ns, key)
+                if found:
+                    current[key] = value
+                    guessed.add(key)
+        pending = dict(fns)
+        old = {}
+        result = {}
+        counts = [0, 0, 0]
+        for attempt in range(max_retries + 1):
+            missing = {key for key in pending if key not in current}
+            if missing:
+                values = self._sdl.get(ns, missing)
+                current.update((key, values.get(key)) for key in missing)
+            conflicts = {}
+            for key, fn in pending.items():
+                old_value = current.pop(key)
+                old[key] = None if old_value is None else serializer.loads(old_value)
+                new_value = fn(old[key])
+                new_data = serializer.dumps(new_value)
+                if new_data == old_value and key not in guessed:
+                    ok = True
+                elif old_value is None:
+                    ok = self._sdl.set_if_not_exists(ns, key, new_data)
+                else:
+                    ok = self._sdl.set_if(ns, key, old_value, new_data)
+                guessed.discard(key)
+                if ok:
+                    result[key] = new_value
+                    counts[0] += 1
+                else:
+                    conflicts[key] = fn
+                    counts[1] += 1
+            self._invalidate_many(ns, [key for key in pending if key in result or key in conflicts])
+            pending = conflicts
+            if not pending:
+                break
+            if backoff and attempt < max_retries:
+                time.sleep(backoff * 2 ** attempt)
+        counts[2] = len(pending)
+        if ns in self._indexes and result:
+            self._update_indexes(ns, old, result)
+        with self._update_lock:
+            totals = self._update_counts.setdefault(ns, [0, 0, 0])
+            for index, count in enumerate(counts):
+                totals[index] += count
+        if pending:
+            raise SDLUpdateConflict("{} keys in {} still conflicted after {} retries: {}".format(
+                len(pending), ns, max_retries, ", ".join(sorted(pending)[:10])))
         return result
 
     def find_keys(self, ns, prefix):
@@ -194,9 +1724,10 @@ class SDLWrapper:
         keys: list
             A list of found keys.
         """
+        self._flush_pending(ns)
         return self._sdl.find_keys(ns, f"{prefix}*")
 
-    def find_and_get(self, ns, prefix, usemsgpack=True):
+    def find_and_get(self, ns, prefix, usemsgpack=True, serializer=None):
         """
         Gets all key-value pairs in the specified namespace
         with keys that start with the specified prefix,
@@ -213,6 +1744,8 @@ class SDLWrapper:
             using msgpack to yield the original value that was stored.
             If usemsgpack is False, every byte array stored by SDL is returned
             without further processing.
+        serializer: Serializer (optional, default is None)
+            Used instead of the serializer that usemsgpack selects, see set_serializer.
 
         Returns
         -------
@@ -223,11 +1756,64 @@ class SDLWrapper:
         """
 
         # note: SDL "*" usage is inconsistent with real python regex, where it would be ".*"
+        self._flush_pending(ns)
         ret_dict = self._sdl.find_and_get(ns, f"{prefix}*")
-        if usemsgpack:
-            ret_dict = {k: msgpack.unpackb(v, raw=False) for k, v in ret_dict.items()}
+        loads = self._serializer(ns, usemsgpack, serializer).loads
+        ret_dict = {k: loads(v) for k, v in ret_dict.items()}
         return ret_dict
 
+    def iter_find_and_get(self, ns, prefix, page_size=1000, usemsgpack=True, serializer=None):
+        """
+        Yields the key-value pairs in the specified namespace with keys
+        that start with the specified prefix, like find_and_get, but
+        without holding them all in memory: keys are scanned
+        incrementally and values fetched page by page.
+
+        With the Redis backend, keys are scanned with SCAN, so a key
+        added or removed during the iteration may or may not be yielded,
+        and, rarely, a key may be yielded twice. SCAN needs internals of
+        the ricsdl Redis backend; with other ricsdl versions than 3.1, a
+        warning is logged and the keys are listed at once, as with the
+        other backends. The values are always fetched in pages.
+
+        Parameters
+        ----------
+        ns: string
+           SDL namespace
+        prefix: string
+            the key prefix
+        page_size: int (optional, default is 1000)
+            Number of keys per SDL call
+        usemsgpack: boolean (optional, default is True)
+            See find_and_get.
+        serializer: Serializer (optional, default is None)
+            Used instead of the serializer that usemsgpack selects, see set_serializer.
+
+        Yields
+        ------
+        Tuple
+            (key, value); keys removed before their page is fetched are skipped
+        """
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1")
+        loads = self._serializer(ns, usemsgpack, serializer).loads
+        self._flush_pending(ns)
+        page = []
+        for key in self._sdl.scan_keys(ns, f"{prefix}*", page_size):
+            page.append(key)
+            if len(page) >= page_size:
+                yield from self._get_page(ns, page, loads)
+                page = []
+        if page:
+            yield from self._get_page(ns, page, loads)
+
+    def _get_page(self, ns, keys, loads):
+        values = self._sdl.get(ns, set(keys))
+        for key in keys:
+            value = values.get(key)
+            if value is not None:
+                yield key, loads(value)
+
     def delete(self, ns, key):
         """
         Deletes the key-value pair with the specified key in the specified namespace.
@@ -239,9 +1825,36 @@ class SDLWrapper:
         key: string
             SDL key
         """
+        self._flush_pending(ns)
+        old = self._old_values(ns, [key]) if ns in self._indexes else None
         self._sdl.remove(ns, {key})
+        self._invalidate(ns, key)
+        if old is not None:
+            self._update_indexes(ns, old, {key: None})
 
-    def delete_if(self, ns, key, value, usemsgpack=True):
+    def delete_many(self, ns, keys):
+        """
+        Deletes the key-value pairs with the specified keys in the
+        specified namespace with one SDL call.
+
+        Parameters
+        ----------
+        ns: string
+           SDL namespace
+        keys: iterable of string
+            SDL keys
+        """
+        keys = set(keys)
+        if not keys:
+            return
+        self._flush_pending(ns)
+        old = self._old_values(ns, list(keys)) if ns in self._indexes else None
+        self._sdl.remove(ns, keys)
+        self._invalidate_many(ns, keys)
+        if old is not None:
+            self._update_indexes(ns, old, dict.fromkeys(keys))
+
+    def delete_if(self, ns, key, value, usemsgpack=True, serializer=None):
         """
         Conditionally remove data from SDL storage if the current data value matches the user's
         last known value.
@@ -261,6 +1874,8 @@ class SDLWrapper:
             Stated differently, if usemsgpack is True, the value can be anything
             that is serializable by msgpack.
             If usemsgpack is False, the value must be bytes.
+        serializer: Serializer (optional, default is None)
+            Used instead of the serializer that usemsgpack selects, see set_serializer.
 
         Returns
         -------
@@ -268,11 +1883,15 @@ class SDLWrapper:
             True if successful removal, false if the user's last known data did not match the
             current value in data storage.
         """
-        if usemsgpack:
-            value = msgpack.packb(value, use_bin_type=True)
-        return self._sdl.remove_if(ns, key, value)
+        value = self._serializer(ns, usemsgpack, serializer).dumps(value)
+        self._flush_pending(ns)
+        result = self._sdl.remove_if(ns, key, value)
+        self._invalidate(ns, key)
+        if result:
+            self._update_indexes_from_data(ns, key, value, None)
+        return result
 
-    def add_member(self, ns, group, member, usemsgpack=True):
+    def add_member(self, ns, group, member, usemsgpack=True, serializer=None):
         """
         Add new members to a SDL group under the namespace.
 
@@ -291,12 +1910,13 @@ class SDLWrapper:
             Stated differently, if usemsgpack is True, the member can be anything
             that is serializable by msgpack.
             If usemsgpack is False, the member must be bytes.
+        serializer: Serializer (optional, default is None)
+            Used instead of the serializer that usemsgpack selects, see set_serializer.
         """
-        if usemsgpack:
-            member = msgpack.packb(member, use_bin_type=True)
+        member = self._serializer(ns, usemsgpack, serializer).dumps(member)
         self._sdl.add_member(ns, group, {member})
 
-    def remove_member(self, ns, group, member, usemsgpack=True):
+    def remove_member(self, ns, group, member, usemsgpack=True, serializer=None):
         """
         Remove members from a SDL group.
 
@@ -315,9 +1935,10 @@ class SDLWrapper:
             Stated differently, if usemsgpack is True, the member can be anything
             that is serializable by msgpack.
             If usemsgpack is False, the member must be bytes.
+        serializer: Serializer (optional, default is None)
+            Used instead of the serializer that usemsgpack selects, see set_serializer.
         """
-        if usemsgpack:
-            member = msgpack.packb(member, use_bin_type=True)
+        member = self._serializer(ns, usemsgpack, serializer).dumps(member)
         self._sdl.remove_member(ns, group, {member})
 
     def remove_group(self, ns, group):
@@ -340,7 +1961,7 @@ class SDLWrapper:
         """
         self._sdl.remove_group(ns, group)
 
-    def get_members(self, ns, group, usemsgpack=True):
+    def get_members(self, ns, group, usemsgpack=True, serializer=None):
         """
         Get all the members of a SDL group.
 
@@ -357,6 +1978,8 @@ class SDLWrapper:
             Stated differently, if usemsgpack is True, the member can be anything
             that is serializable by msgpack.
             If usemsgpack is False, the member must be bytes.
+        serializer: Serializer (optional, default is None)
+            Used instead of the serializer that usemsgpack selects, see set_serializer.
 
         Returns
         -------
@@ -365,11 +1988,11 @@ class SDLWrapper:
         None
         """
         ret_set = self._sdl.get_members(ns, group)
-        if usemsgpack:
-            ret_set = {msgpack.unpackb(m, raw=False) for m in ret_set}
+        loads = self._serializer(ns, usemsgpack, serializer).loads
+        ret_set = {loads(m) for m in ret_set}
         return ret_set
 
-    def is_member(self, ns, group, member, usemsgpack=True):
+    def is_member(self, ns, group, member, usemsgpack=True, serializer=None):
         """
         Validate if a given member is in the SDL group.
 
@@ -388,14 +2011,15 @@ class SDLWrapper:
             Stated differently, if usemsgpack is True, the member can be anything
             that is serializable by msgpack.
             If usemsgpack is False, the member must be bytes.
+        serializer: Serializer (optional, default is None)
+            Used instead of the serializer that usemsgpack selects, see set_serializer.
 
         Returns
         -------
         bool
             True if member was in the group, false otherwise.
         """
-        if usemsgpack:
-            member = msgpack.packb(member, use_bin_type=True)
+        member = self._serializer(ns, usemsgpack, serializer).dumps(member)
         return self._sdl.is_member(ns, group, member)
 
     def group_size(self, ns, group):
@@ -424,7 +2048,7 @@ class SDLWrapper:
         """
         return self._sdl.group_size(ns, group)
 
-    def set_and_publish(self, ns, channel, event, key, value, usemsgpack=True):
+    def set_and_publish(self, ns, channel, event, key, value, usemsgpack=True, serializer=None):
         """
         Publish event to channel after writing data.
 
@@ -447,12 +2071,18 @@ class SDLWrapper:
             Stated differently, if usemsgpack is True, the value can be anything
             that is serializable by msgpack.
             If usemsgpack is False, the value must be bytes.
+        serializer: Serializer (optional, default is None)
+            Used instead of the serializer that usemsgpack selects, see set_serializer.
         """
-        if usemsgpack:
-            value = msgpack.packb(value, use_bin_type=True)
-        self._sdl.set_and_publish(ns, {channel: event}, {key: value})
-
-    def set_if_and_publish(self, ns, channel, event, key, old_value, new_value, usemsgpack=True):
+        data = self._serializer(ns, usemsgpack, serializer).dumps(value)
+        self._flush_pending(ns)
+        old = self._old_values(ns, [key]) if ns in self._indexes else None
+        self._sdl.set_and_publish(ns, {channel: event}, {key: data})
+        self._invalidate(ns, key)
+        if old is not None:
+            self._update_indexes(ns, old, self._loaded_values(ns, {key: data}))
+
+    def set_if_and_publish(self, ns, channel, event, key, old_value, new_value, usemsgpack=True, serializer=None):
         """
         Publish event to channel after conditionally modifying the value of a key if the
         current value in data storage matches the user's last known value.
@@ -478,6 +2108,8 @@ class SDLWrapper:
             Stated differently, if usemsgpack is True, the old_value & new_value can be anything
             that is serializable by msgpack.
             If usemsgpack is False, the old_value & new_value must be bytes.
+        serializer: Serializer (optional, default is None)
+            Used instead of the serializer that usemsgpack selects, see set_serializer.
 
         Returns
         -------
@@ -485,12 +2117,17 @@ class SDLWrapper:
             True for successful modification, false if the user's last known data did not
             match the current value in data storage.
         """
-        if usemsgpack:
-            old_value = msgpack.packb(old_value, use_bin_type=True)
-            new_value = msgpack.packb(new_value, use_bin_type=True)
-        return self._sdl.set_if_and_publish(ns, {channel: event}, key, old_value, new_value)
+        serializer = self._serializer(ns, usemsgpack, serializer)
+        old_value = serializer.dumps(old_value)
+        new_value = serializer.dumps(new_value)
+        self._flush_pending(ns)
+        result = self._sdl.set_if_and_publish(ns, {channel: event}, key, old_value, new_value)
+        self._invalidate(ns, key)
+        if result:
+            self._update_indexes_from_data(ns, key, old_value, new_value)
+        return result
 
-    def set_if_not_exists_and_publish(self, ns, channel, event, key, value, usemsgpack=True):
+    def set_if_not_exists_and_publish(self, ns, channel, event, key, value, usemsgpack=True, serializer=None):
         """
         Publish event to channel after writing data to SDL storage if key does not exist.
 
@@ -513,6 +2150,8 @@ class SDLWrapper:
             Stated differently, if usemsgpack is True, the value can be anything
             that is serializable by msgpack.
             If usemsgpack is False, the value must be bytes.
+        serializer: Serializer (optional, default is None)
+            Used instead of the serializer that usemsgpack selects, see set_serializer.
 
         Returns
         -------
@@ -520,9 +2159,13 @@ class SDLWrapper:
             True if key didn't exist yet and set operation was executed, false if key already
             existed and thus its value was left untouched.
         """
-        if usemsgpack:
-            value = msgpack.packb(value, use_bin_type=True)
-        return self._sdl.set_if_not_exists_and_publish(ns, {channel: event}, key, value)
+        value = self._serializer(ns, usemsgpack, serializer).dumps(value)
+        self._flush_pending(ns)
+        result = self._sdl.set_if_not_exists_and_publish(ns, {channel: event}, key, value)
+        self._invalidate(ns, key)
+        if result:
+            self._update_indexes_from_data(ns, key, None, value)
+        return result
 
     def remove_and_publish(self, ns, channel, event, key):
         """
@@ -539,9 +2182,14 @@ class SDLWrapper:
         key: string
             SDL key
         """
+        self._flush_pending(ns)
+        old = self._old_values(ns, [key]) if ns in self._indexes else None
         self._sdl.remove_and_publish(ns, {channel: event}, {key})
+        self._invalidate(ns, key)
+        if old is not None:
+            self._update_indexes(ns, old, {key: None})
 
-    def remove_if_and_publish(self, ns, channel, event, key, value, usemsgpack=True):
+    def remove_if_and_publish(self, ns, channel, event, key, value, usemsgpack=True, serializer=None):
         """
         Publish event to channel after removing key and its data from database if the
         current data value is expected one.
@@ -565,6 +2213,8 @@ class SDLWrapper:
             Stated differently, if usemsgpack is True, the value can be anything
             that is serializable by msgpack.
             If usemsgpack is False, the value must be bytes.
+        serializer: Serializer (optional, default is None)
+            Used instead of the serializer that usemsgpack selects, see set_serializer.
 
         Returns
         -------
@@ -572,9 +2222,13 @@ class SDLWrapper:
             True if successful removal, false if the user's last known data did not match the
             current value in data storage.
         """
-        if usemsgpack:
-            value = msgpack.packb(value, use_bin_type=True)
-        return self._sdl.remove_if_and_publish(ns, {channel: event}, key, value)
+        value = self._serializer(ns, usemsgpack, serializer).dumps(value)
+        self._flush_pending(ns)
+        result = self._sdl.remove_if_and_publish(ns, {channel: event}, key, value)
+        self._invalidate(ns, key)
+        if result:
+            self._update_indexes_from_data(ns, key, value, None)
+        return result
 
     def remove_all_and_publish(self, ns, channel, event):
         """
@@ -589,7 +2243,12 @@ class SDLWrapper:
         event: string
             published message
         """
+        self._flush_pending(ns)
+        old = dict(self.iter_find_and_get(ns, "", usemsgpack=False)) if ns in self._indexes else None
         self._sdl.remove_all_and_publish(ns, {channel: event})
+        self._invalidate(ns)
+        if old is not None:
+            self._update_indexes(ns, self._loaded_values(ns, old), dict.fromkeys(old))
 
     def subscribe_channel(self, ns, cb, channel):
         """
@@ -604,7 +2263,8 @@ class SDLWrapper:
         channel: string
             channel to subscribe
         """
-        self._sdl.subscribe_channel(ns, cb, {channel})
+        self._channel_cbs[(ns, channel)] = cb
+        self._subscribe(ns, channel)
 
     def unsubscribe_channel(self, ns, channel):
         """
@@ -617,7 +2277,8 @@ class SDLWrapper:
         channel: string
             channel to unsubscribe
         """
-        self._sdl.unsubscribe_channel(ns, {channel})
+        self._channel_cbs.pop((ns, channel), None)
+        self._subscribe(ns, channel)
 
     def start_event_listener(self):
         """
@@ -653,3 +2314,229 @@ class SDLWrapper:
         bool
         """
         return self._sdl.is_active()
+
+
+# connections per database node in the pool of the SDL Redis backend
+SDL_POOL_SIZE = 20
+
+
+class AsyncSDLWrapper:
+    """
+    Provides the methods of SDLWrapper as coroutines for asyncio code,
+    such as asyncio based xapps and REST handlers. Each call runs on a
+    bounded thread pool, so many calls can overlap without blocking the
+    event loop. The pool is sized to the connection pool of the SDL
+    backend by default, so that calls do not wait for a connection
+    inside the pool threads.
+
+    Every method takes an optional timeout in seconds, which overrides
+    the default of the wrapper. On timeout asyncio.TimeoutError is
+    raised. A call that is cancelled, or times out, before it started
+    running is not run at all; one that already runs in a thread cannot
+    be interrupted and completes in the background.
+
+    The cache, write-behind and channel subscriptions are set up on the
+    wrapped SDLWrapper, see sdl.
+
+    Parameters
+    ----------
+    sdl: SDLWrapper (optional)
+        The wrapper to run; a new one is created if None
+    use_fake_sdl: bool (optional, default False)
+        Passed on when a new SDLWrapper is created, see SDLWrapper
+    max_workers: int (optional, default is SDL_POOL_SIZE)
+        Number of threads, i.e. of SDL calls that run at the same time
+    timeout: float (optional, default is None)
+        Default timeout of every call; None waits forever
+    """
+
+    def __init__(self, sdl=None, use_fake_sdl=False, max_workers=SDL_POOL_SIZE, timeout=None):
+        self.sdl = sdl if sdl is not None else SDLWrapper(use_fake_sdl=use_fake_sdl)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sdl")
+        self._timeout = timeout
+
+    async def _run(self, timeout, func, *args):
+        """
+        Runs func(*args) on the thread pool and waits for it at most timeout
+        seconds; the default timeout is used if timeout is None.
+        """
+        future = asyncio.get_running_loop().run_in_executor(self._executor, partial(func, *args))
+        timeout = self._timeout if timeout is None else timeout
+        if timeout is None:
+            return await future
+        return await asyncio.wait_for(future, timeout)
+
+    def close(self, wait=True):
+        """
+        Shuts the thread pool down; calls that did not start yet still run.
+
+        Parameters
+        ----------
+        wait: bool (optional, default True)
+            Whether to wait until the running calls complete
+        """
+        self._executor.shutdown(wait=wait)
+
+    async def set(self, ns, key, value, usemsgpack=True, serializer=None, timeout=None):
+        """
+        See SDLWrapper.set.
+        """
+        return await self._run(timeout, self.sdl.set, ns, key, value, usemsgpack, serializer)
+
+    async def set_many(self, ns, mapping, usemsgpack=True, serializer=None, timeout=None):
+        """
+        See SDLWrapper.set_many.
+        """
+        return await self._run(timeout, self.sdl.set_many, ns, mapping, usemsgpack, serializer)
+
+    async def set_if(self, ns, key, old_value, new_value, usemsgpack=True, serializer=None, timeout=None):
+        """
+        See SDLWrapper.set_if.
+        """
+        return await self._run(timeout, self.sdl.set_if, ns, key, old_value, new_value, usemsgpack, serializer)
+
+    async def set_if_not_exists(self, ns, key, value, usemsgpack=True, serializer=None, timeout=None):
+        """
+        See SDLWrapper.set_if_not_exists.
+        """
+        return await self._run(timeout, self.sdl.set_if_not_exists, ns, key, value, usemsgpack, serializer)
+
+    async def get(self, ns, key, usemsgpack=True, serializer=None, timeout=None):
+        """
+        See SDLWrapper.get.
+        """
+        return await self._run(timeout, self.sdl.get, ns, key, usemsgpack, serializer)
+
+    async def get_many(self, ns, keys, usemsgpack=True, serializer=None, timeout=None):
+        """
+        See SDLWrapper.get_many.
+        """
+        return await self._run(timeout, self.sdl.get_many, ns, list(keys), usemsgpack, serializer)
+
+    async def update(self, ns, key, fn, max_retries=10, backoff=0.001, usemsgpack=True, serializer=None,
+                     timeout=None):
+        """
+        See SDLWrapper.update; fn runs in a pool thread.
+        """
+        return await self._run(timeout, self.sdl.update, ns, key, fn, max_retries, backoff, usemsgpack, serializer)
+
+    async def increment(self, ns, deltas, max_retries=10, backoff=0.001, timeout=None):
+        """
+        See SDLWrapper.increment.
+        """
+        return await self._run(timeout, self.sdl.increment, ns, dict(deltas), max_retries, backoff)
+
+    async def find_keys(self, ns, prefix, timeout=None):
+        """
+        See SDLWrapper.find_keys.
+        """
+        return await self._run(timeout, self.sdl.find_keys, ns, prefix)
+
+    async def find_and_get(self, ns, prefix, usemsgpack=True, serializer=None, timeout=None):
+        """
+        See SDLWrapper.find_and_get.
+        """
+        return await self._run(timeout, self.sdl.find_and_get, ns, prefix, usemsgpack, serializer)
+
+    async def delete(self, ns, key, timeout=None):
+        """
+        See SDLWrapper.delete.
+        """
+        return await self._run(timeout, self.sdl.delete, ns, key)
+
+    async def delete_many(self, ns, keys, timeout=None):
+        """
+        See SDLWrapper.delete_many.
+        """
+        return await self._run(timeout, self.sdl.delete_many, ns, list(keys))
+
+    async def delete_if(self, ns, key, value, usemsgpack=True, serializer=None, timeout=None):
+        """
+        See SDLWrapper.delete_if.
+        """
+        return await self._run(timeout, self.sdl.delete_if, ns, key, value, usemsgpack, serializer)
+
+    async def add_member(self, ns, group, member, usemsgpack=True, serializer=None, timeout=None):
+        """
+        See SDLWrapper.add_member.
+        """
+        return await self._run(timeout, self.sdl.add_member, ns, group, member, usemsgpack, serializer)
+
+    async def remove_member(self, ns, group, member, usemsgpack=True, serializer=None, timeout=None):
+        """
+        See SDLWrapper.remove_member.
+        """
+        return await self._run(timeout, self.sdl.remove_member, ns, group, member, usemsgpack, serializer)
+
+    async def remove_group(self, ns, group, timeout=None):
+        """
+        See SDLWrapper.remove_group.
+        """
+        return await self._run(timeout, self.sdl.remove_group, ns, group)
+
+    async def get_members(self, ns, group, usemsgpack=True, serializer=None, timeout=None):
+        """
+        See SDLWrapper.get_members.
+        """
+        return await self._run(timeout, self.sdl.get_members, ns, group, usemsgpack, serializer)
+
+    async def is_member(self, ns, group, member, usemsgpack=True, serializer=None, timeout=None):
+        """
+        See SDLWrapper.is_member.
+        """
+        return await self._run(timeout, self.sdl.is_member, ns, group, member, usemsgpack, serializer)
+
+    async def group_size(self, ns, group, timeout=None):
+        """
+        See SDLWrapper.group_size.
+        """
+        return await self._run(timeout, self.sdl.group_size, ns, group)
+
+    async def set_and_publish(self, ns, channel, event, key, value, usemsgpack=True, serializer=None, timeout=None):
+        """
+        See SDLWrapper.set_and_publish.
+        """
+        return await self._run(timeout, self.sdl.set_and_publish, ns, channel, event, key, value, usemsgpack,
+                               serializer)
+
+    async def set_if_and_publish(self, ns, channel, event, key, old_value, new_value, usemsgpack=True,
+                                 serializer=None, timeout=None):
+        """
+        See SDLWrapper.set_if_and_publish.
+        """
+        return await self._run(timeout, self.sdl.set_if_and_publish, ns, channel, event, key, old_value,
+                               new_value, usemsgpack, serializer)
+
+    async def set_if_not_exists_and_publish(self, ns, channel, event, key, value, usemsgpack=True,
+                                            serializer=None, timeout=None):
+        """
+        See SDLWrapper.set_if_not_exists_and_publish.
+        """
+        return await self._run(timeout, self.sdl.set_if_not_exists_and_publish, ns, channel, event, key, value,
+                               usemsgpack, serializer)
+
+    async def remove_and_publish(self, ns, channel, event, key, timeout=None):
+        """
+        See SDLWrapper.remove_and_publish.
+        """
+        return await self._run(timeout, self.sdl.remove_and_publish, ns, channel, event, key)
+
+    async def remove_if_and_publish(self, ns, channel, event, key, value, usemsgpack=True, serializer=None,
+                                    timeout=None):
+        """
+        See SDLWrapper.remove_if_and_publish.
+        """
+        return await self._run(timeout, self.sdl.remove_if_and_publish, ns, channel, event, key, value,
+                               usemsgpack, serializer)
+
+    async def remove_all_and_publish(self, ns, channel, event, timeout=None):
+        """
+        See SDLWrapper.remove_all_and_publish.
+        """
+        return await self._run(timeout, self.sdl.remove_all_and_publish, ns, channel, event)
+
+    async def healthcheck(self, timeout=None):
+        """
+        See SDLWrapper.healthcheck.
+        """
+        return await self._run(timeout, self.sdl.healthcheck)
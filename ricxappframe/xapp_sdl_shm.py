@@ -0,0 +1,344 @@
+# ==================================================================================
+#       Copyright (c) 2026 The O-RAN Software Community contributors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#          http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+# ==================================================================================
+
+"""
+A node-local SDL storage in memory-mapped files, shared by the
+processes of an xapp, e.g. worker processes, or used to run benchmarks
+without DBaaS. Pass it to SDLWrapper:
+
+  sdl = SDLWrapper(storage=SharedMemoryStorage("/dev/shm/my-xapp-sdl"))
+
+The storage is a directory with a file per namespace. Each file holds
+a header and a msgpack snapshot of the keys and groups of the
+namespace:
+
+  octets 0-7    magic b"RICSDLSH"
+  octets 8-15   generation, incremented by every write
+  octets 16-23  length of the snapshot
+  then          the snapshot
+
+Every process keeps the decoded snapshots and decodes a namespace
+again only when its generation changed, so reads run at memory speed.
+A write encodes the snapshot of its namespace again, so its cost
+grows with the size of the namespace, not with the other namespaces;
+this suits hot state of up to some megabytes per namespace that is
+read more than written. The processes lock the file of a namespace
+with flock, shared to read and exclusive to write, and the threads of
+a process with a lock of their own. A storage that a process inherits
+through fork opens the files again in the child, as the inherited file
+descriptions and their flocks would be shared with the parent.
+
+Channels and events are not supported; the *_and_publish and
+subscription methods raise RejectedByBackend.
+"""
+
+import fcntl
+import fnmatch
+import mmap
+import os
+import struct
+import weakref
+from threading import RLock
+from urllib.parse import quote
+
+import msgpack
+from ricsdl.exceptions import RejectedByBackend
+
+_MAGIC = b"RICSDLSH"
+_HEADER = struct.Struct("<8sQQ")
+
+_storages = weakref.WeakSet()
+
+
+def _reopen_after_fork():
+    for storage in list(_storages):
+        storage._reopen()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reopen_after_fork)
+
+
+class _Namespace:
+    """
+    The mapped file of a namespace and the decoded copy of its snapshot.
+    """
+
+    def __init__(self, path, size):
+        self.path = path
+        self.generation = None
+        self.data = {}
+        self.groups = {}  # group -> set of members
+        self._open(size)
+
+    def _open(self, size=0):
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(self.fd).st_size < _HEADER.size:
+                    os.ftruncate(self.fd, size)
+                self.mmap = mmap.mmap(self.fd, os.fstat(self.fd).st_size)
+                if self.mmap[:len(_MAGIC)] != _MAGIC:
+                    empty = msgpack.packb(({}, {}), use_bin_type=True)
+                    self.mmap[_HEADER.size:_HEADER.size + len(empty)] = empty
+                    _HEADER.pack_into(self.mmap, 0, _MAGIC, 0, len(empty))
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+        except Exception:
+            os.close(self.fd)
+            raise
+
+    def reopen(self):
+        """
+        Opens and maps the file again and drops the decoded snapshot.
+        """
+        self.close()
+        self.generation = None
+        self.data, self.groups = {}, {}
+        self._open()
+
+    def close(self):
+        if not self.mmap.closed:
+            self.mmap.close()
+            os.close(self.fd)
+
+    def load(self):
+        """
+        Decodes the snapshot if another process or thread changed it.
+        Caller must hold the file lock.
+        """
+        _, generation, length = _HEADER.unpack_from(self.mmap, 0)
+        if generation == self.generation:
+            return
+        data, groups = msgpack.unpackb(self.mmap[_HEADER.size:_HEADER.size + length], raw=False)
+        self.data = data
+        self.groups = {group: set(members) for group, members in groups.items()}
+        self.generation = generation
+
+    def store(self):
+        """
+        Writes the snapshot and advances the generation. Caller must
+        hold the exclusive file lock.
+        """
+        snapshot = msgpack.packb((self.data, {group: list(members) for group, members in self.groups.items()}),
+                                 use_bin_type=True)
+        if _HEADER.size + len(snapshot) > len(self.mmap):
+            self.generation = None  # drop the change
+            raise RejectedByBackend("shared memory SDL storage of {} bytes for {} is full".format(
+                len(self.mmap), self.path))
+        self.mmap[_HEADER.size:_HEADER.size + len(snapshot)] = snapshot
+        self.generation += 1
+        _HEADER.pack_into(self.mmap, 0, _MAGIC, self.generation, len(snapshot))
+
+
+class SharedMemoryStorage:
+    """
+    An SDL storage with the interface of ricsdl SyncStorage, kept in
+    memory-mapped files that several processes can open; see the module
+    documentation.
+
+    Parameters
+    ----------
+    path: string
+        The directory; a directory in /dev/shm stays in memory. It is
+        created if it does not exist.
+    size: int (optional, default is 8 MiB)
+        Size in bytes of the file of a new namespace; an existing file
+        keeps its size. Writes that would make the snapshot of a
+        namespace bigger raise RejectedByBackend.
+    """
+
+    supports_events = False
+
+    def __init__(self, path, size=8 * 1024 * 1024):
+        if size <= _HEADER.size:
+            raise ValueError("size must be more than {} bytes".format(_HEADER.size))
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        self._path = path
+        self._size = size
+        self._lock = RLock()
+        self._namespaces = {}  # ns -> _Namespace
+        self._closed = False
+        _storages.add(self)
+
+    def _reopen(self):
+        """
+        Opens and maps the files again in a forked child, so that their
+        flocks exclude the parent and its siblings, and drops the lock
+        and the snapshots copied from the parent.
+        """
+        self._lock = RLock()
+        if not self._closed:
+            for namespace in self._namespaces.values():
+                namespace.reopen()
+
+    def _namespace(self, ns, create):
+        """
+        Returns the namespace, opening its file; None if the file does
+        not exist and create is False. Caller must hold the lock.
+        """
+        if self._closed:
+            raise RejectedByBackend("shared memory SDL storage is closed")
+        namespace = self._namespaces.get(ns)
+        if namespace is None:
+            path = os.path.join(self._path, "ns-" + quote(ns, safe=""))
+            if not create and not os.path.exists(path):
+                return None
+            namespace = self._namespaces[ns] = _Namespace(path, self._size)
+        return namespace
+
+    def _read(self, ns, func):
+        with self._lock:
+            namespace = self._namespace(ns, False)
+            if namespace is None:
+                return func({}, {})
+            fcntl.flock(namespace.fd, fcntl.LOCK_SH)
+            try:
+                namespace.load()
+                return func(namespace.data, namespace.groups)
+            finally:
+                fcntl.flock(namespace.fd, fcntl.LOCK_UN)
+
+    def _write(self, ns, func):
+        """
+        Runs func(data, groups) on the namespace and stores its snapshot
+        if it returns a true changed flag; returns its result.
+        """
+        with self._lock:
+            namespace = self._namespace(ns, True)
+            fcntl.flock(namespace.fd, fcntl.LOCK_EX)
+            try:
+                namespace.load()
+                changed, result = func(namespace.data, namespace.groups)
+                if changed:
+                    namespace.store()
+                return result
+            finally:
+                fcntl.flock(namespace.fd, fcntl.LOCK_UN)
+
+    def is_active(self):
+        return not self._closed
+
+    def close(self):
+        """
+        Unmaps the files; the data stays in the files.
+        """
+        with self._lock:
+            self._closed = True
+            for namespace in self._namespaces.values():
+                namespace.close()
+            self._namespaces.clear()
+
+    def set(self, ns, data_map):
+        def write(data, groups):
+            data.update(data_map)
+            return True, None
+        self._write(ns, write)
+
+    def set_if(self, ns, key, old_data, new_data):
+        def write(data, groups):
+            if data.get(key) != old_data:
+                return False, False
+            data[key] = new_data
+            return True, True
+        return self._write(ns, write)
+
+    def set_if_not_exists(self, ns, key, data):
+        def write(values, groups):
+            if key in values:
+                return False, False
+            values[key] = data
+            return True, True
+        return self._write(ns, write)
+
+    def get(self, ns, keys):
+        keys = {keys} if isinstance(keys, str) else keys
+        return self._read(ns, lambda data, groups: {key: data[key] for key in keys if key in data})
+
+    def find_keys(self, ns, key_pattern):
+        return self._read(ns, lambda data, groups: [key for key in data if fnmatch.fnmatchcase(key, key_pattern)])
+
+    def find_and_get(self, ns, key_pattern):
+        return self._read(ns, lambda data, groups: {key: value for key, value in data.items()
+                                                    if fnmatch.fnmatchcase(key, key_pattern)})
+
+    def remove(self, ns, keys):
+        keys = {keys} if isinstance(keys, str) else keys
+
+        def write(data, groups):
+            removed = [data.pop(key) for key in keys if key in data]
+            return bool(removed), None
+        self._write(ns, write)
+
+    def remove_if(self, ns, key, data):
+        def write(values, groups):
+            if key not in values or values[key] != data:
+                return False, False
+            del values[key]
+            return True, True
+        return self._write(ns, write)
+
+    def remove_all(self, ns):
+        def write(data, groups):
+            changed = bool(data or groups)
+            data.clear()
+            groups.clear()
+            return changed, None
+        self._write(ns, write)
+
+    def add_member(self, ns, group, members):
+        members = {members} if isinstance(members, bytes) else members
+
+        def write(data, groups):
+            group_members = groups.setdefault(group, set())
+            size = len(group_members)
+            group_members.update(members)
+            return len(group_members) != size, None
+        self._write(ns, write)
+
+    def remove_member(self, ns, group, members):
+        members = {members} if isinstance(members, bytes) else members
+
+        def write(data, groups):
+            group_members = groups.get(group)
+            if not group_members:
+                return False, None
+            size = len(group_members)
+            group_members.difference_update(members)
+            if not group_members:
+                del groups[group]
+            return len(group_members) != size, None
+        self._write(ns, write)
+
+    def remove_group(self, ns, group):
+        self._write(ns, lambda data, groups: (groups.pop(group, None) is not None, None))
+
+    def get_members(self, ns, group):
+        return self._read(ns, lambda data, groups: set(groups.get(group, ())))
+
+    def is_member(self, ns, group, member):
+        return self._read(ns, lambda data, groups: member in groups.get(group, ()))
+
+    def group_size(self, ns, group):
+        return self._read(ns, lambda data, groups: len(groups.get(group, ())))
+
+    def _unsupported(self, *args, **kwargs):
+        raise RejectedByBackend("channels and events are not supported by SharedMemoryStorage")
+
+    set_and_publish = set_if_and_publish = set_if_not_exists_and_publish = _unsupported
+    remove_and_publish = remove_if_and_publish = remove_all_and_publish = _unsupported
+    subscribe_channel = unsubscribe_channel = start_event_listener = handle_events = _unsupported
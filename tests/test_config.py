@@ -21,6 +21,7 @@ from contextlib import suppress
 from mdclogpy import Logger
 
 from ricxappframe.util.constants import Constants
+from ricxappframe.xapp_config import ConfigWatcher, config_diff, config_get
 from ricxappframe.xapp_frame import RMRXapp
 
 mdc_logger = Logger(name=__name__)
@@ -120,6 +121,108 @@ def test_custom_config_handler(monkeypatch):
     rmr_xapp_config = None
 
 
+def test_config_watcher_debounce():
+    init_config_file()
+    seen = []
+    watcher = ConfigWatcher(config_file_path, seen.append, debounce=0.2)
+
+    # a burst of writes is delivered as a single change with the final content
+    for n in range(5):
+        with open(config_file_path, "w") as file:
+            file.write('{ "n" : %d }' % n)
+        time.sleep(0.01)
+    time.sleep(1)
+    assert seen == [{"n": 4}]
+
+    # a file that does not parse is not delivered
+    with open(config_file_path, "w") as file:
+        file.write('{ "n" : ')
+    time.sleep(1)
+    assert seen == [{"n": 4}]
+
+    watcher.stop()
+
+
+def test_config_watcher_stop_from_handler():
+    init_config_file()
+    stopped = []
+
+    def handler(data):
+        watcher.stop()
+        stopped.append(data)
+
+    watcher = ConfigWatcher(config_file_path, handler, debounce=0.05)
+    write_config_file()
+    for _ in range(50):
+        if stopped:
+            break
+        time.sleep(0.1)
+    assert stopped == [{"change": "value2"}]
+    watcher._thread.join(5)
+    assert not watcher._thread.is_alive()
+
+
+def test_config_diff():
+    old = {"a": {"b": 1, "c": [1, 2]}, "d": 1, "e": {"f": 1}}
+    new = {"a": {"b": 2, "c": [1, 2]}, "e": 1, "g": True}
+    assert config_diff(old, new) == ["/a/b", "/d", "/e", "/g"]
+    assert config_diff(old, old) == []
+    assert config_diff(None, new) == [""]
+    assert config_diff({"a": 1}, {"a": True}) == ["/a"]
+
+    assert config_get(old, "/a/c/1") == 2
+    assert config_get(old, "/a/x") is None
+    assert config_get({"a/b": 3}, "/a~1b") == 3
+    assert config_get(old, "") is old
+
+
+def test_config_section_handlers(monkeypatch):
+    with open(config_file_path, "w") as file:
+        file.write('{ "controls" : { "threshold" : 1, "mode" : "a" }, "other" : 1 }')
+    monkeypatch.setenv(Constants.CONFIG_FILE_ENV, config_file_path)
+
+    def default_handler(self, summary, sbuf):
+        pass
+
+    whole = []
+    thresholds = []
+
+    def config_handler(self, json):
+        whole.append(json)
+
+    def threshold_handler(self, value):
+        thresholds.append(value)
+
+    global rmr_xapp_config
+    rmr_xapp_config = RMRXapp(default_handler, config_handler=config_handler, rmr_port=4567, use_fake_sdl=True)
+    rmr_xapp_config.register_config_handler("/controls/threshold", threshold_handler)
+    assert thresholds == [1]  # called at registration
+    rmr_xapp_config.run(thread=True, rmr_timeout=1)  # in unit tests we need to thread here or else execution is not returned!
+
+    # another section changes
+    with open(config_file_path, "w") as file:
+        file.write('{ "controls" : { "threshold" : 1, "mode" : "b" }, "other" : 1 }')
+    time.sleep(1)
+    assert thresholds == [1]
+    assert rmr_xapp_config.config["controls"]["mode"] == "b"
+
+    # the watched section changes
+    with open(config_file_path, "w") as file:
+        file.write('{ "controls" : { "threshold" : 2, "mode" : "b" }, "other" : 1 }')
+    time.sleep(1)
+    assert thresholds == [1, 2]
+
+    # nothing changes
+    with open(config_file_path, "w") as file:
+        file.write('{ "other" : 1, "controls" : { "mode" : "b", "threshold" : 2 } }')
+    time.sleep(1)
+    assert thresholds == [1, 2]
+    assert len(whole) == 3  # startup and two changes
+
+    rmr_xapp_config.stop()
+    rmr_xapp_config = None
+
+
 def teardown_module():
     """
     this is like a "finally"; the name of this function is pytest magic
@@ -14,7 +14,12 @@
 #  * limitations under the License.
 #  *
 #  *******************************************************************************
-from ricxappframe.e2ap.asn1 import IndicationMsg, SubResponseMsg, SubRequestMsg, ControlRequestMsg, ActionDefinition, SubsequentAction, ARRAY, c_uint8
+from threading import local
+import pytest
+from ricxappframe.e2ap.aper import encode_indication, encode_subscription_response
+from ricxappframe.e2ap.exceptions import DecodeFailed
+from ricxappframe.e2ap.peek import IndicationIds, peek_indication
+from ricxappframe.e2ap.asn1 import IndicationMsg, LazyIndicationMsg, SubResponseMsg, SubRequestMsg, ControlRequestMsg, ControlRequestTemplate, SubRequestTemplate, ActionDefinition, SubsequentAction, ARRAY, c_uint8
 
 """
 fake class for c-type Structure
@@ -119,6 +124,8 @@ def test_call_decode_indication_expect_success(monkeypatch):
 
     monkeypatch.setattr("ricxappframe.e2ap.asn1._asn1_decode_indicationMsg",
                         mock_decode_return_valid_indication)
+    monkeypatch.setattr("ricxappframe.e2ap.asn1._asn1_free_indicationMsg",
+                        lambda indication: None)
 
     indication = IndicationMsg()
     try:
@@ -136,6 +143,76 @@ def test_call_decode_indication_expect_success(monkeypatch):
         assert False
 
 
+def test_call_decode_many_indications_expect_freed(monkeypatch):
+    '''
+    test the batch decode of IndicationMsg class and that every decoded message is freed
+    '''
+    freed = []
+
+    def mock_decode(payload: bytes, size: int):
+        if payload == b"bad":
+            return None
+        assert size == len(payload)
+        indication_msg = indication_msg_type()
+        indication_msg.contents.request_id = payload[0]
+        indication_msg.contents.indication_message = ARRAY(c_uint8, 2)(*payload[:2])
+        indication_msg.contents.indication_message_length = 2
+        return indication_msg
+
+    monkeypatch.setattr("ricxappframe.e2ap.asn1._asn1_decode_indicationMsg", mock_decode)
+    monkeypatch.setattr("ricxappframe.e2ap.asn1._asn1_free_indicationMsg", freed.append)
+
+    indications = IndicationMsg.decode_many([b"\x05\x06\x07", b"bad", b"\x08\x09"])
+    assert len(indications) == 3
+    assert indications[0].request_id == 5
+    assert indications[0].indication_message == b"\x05\x06"
+    assert indications[1] is None
+    assert indications[2].request_id == 8
+    assert len(freed) == 2
+
+    # only decode failures become None
+    with pytest.raises(TypeError):
+        IndicationMsg.decode_many([b"\x05\x06", None])
+
+
+def test_call_decode_lazy_indication_expect_copy_on_access(monkeypatch):
+    '''
+    test the decode of LazyIndicationMsg class and that it frees the message once
+    '''
+    freed = []
+
+    def mock_decode(payload: bytes, size: int):
+        indication_msg = indication_msg_type()
+        indication_msg.contents.request_id = 3
+        indication_msg.contents.function_id = 4
+        indication_msg.contents.indication_header = ARRAY(c_uint8, 2)(1, 2)
+        indication_msg.contents.indication_header_length = 2
+        indication_msg.contents.indication_message = ARRAY(c_uint8, 3)(5, 6, 7)
+        indication_msg.contents.indication_message_length = 3
+        indication_msg.contents.call_process_id_length = 0
+        return indication_msg
+
+    monkeypatch.setattr("ricxappframe.e2ap.asn1._asn1_decode_indicationMsg", mock_decode)
+    monkeypatch.setattr("ricxappframe.e2ap.asn1._asn1_free_indicationMsg", freed.append)
+
+    with LazyIndicationMsg() as indication:
+        indication.decode(b"\x00")
+        assert indication.request_id == 3
+        assert indication.function_id == 4
+        assert indication.indication_message_view().tobytes() == b"\x05\x06\x07"
+        assert indication.indication_header == b"\x01\x02"
+        assert indication.call_process_id == b""
+        assert not freed
+    assert len(freed) == 1
+
+    # octet strings accessed before freeing remain available
+    assert indication.indication_header == b"\x01\x02"
+    with pytest.raises(Exception):
+        indication.indication_message
+    indication.free()
+    assert len(freed) == 1
+
+
 def test_call_decode_sub_response_and_clib_return_none_expect_error_raise(monkeypatch):
     '''
     test the decode of SubResponseMsg class with invalid payload from rmr
@@ -338,3 +415,368 @@ def test_call_encode_control_request_expect_success(monkeypatch):
         control_request.encode(1, 1, 1, bytes([1]), bytes([1]), bytes([1]), 1)
     except BaseException:
         assert False
+
+
+def test_call_encode_control_request_returns_encoded_bytes_only(monkeypatch):
+    '''
+    test that the encoders return only the encoded bytes and grow the output buffer
+    '''
+    monkeypatch.setattr("ricxappframe.e2ap.asn1._encode_buffers", local())
+    sizes = []
+
+    def mock_encode_large_message(buf, buf_size, *args):
+        sizes.append(buf_size.value)
+        if buf_size.value < 1500:
+            return -1
+        for idx in range(1500):
+            buf[idx] = idx % 256
+        return 1500
+
+    monkeypatch.setattr("ricxappframe.e2ap.asn1._asn1_encode_controlReqMsg",
+                        mock_encode_large_message)
+
+    control_request = ControlRequestMsg()
+    size, payload = control_request.encode(1, 1, 1, bytearray([1]), bytes([1]), bytes(2000), 1)
+    assert size == 1500
+    assert payload == bytes(idx % 256 for idx in range(1500))
+    assert sizes == [1024, 2048]
+
+    # the grown buffer of this thread is reused
+    sizes.clear()
+    control_request.encode(1, 1, 1, bytes([1]), bytes([1]), bytes([1]), 1)
+    assert sizes == [2048]
+
+    def mock_encode_short_message(buf, buf_size, *args):
+        buf[0] = 7
+        return 1
+
+    monkeypatch.setattr("ricxappframe.e2ap.asn1._asn1_encode_subReqMsg",
+                        mock_encode_short_message)
+    assert SubRequestMsg().encode(1, 1, 1, bytes([1]), [1], [1], [], []) == (1, bytes([7]))
+
+
+def _ric_indication_payload(requestor_id, instance_id, function_id, action_id):
+    '''
+    returns an APER-encoded E2AP RICindication with the given IDs
+    '''
+    return encode_indication(requestor_id, instance_id, function_id, action_id, 1, 0,
+                             bytes([0x0a, 0x0b]), bytes([0x0c, 0x0d, 0x0e]))
+
+
+def test_peek_indication_expect_ids():
+    '''
+    test reading the routing IDs of a RICindication without decoding it
+    '''
+    payload = _ric_indication_payload(1001, 7, 300, 2)
+    assert peek_indication(payload) == IndicationIds(1001, 7, 300, 2)
+
+    # not a RICindication
+    assert peek_indication(bytes([0x20]) + payload[1:]) is None
+    assert peek_indication(payload[:1] + bytes([0x08]) + payload[2:]) is None
+
+
+def test_peek_indication_expect_decode_failed_on_truncation():
+    '''
+    test that lengths running past the end of the payload raise the error of IndicationMsg.decode
+    '''
+    payload = _ric_indication_payload(1001, 7, 300, 2)
+    for size in range(len(payload)):
+        with pytest.raises(DecodeFailed):
+            peek_indication(payload[:size])
+
+    # the RIC request ID IE, whose length is at octet 10, longer than the payload or shorter than its IDs
+    for length in [0x60, 2]:
+        with pytest.raises(DecodeFailed):
+            peek_indication(payload[:10] + bytes([length]) + payload[11:])
+
+
+def test_peek_indication_matches_decode():
+    '''
+    test that the peeked IDs equal those of the full decoder
+    '''
+    for ids in [(1, 0, 0, 0), (65535, 65535, 4095, 255), (1001, 7, 300, 2)]:
+        payload = _ric_indication_payload(*ids)
+        indication = IndicationMsg()
+        indication.decode(payload)
+        peeked = peek_indication(payload)
+        assert peeked.as_tuple() == (indication.request_id, indication.request_sequence_number,
+                                     indication.function_id, indication.action_id)
+        assert indication.indication_header == bytes([0x0a, 0x0b])
+
+
+def test_control_request_template_expect_patched_payloads(monkeypatch):
+    '''
+    test that ControlRequestTemplate patches the payload and falls back to a full encode
+    '''
+    calls = []
+
+    def mock_encode(buf, buf_size, requestor_id, request_sequence_number, ran_function_id,
+                    call_process_id_buffer, call_process_id_buffer_count, call_header_buffer, call_header_buffer_count,
+                    call_message_buffer, call_message_buffer_count, control_ack_request):
+        # a simplified layout: sequence number, then each octet string after its length
+        payload = request_sequence_number.value.to_bytes(2, "big")
+        for octets in (call_process_id_buffer, call_header_buffer, call_message_buffer):
+            payload += bytes([len(octets)]) + bytes(octets)
+        calls.append(payload)
+        buf[:len(payload)] = payload
+        return len(payload)
+
+    monkeypatch.setattr("ricxappframe.e2ap.asn1._asn1_encode_controlReqMsg", mock_encode)
+
+    template = ControlRequestTemplate(1, 5, 2, b"\x01\x02", b"\x03", b"\x04\x05\x06", 1)
+    assert template.patchable_fields == ["call_process_id", "control_message", "request_sequence_number"]
+    assert template.encode() == (11, calls[0])
+    calls.clear()
+
+    assert template.encode(request_sequence_number=0x1234, control_message=b"\x07\x08\x09") == \
+        (11, b"\x12\x34\x02\x01\x02\x01\x03\x03\x07\x08\x09")
+    assert not calls
+
+    # a control message of another length is encoded in full
+    assert template.encode(control_message=b"\x07") == (9, b"\x00\x05\x02\x01\x02\x01\x03\x01\x07")
+    assert len(calls) == 1
+
+
+def test_sub_request_template_expect_full_encode_if_not_patchable(monkeypatch):
+    '''
+    test that a field whose octets cannot be located is always encoded in full
+    '''
+    calls = []
+
+    def mock_encode(buf, buf_size, requestor_id, request_sequence_number, *args):
+        # the length of this encoding depends on the sequence number
+        payload = bytes([1] * (1 + request_sequence_number.value % 3))
+        calls.append(payload)
+        buf[:len(payload)] = payload
+        return len(payload)
+
+    monkeypatch.setattr("ricxappframe.e2ap.asn1._asn1_encode_subReqMsg", mock_encode)
+
+    template = SubRequestTemplate(1, 1, 1, bytes([1]), [1], [1], [], [])
+    assert template.patchable_fields == []
+    assert template.encode(request_sequence_number=2) == (3, bytes([1, 1, 1]))
+    assert len(calls) == 3
+
+
+class _fake_kpm_spec:
+    '''
+    fake E2SM-KPM decoder returning values in the layout of asn1tools
+    '''
+    def __init__(self, headers, messages):
+        self.headers = headers
+        self.messages = messages
+
+    def decode(self, type_name, data):
+        if type_name == "E2SM-KPM-IndicationHeader":
+            return {"indicationHeader-formats": ("indicationHeader-Format1", {"colletStartTime": self.headers[data]})}
+        return {"indicationMessage-formats": self.messages[data]}
+
+
+class _kpm_indication:
+    def __init__(self, header, message):
+        self.indication_header = header
+        self.indication_message = message
+
+
+def test_kpm_decode_many_expect_columns():
+    '''
+    test that E2SM-KPM formats 1 and 3 are decoded into concatenated columns
+    '''
+    np = pytest.importorskip("numpy")
+    from ricxappframe.e2ap.kpm import KpmDecoder
+
+    info = [{"measType": ("measName", "DRB.UEThpDl"), "labelInfoList": [{"measLabel": {"noLabel": "true"}}]},
+            {"measType": ("measID", 7), "labelInfoList": [{"measLabel": {"noLabel": "true"}}]}]
+    format1 = ("indicationMessage-Format1", {
+        "measData": [{"measRecord": [("integer", 10), ("real", 0.5)]},
+                     {"measRecord": [("noValue", None), ("integer", 2)]}],
+        "measInfoList": info,
+        "granulPeriod": 500})
+    format3 = ("indicationMessage-Format3", {"ueMeasReportList": [
+        {"ueID": ("gNB-UEID", {"amf-UE-NGAP-ID": 42}),
+         "measReport": {"measData": [{"measRecord": [("integer", 5)]}],
+                        "measInfoList": [{"measType": ("measName", "RRU.PrbUsedDl"), "labelInfoList": []}]}}]})
+    spec = _fake_kpm_spec({b"h1": bytes([0, 0, 0, 100]), b"h3": bytes([0, 0, 0, 200, 0x80, 0, 0, 0])},
+                          {b"m1": format1, b"m3": format3})
+    decoder = KpmDecoder(spec)
+
+    columns = decoder.decode(_kpm_indication(b"h1", b"m1"), cell_id=3)
+    assert len(columns) == 2
+    assert columns.timestamp.tolist() == [100.0, 100.5]
+    assert columns.ue_id.tolist() == [-1, -1]
+    assert columns.cell_id.tolist() == [3, 3]
+    assert np.isnan(columns.measurements["DRB.UEThpDl"][1])
+    assert columns.measurements[7].tolist() == [0.5, 2.0]
+
+    columns = decoder.decode_many([_kpm_indication(b"h1", b"m1"), _kpm_indication(b"h3", b"m3")], [3, 4])
+    assert len(columns) == 3
+    assert columns.timestamp.tolist() == [100.0, 100.5, 200.5]
+    assert columns.ue_id.tolist() == [-1, -1, 42]
+    assert columns.cell_id.tolist() == [3, 3, 4]
+    assert np.isnan(columns.measurements["RRU.PrbUsedDl"][:2]).all()
+    assert columns.measurements["RRU.PrbUsedDl"][2] == 5
+    assert np.isnan(columns.measurements[7][2])
+
+    with pytest.raises(ValueError):
+        decoder.decode_many([_kpm_indication(b"h1", b"m1")], [1, 2])
+
+
+def test_kpm_decode_many_expect_column_per_label():
+    '''
+    test that a measurement reported for several labels gets a column per label, keeping the rows aligned
+    '''
+    np = pytest.importorskip("numpy")
+    from ricxappframe.e2ap.kpm import KpmDecoder
+
+    def info(fiveqi):
+        return {"measType": ("measName", "DRB.UEThpDl"), "labelInfoList": [{"measLabel": {"fiveQI": fiveqi}}]}
+
+    labelled = ("indicationMessage-Format1", {
+        "measData": [{"measRecord": [("integer", 10), ("integer", 20), ("integer", 1)]},
+                     {"measRecord": [("integer", 11), ("integer", 21), ("integer", 2)]}],
+        "measInfoList": [info(1), info(9), {"measType": ("measID", 7)}]})
+    duplicated = ("indicationMessage-Format1", {
+        "measData": [{"measRecord": [("integer", 10), ("integer", 20)]}],
+        "measInfoList": [info(1), info(1)]})
+    spec = _fake_kpm_spec({b"h": bytes([0, 0, 0, 100])}, {b"labelled": labelled, b"duplicated": duplicated})
+    decoder = KpmDecoder(spec)
+
+    columns = decoder.decode(_kpm_indication(b"h", b"labelled"))
+    assert len(columns) == 2
+    assert columns.measurements[("DRB.UEThpDl", (("fiveQI", 1),))].tolist() == [10, 11]
+    assert columns.measurements[("DRB.UEThpDl", (("fiveQI", 9),))].tolist() == [20, 21]
+    assert columns.measurements[7].tolist() == [1, 2]
+    assert all(len(column) == 2 for column in columns.measurements.values())
+    assert not np.isnan(columns.timestamp).any()
+
+    with pytest.raises(Exception):
+        decoder.decode(_kpm_indication(b"h", b"duplicated"))
+
+
+def test_encode_subscription_response_matches_decode():
+    '''
+    test that the encoded subscription response is read back by the full decoder
+    '''
+    sub_response = SubResponseMsg()
+    sub_response.decode(encode_subscription_response(1001, 7, 300, [1, 2, 3]))
+    assert sub_response.request_id == 1001
+    assert sub_response.request_sequence_number == 7
+    assert sub_response.function_id == 300
+    assert sub_response.action_admitted_list.count == 3
+    assert list(sub_response.action_admitted_list.request_id[:3]) == [1, 2, 3]
+
+
+def test_codec_benchmark_expect_measurements(capsys):
+    '''
+    test that the codec benchmark measures and fuzzes the codecs; the memory-growth gate runs in benchmark-ci
+    '''
+    from ricxappframe.e2ap import benchmark
+
+    result = benchmark.measure(benchmark.cases()["IndicationMsg.decode message=512"], 200)
+    assert result["ops_per_sec"] > 0
+    assert result["bytes_per_op"] >= 0
+    assert result["rss_growth_per_op"] == result["rss_growth"] / 200
+
+    stats = benchmark.fuzz(100, seed=1)
+    assert stats["decoded"] + stats["rejected"] == 200
+
+    benchmark.main(["--iterations", "10", "--fuzz", "10", "--max-rss-growth-per-op", "1000000"])
+    assert "ControlRequestMsg.encode message=4096" in capsys.readouterr().out
+
+
+class _list_transport:
+    def __init__(self):
+        self.messages = []
+
+    def send(self, meid, mtype, payload):
+        self.messages.append((meid, mtype, payload))
+        return True
+
+    def acked(self):
+        return len(self.messages) // 2
+
+    def close(self):
+        return
+
+
+def test_e2_node_simulator_expect_rate_and_round_robin():
+    '''
+    test that the E2 node simulator spreads decodable indications over MEIDs at the target rate
+    '''
+    from ricxappframe.e2ap.simulator import E2NodeSimulator, RIC_INDICATION, parse_profile
+
+    transport = _list_transport()
+    simulator = E2NodeSimulator(transport, [b"gnb_1", b"gnb_2", b"gnb_3"], request_id=9, function_ids=[1, 2],
+                                message_size=64, variants=4)
+    reports = []
+    stats = simulator.run(parse_profile("0.2:500,0.2:0"), report=reports.append, report_interval=0.1)
+    assert 80 <= stats["sent"] <= 101
+    assert stats["failed"] == 0
+    assert stats["acked"] == stats["sent"] // 2
+    assert stats["elapsed"] >= 0.4
+    assert reports
+
+    meids = [meid for (meid, _, _) in transport.messages]
+    assert meids[:6] == [b"gnb_1", b"gnb_2", b"gnb_3"] * 2
+    assert all(mtype == RIC_INDICATION for (_, mtype, _) in transport.messages)
+    peeked = [peek_indication(payload) for (_, _, payload) in transport.messages]
+    assert {ids.function_id for ids in peeked} == {1, 2}
+    assert all(ids.request_id == 9 for ids in peeked)
+
+
+def test_e2_node_simulator_expect_profile_errors(capsys):
+    '''
+    test that invalid rate profiles are reported as usage errors
+    '''
+    from ricxappframe.e2ap.simulator import main, parse_profile
+
+    assert parse_profile("1.5:100,2:0") == [(1.5, 100.0), (2.0, 0.0)]
+    for profile in ["10", "10:1000:5", "ten:1000", "-1:1000", "10:-5", "inf:10", "10:1000,"]:
+        with pytest.raises(ValueError):
+            parse_profile(profile)
+        with pytest.raises(SystemExit) as exit_info:
+            main(["--profile", profile])
+        assert exit_info.value.code == 2
+        assert "--profile" in capsys.readouterr().err
+
+
+def test_e2_node_simulator_in_process_transport(monkeypatch):
+    '''
+    test that the in-process transport feeds the receive queue of an xapp
+    '''
+    from ricxappframe.rmr import rmr
+    from ricxappframe.rmr.rmr_mocks import rmr_mocks
+    from ricxappframe.xapp_rmr import MeidFairQueue, RcvQueue
+    from ricxappframe.e2ap.simulator import E2NodeSimulator, InProcessTransport
+
+    rmr_mocks.patch_rmr(monkeypatch)
+
+    class loop:
+        mrc = None
+        rcv_queue = RcvQueue()
+
+        def inject(self, msg, sbuf):
+            self.rcv_queue.put((msg, sbuf))
+
+    class xapp:
+        _rmr_loops = [loop()]
+
+    transport = InProcessTransport(xapp)
+    simulator = E2NodeSimulator(transport, [b"gnb_1"])
+    for _ in range(3):
+        simulator.send_one()
+    assert simulator.stats()["acked"] == 0
+    summary, _ = xapp._rmr_loops[0].rcv_queue.get()
+    assert summary[rmr.RMR_MS_MEID] == b"gnb_1"
+    assert peek_indication(summary[rmr.RMR_MS_PAYLOAD]).function_id == 1
+    assert simulator.stats()["acked"] == 1
+
+    # messages a MeidFairQueue drops are not acknowledged
+    xapp._rmr_loops[0].rcv_queue = MeidFairQueue(maxsize_per_meid=2)
+    transport = InProcessTransport(xapp)
+    simulator = E2NodeSimulator(transport, [b"gnb_1"])
+    for _ in range(3):
+        simulator.send_one()
+    assert simulator.stats()["acked"] == 0
+    xapp._rmr_loops[0].rcv_queue.get()
+    assert simulator.stats()["acked"] == 1
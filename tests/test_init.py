@@ -17,7 +17,7 @@
 import time
 import pytest
 from ricxappframe.rmr.exceptions import InitFailed
-from ricxappframe.xapp_frame import Xapp, RMRXapp
+from ricxappframe.xapp_frame import Xapp, RMRXapp, SCHEDULING_ROUND_ROBIN
 
 
 def test_bad_init():
@@ -49,6 +49,18 @@ def test_init_general_xapp():
     gen_xapp.stop()  # pytest will never return without this.
 
 
+def test_general_xapp_wait_messages():
+    def entry(self):
+        # nothing is routed to this xapp, so the wait times out
+        start = time.time()
+        assert self.wait_messages(timeout=0.5, max_batch=10) == []
+        assert time.time() - start >= 0.5
+
+    gen_xapp = Xapp(entrypoint=entry, rmr_wait_for_ready=False, use_fake_sdl=True)
+    gen_xapp.run()
+    gen_xapp.stop()
+
+
 def test_init_rmr_xapp():
     def post_init(self):
         print("hey")
@@ -61,3 +73,15 @@ def test_init_rmr_xapp():
     rmr_xapp.run(thread=True)
     time.sleep(1)
     rmr_xapp.stop()
+
+
+def test_init_rmr_xapp_round_robin():
+    def foo(self, _summary, _sbuf):
+        pass
+
+    rmr_xapp = RMRXapp(foo, rmr_wait_for_ready=False, use_fake_sdl=True)
+    with pytest.raises(ValueError):
+        rmr_xapp.run(thread=True, scheduling="bogus")
+    rmr_xapp.run(thread=True, scheduling=SCHEDULING_ROUND_ROBIN, meid_weights={b"gnb1": 2})
+    time.sleep(1)
+    rmr_xapp.stop()
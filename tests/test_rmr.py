@@ -333,6 +333,35 @@ def test_rcv_all():
     assert (time.time() - start_rcv_sec > 1)  # test duration should be longer than 1 second
 
 
+def test_rmr_message_ownership():
+    """
+    test that RmrMessage frees its buffer exactly once, and the buffer accounting
+    """
+    helpers.sbuf_tracker.enable(leak_age=0)
+    try:
+        sbuf = rmr.rmr_alloc_msg(MRC_SEND, SIZE)
+        helpers.sbuf_tracker.track(sbuf)
+        assert helpers.sbuf_tracker.stats()["outstanding"] == 1
+        with helpers.RmrMessage(rmr.message_summary(sbuf), sbuf) as msg:
+            assert msg.owns(sbuf)
+        assert not msg.owns(sbuf)
+        msg.free()  # no-op, already freed
+        assert helpers.sbuf_tracker.stats()["outstanding"] == 0
+
+        # a kept buffer outlives the with block and shows up as a leak until freed
+        sbuf = rmr.rmr_alloc_msg(MRC_SEND, SIZE)
+        helpers.sbuf_tracker.track(sbuf)
+        with helpers.RmrMessage(None, sbuf) as msg:
+            kept = msg.keep()
+        time.sleep(0.01)
+        assert helpers.sbuf_tracker.stats() == {"enabled": True, "outstanding": 1, "leaked": 1}
+        assert "test_rmr_message_ownership" in helpers.sbuf_tracker.leaks()[0][1]
+        helpers.rmr_free_msg_tracked(kept)
+        assert helpers.sbuf_tracker.stats()["outstanding"] == 0
+    finally:
+        helpers.sbuf_tracker.enable(False)
+
+
 def test_bad_buffer():
     """test that we get a proper exception when the buffer has a null pointer"""
     with pytest.raises(exceptions.BadBufferAllocation):
@@ -17,8 +17,24 @@
 """
 tests data functions
 """
+import asyncio
+import fnmatch
+import json
+import multiprocessing
+import os
+import threading
 import time
-from ricxappframe.xapp_sdl import SDLWrapper
+import types
+import msgpack
+import pytest
+import redis
+import ricsdl
+from google.protobuf import wrappers_pb2
+from ricsdl.exceptions import BackendError, NotConnected, RejectedByBackend
+from ricxappframe.xapp_sdl import (AsyncSDLWrapper, FramedSerializer, JsonSerializer, MsgpackSerializer,
+                                   ProtobufSerializer, RawSerializer, SDLCache, SDLCircuitBreaker, SDLCircuitOpen,
+                                   SDLStats, SDLUpdateConflict, SDLWrapper)
+from ricxappframe.xapp_sdl_shm import SharedMemoryStorage
 
 
 NS = "testns"
@@ -235,3 +251,593 @@ def test_sdl_remove_and_publish_with_start_event_listener():
     assert CALLED is True
 
     sdl.unsubscribe_channel(NS, "channel")
+
+
+def test_sdl_cache():
+    """
+    test the read-through cache: hits, ttl, invalidation by local writes and by events
+    """
+    sdl = SDLWrapper(use_fake_sdl=True)
+    other = sdl._sdl  # writes of another client, which bypass the cache
+    sdl.set(NS, "c.df1", "old")
+    sdl.enable_cache(NS, ttl=0.2, channels=["cache"])
+
+    assert sdl.get(NS, "c.df1") == "old"
+    assert sdl.get(NS, "c.df1") == "old"
+    assert sdl.get(NS, "c.absent") is None
+    assert sdl.get(NS, "c.absent") is None
+    assert sdl.cache_stats()["hits"] == 2
+    assert sdl.cache_stats()["namespaces"][NS] == {"hits": 2, "misses": 2}
+
+    # another client writes: the cached value is served until it expires
+    other.set(NS, {"c.df1": msgpack.packb("newer", use_bin_type=True)})
+    assert sdl.get(NS, "c.df1") == "old"
+    time.sleep(0.25)
+    assert sdl.get(NS, "c.df1") == "newer"
+
+    # a local write invalidates the key
+    sdl.set(NS, "c.df1", "local")
+    assert sdl.get(NS, "c.df1") == "local"
+
+    # a published write of another client invalidates the namespace
+    called = []
+    sdl.subscribe_channel(NS, lambda channel, events: called.append(events), "cache")
+    other.set_and_publish(NS, {"cache": "c.df1"}, {"c.df1": msgpack.packb("published", use_bin_type=True)})
+    assert sdl.get(NS, "c.df1") == "local"
+    sdl.handle_events()
+    assert sdl.get(NS, "c.df1") == "published"
+    assert called == [["c.df1"]]
+
+    # the client callback can go while the cache keeps listening
+    sdl.unsubscribe_channel(NS, "cache")
+    other.set_and_publish(NS, {"cache": "c.df1"}, {"c.df1": msgpack.packb("again", use_bin_type=True)})
+    sdl.handle_events()
+    assert sdl.get(NS, "c.df1") == "again"
+    assert len(called) == 1
+
+    # disabled namespaces are read from SDL
+    sdl.disable_cache(NS)
+    other.set(NS, {"c.df1": msgpack.packb("direct", use_bin_type=True)})
+    assert sdl.get(NS, "c.df1") == "direct"
+
+
+def test_sdl_cache_lru():
+    """
+    test that the cache evicts the least recently used keys and ignores stale reads
+    """
+    cache = SDLCache(maxsize=2)
+    cache.enable(NS)
+    cache.store(NS, "a", b"1", cache.generation())
+    cache.store(NS, "b", b"2", cache.generation())
+    assert cache.lookup(NS, "a") == (True, b"1")
+    cache.store(NS, "c", b"3", cache.generation())
+    assert cache.lookup(NS, "b") == (False, None)
+    assert cache.lookup(NS, "a") == (True, b"1")
+    assert cache.stats()["evictions"] == 1
+
+    generation = cache.generation()
+    cache.invalidate(NS, ["a"])
+    cache.store(NS, "a", b"stale", generation)
+    assert cache.lookup(NS, "a") == (False, None)
+    with pytest.raises(ValueError):
+        SDLCache(maxsize=0)
+
+
+def test_sdl_write_behind():
+    """
+    test that set is buffered, coalesced and flushed as one multi-key set
+    """
+    sdl = SDLWrapper(use_fake_sdl=True)
+    writes = []
+    backend_set = sdl._sdl.set
+    sdl._sdl.set = lambda ns, data: (writes.append((ns, dict(data))), backend_set(ns, data))
+    sdl.enable_write_behind(max_pending=3, max_delay=10)
+
+    sdl.set(NS, "wb.df1", "v1")
+    sdl.set(NS, "wb.df1", "v2")
+    sdl.set(NS, "wb.df2", "v3")
+    assert writes == []
+    # reads see the buffered values
+    assert sdl.get(NS, "wb.df1") == "v2"
+    sdl.flush()
+    assert writes == [(NS, {"wb.df1": msgpack.packb("v2", use_bin_type=True),
+                            "wb.df2": msgpack.packb("v3", use_bin_type=True)})]
+    assert sdl.write_behind_stats()["coalesced"] == 1
+
+    # size triggers a flush in the background
+    for n in range(3):
+        sdl.set(NS, "wb.size{}".format(n), n)
+    deadline = time.time() + 5
+    while len(writes) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(writes[1][1]) == 3
+
+    # another write flushes first, so the order is kept
+    sdl.set(NS, "wb.df3", "buffered")
+    sdl.delete(NS, "wb.df3")
+    assert sdl.get(NS, "wb.df3") is None
+    sdl.disable_write_behind()
+
+
+def test_sdl_write_behind_timer_and_errors():
+    """
+    test that buffered writes are flushed after max_delay and that errors reach the callback
+    """
+    sdl = SDLWrapper(use_fake_sdl=True)
+    errors = []
+    sdl.enable_write_behind(max_delay=0.05, on_error=lambda ns, data, error: errors.append((ns, list(data))))
+    sdl.set(NS, "wb.timer", "v")
+    time.sleep(0.3)
+    assert sdl._sdl.get(NS, {"wb.timer"}) == {"wb.timer": msgpack.packb("v", use_bin_type=True)}
+
+    def failing_set(ns, data):
+        raise Exception("backend down")
+
+    sdl._sdl.set = failing_set
+    sdl.set(NS, "wb.lost", "v")
+    sdl.flush(NS)
+    assert errors == [(NS, ["wb.lost"])]
+    assert sdl.write_behind_stats()["errors"] == 1
+    sdl.disable_write_behind()
+
+
+def test_sdl_bulk():
+    """
+    test that get_many, set_many and delete_many make one backend call each
+    """
+    sdl = SDLWrapper(use_fake_sdl=True)
+    calls = []
+    for name in ("get", "set", "remove"):
+        def counted(*args, _call=getattr(sdl._sdl, name), _name=name):
+            calls.append(_name)
+            return _call(*args)
+        setattr(sdl._sdl, name, counted)
+
+    contexts = {"ue.{}".format(n): {"id": n} for n in range(100)}
+    sdl.set_many(NS, contexts)
+    keys = ["ue.5", "ue.none", "ue.3", "ue.5"]
+    assert sdl.get_many(NS, keys) == [{"id": 5}, None, {"id": 3}, {"id": 5}]
+    assert sdl.get_many(NS, keys, usemsgpack=False)[2] == msgpack.packb({"id": 3}, use_bin_type=True)
+    sdl.delete_many(NS, ["ue.3", "ue.5"])
+    assert sdl.get_many(NS, ["ue.3", "ue.4"]) == [None, {"id": 4}]
+    assert calls == ["set", "get", "get", "remove", "get"]
+
+    # cached and buffered values are answered locally
+    sdl.enable_cache(NS)
+    sdl.get_many(NS, ["ue.6", "ue.7"])
+    sdl.enable_write_behind(max_delay=10)
+    sdl.set_many(NS, {"ue.8": "new"})
+    del calls[:]
+    assert sdl.get_many(NS, ["ue.6", "ue.8", "ue.7"]) == [{"id": 6}, "new", {"id": 7}]
+    assert calls == []
+    sdl.disable_write_behind()
+    assert sdl.get(NS, "ue.8") == "new"
+
+
+def test_async_sdl():
+    """
+    test that AsyncSDLWrapper runs SDLWrapper calls on its pool, with timeouts and cancellation
+    """
+    asdl = AsyncSDLWrapper(use_fake_sdl=True, max_workers=1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocking_get(*args):
+        started.set()
+        release.wait(5)
+        return "slow"
+
+    async def scenario():
+        await asdl.set(NS, "async.k1", {"v": 1})
+        await asdl.set_many(NS, {"async.k2": 2, "async.k3": 3})
+        assert await asdl.get(NS, "async.k1") == {"v": 1}
+        assert await asyncio.gather(*(asdl.get(NS, "async.k{}".format(n)) for n in (1, 2, 3))) == [{"v": 1}, 2, 3]
+        assert await asdl.find_and_get(NS, "async.k") == {"async.k1": {"v": 1}, "async.k2": 2, "async.k3": 3}
+        await asdl.delete_many(NS, ["async.k2", "async.k3"])
+        assert await asdl.get_many(NS, ["async.k1", "async.k2"]) == [{"v": 1}, None]
+
+        # the only thread is busy, so the queued call times out and never runs
+        original_get = asdl.sdl.get
+        asdl.sdl.get = blocking_get
+        slow = asyncio.ensure_future(asdl.get(NS, "async.k1"))
+        for _ in range(500):
+            if started.is_set():
+                break
+            await asyncio.sleep(0.01)
+        with pytest.raises(asyncio.TimeoutError):
+            await asdl.delete(NS, "async.k1", timeout=0.05)
+        release.set()
+        assert await slow == "slow"
+        asdl.sdl.get = original_get
+        assert await asdl.get(NS, "async.k1") == {"v": 1}
+
+    asyncio.run(scenario())
+    asdl.close()
+
+
+def test_sdl_serializers():
+    """
+    test serializers set per namespace and per call, and the framed format
+    """
+    sdl = SDLWrapper(use_fake_sdl=True)
+    ns = "serializers"
+    sdl.set(ns, "legacy", {"a": 1})
+
+    sdl.set_serializer(ns, FramedSerializer(JsonSerializer(), compress_threshold=100))
+    history = {"kpi": list(range(200))}
+    sdl.set(ns, "history", history)
+    sdl.set(ns, "small", [1, 2])
+    stored = sdl.get_many(ns, ["history", "small"], usemsgpack=False)
+    assert stored[0][:3] == b"\xc1\x02\x01" and len(stored[0]) < len(json.dumps(history))
+    assert stored[1] == b"\xc1\x02\x00[1,2]"
+    assert sdl.get(ns, "history") == history
+    assert sdl.find_and_get(ns, "small") == {"small": [1, 2]}
+    # values without a header are read with the wrapped serializer, other framed formats by their header
+    sdl.set(ns, "json", {"a": 1}, serializer=JsonSerializer())
+    assert sdl.get(ns, "json") == {"a": 1}
+    sdl.set(ns, "framed-msgpack", {"a": 1}, serializer=FramedSerializer(MsgpackSerializer()))
+    assert sdl.get(ns, "framed-msgpack") == {"a": 1}
+    assert sdl.get(ns, "legacy", serializer=MsgpackSerializer()) == {"a": 1}
+
+    sdl.add_member(ns, "group", "m1")
+    assert sdl.is_member(ns, "group", "m1")
+    assert sdl.get_members(ns, "group") == {"m1"}
+
+    protobuf = ProtobufSerializer(wrappers_pb2.StringValue)
+    sdl.set(ns, "proto", wrappers_pb2.StringValue(value="cell"), serializer=protobuf)
+    assert sdl.get(ns, "proto", serializer=protobuf).value == "cell"
+    sdl.set(ns, "raw", b"\x00\x01", usemsgpack=False)
+    assert sdl.get(ns, "raw", serializer=RawSerializer()) == b"\x00\x01"
+
+    sdl.set_serializer(ns, None)
+    assert sdl.get(ns, "legacy") == {"a": 1}
+    with pytest.raises(ValueError):
+        FramedSerializer(FramedSerializer(RawSerializer()))
+
+
+def test_sdl_iter_find_and_get():
+    """
+    test that iter_find_and_get fetches values in pages, with and without Redis SCAN
+    """
+    sdl = SDLWrapper(use_fake_sdl=True)
+    ns = "iterns"
+    sdl.set_many(ns, {"ue.{:03d}".format(n): n for n in range(25)})
+    sdl.set(ns, "cell.1", "other")
+    pages = []
+    backend_get = sdl._sdl.get
+    sdl._sdl.get = lambda ns, keys: (pages.append(len(keys)), backend_get(ns, keys))[1]
+
+    assert dict(sdl.iter_find_and_get(ns, "ue.", page_size=10)) == {"ue.{:03d}".format(n): n for n in range(25)}
+    assert pages == [10, 10, 5]
+
+    with pytest.raises(ValueError):
+        next(sdl.iter_find_and_get(ns, "", page_size=0))
+
+
+def test_sdl_iter_find_and_get_redis(monkeypatch):
+    """
+    test that iter_find_and_get scans the keys of the ricsdl Redis backend with instrumented SCAN calls
+    """
+    monkeypatch.setenv("DBAAS_SERVICE_HOST", "localhost")
+    monkeypatch.setenv("DBAAS_SERVICE_PORT", "6379")
+    sdl = SDLWrapper()
+    ns = "iterns"
+    # the Redis client of ricsdl, with its commands answered from a dictionary
+    client = sdl._sdl.get_backend().clients[0].redis_client
+    store = {"{iterns},ue.1": b"1", "{iterns},ue.2": b"2", "{iterns},cell.1": b"3"}
+    scans = []
+
+    def scan(cursor, match, count):
+        scans.append((cursor, match, count))
+        keys = [key.encode() for key in sorted(store) if fnmatch.fnmatch(key, match)]
+        return (0, keys[1:]) if cursor else (1, keys[:1])
+
+    client.scan = scan
+    client.mget = lambda keys: [store.get(key) for key in keys]
+    assert dict(sdl.iter_find_and_get(ns, "ue.", page_size=10, usemsgpack=False)) == {"ue.1": b"1", "ue.2": b"2"}
+    assert scans == [(0, "{iterns},ue.*", 10), (1, "{iterns},ue.*", 10)]
+    assert sdl.stats()["namespaces"][ns]["scan"]["calls"] == 2
+
+    # Redis errors are SDL errors, counted by the circuit breaker
+    def unreachable(cursor, match, count):
+        raise redis.exceptions.ConnectionError("unreachable")
+
+    client.scan = unreachable
+    sdl.enable_circuit_breaker(failure_threshold=1, probe_interval=60)
+    with pytest.raises(NotConnected):
+        list(sdl.iter_find_and_get(ns, "ue."))
+    assert sdl.stats()["circuit_breaker"]["state"] == SDLCircuitBreaker.OPEN
+    sdl.disable_circuit_breaker()
+
+    # unknown ricsdl versions list the keys at once
+    monkeypatch.setattr(ricsdl, "__version__", "3.9.0")
+    sdl = SDLWrapper()
+    client = sdl._sdl.get_backend().clients[0].redis_client
+    client.keys = lambda pattern: [key.encode() for key in store if fnmatch.fnmatch(key, pattern)]
+    client.mget = lambda keys: [store.get(key) for key in keys]
+    assert dict(sdl.iter_find_and_get(ns, "cell.", usemsgpack=False)) == {"cell.1": b"3"}
+
+
+def test_sdl_stats():
+    """
+    test that SDL calls are recorded per namespace and operation, with slow calls and errors
+    """
+    sdl = SDLWrapper(use_fake_sdl=True, stats=SDLStats(slow_threshold=0.01, slow_calls=2, key_prefix_length=4))
+    ns = "statsns"
+    sdl.set(ns, "ue.0001", b"12345", usemsgpack=False)
+    assert sdl.get(ns, "ue.0001", usemsgpack=False) == b"12345"
+    sdl.set_and_publish(ns, "channel", "event", "ue.0002", b"67", usemsgpack=False)
+    sdl.get(ns, "ue.none")
+
+    stats = sdl.stats()
+    operations = stats["namespaces"][ns]
+    assert operations["set"]["calls"] == 1 and operations["set"]["bytes_written"] == 5
+    assert operations["get"]["calls"] == 2 and operations["get"]["bytes_read"] == 5
+    assert operations["set_and_publish"]["bytes_written"] == 2
+    assert sum(operations["get"]["histogram"]) == 2
+    assert len(operations["get"]["histogram"]) == len(stats["buckets"]) + 1
+    assert stats["slow_calls"] == [] and stats["cache"] == {} and stats["write_behind"] == {}
+
+    backend_get = sdl._sdl._storage.get
+
+    def slow_get(ns, keys):
+        time.sleep(0.02)
+        return backend_get(ns, keys)
+
+    def failing_get(ns, keys):
+        time.sleep(0.02)
+        raise Exception("backend down")
+
+    sdl._sdl._storage.get = slow_get
+    sdl.get(ns, "ue.0001", usemsgpack=False)
+    sdl._sdl._storage.get = failing_get
+    with pytest.raises(Exception):
+        sdl.get(ns, "ue.0002")
+    stats = sdl.stats()
+    assert stats["namespaces"][ns]["get"]["errors"] == 1
+    slow_calls = [(call["key_prefix"], call["error"]) for call in stats["slow_calls"]]
+    assert slow_calls == [("ue.0", None), ("ue.0", "Exception")]
+    assert stats["namespaces"][ns]["get"]["max_seconds"] >= 0.02
+    sdl._stats.reset()
+    assert sdl.stats()["namespaces"] == {}
+
+
+def test_sdl_circuit_breaker():
+    """
+    test that the circuit breaker opens after failures, serves the cache, and closes when SDL is healthy
+    """
+    sdl = SDLWrapper(use_fake_sdl=True)
+    ns = "breakerns"
+    sdl.set(ns, "cached", "value")
+    sdl.enable_cache(ns, ttl=0.01)
+    assert sdl.get(ns, "cached") == "value"
+    sdl.enable_circuit_breaker(failure_threshold=2, probe_interval=0.05)
+
+    storage = sdl._sdl._storage
+    backend_get, backend_set = storage.get, storage.set
+    healthy = threading.Event()
+
+    def failing(*args):
+        raise BackendError("redis down")
+
+    storage.get = storage.set = failing
+    storage.is_active = healthy.is_set
+    for _ in range(2):
+        with pytest.raises(BackendError):
+            sdl.get(ns, "other")
+    assert sdl.stats()["circuit_breaker"]["state"] == SDLCircuitBreaker.OPEN
+
+    # fails fast, except for reads the cache can answer, even when expired
+    time.sleep(0.02)
+    with pytest.raises(SDLCircuitOpen):
+        sdl.set(ns, "other", 1)
+    with pytest.raises(SDLCircuitOpen):
+        sdl.get_many(ns, ["cached", "other"])
+    assert sdl.get(ns, "cached") == "value"
+    assert sdl.stats()["circuit_breaker"]["rejected"] == 3
+
+    storage.get, storage.set = backend_get, backend_set
+    healthy.set()
+    for _ in range(100):
+        if sdl.stats()["circuit_breaker"]["state"] == SDLCircuitBreaker.CLOSED:
+            break
+        time.sleep(0.01)
+    sdl.set(ns, "other", 1)
+    assert sdl.get(ns, "other") == 1
+    assert sdl.stats()["circuit_breaker"]["opened"] == 1
+    sdl.disable_circuit_breaker()
+    assert sdl.stats()["circuit_breaker"] == {}
+
+
+def _shm_increment(path, times, sdl=None):
+    sdl = sdl or SDLWrapper(storage=SharedMemoryStorage(path))
+    for _ in range(times):
+        while True:
+            value = sdl.get("shm", "counter")
+            if sdl.set_if("shm", "counter", value, value + 1):
+                break
+
+
+def test_sdl_shared_memory(tmp_path):
+    """
+    test the shared memory storage, within a process and across processes
+    """
+    path = str(tmp_path / "sdl")
+    sdl = SDLWrapper(storage=SharedMemoryStorage(path, size=64 * 1024))
+    sdl.set("shm", "counter", 0)
+    assert sdl.set_if_not_exists("shm", "counter", 5) is False
+    sdl.set_many("shm", {"ue.1": {"cell": 1}, "ue.2": {"cell": 2}})
+    assert sdl.find_and_get("shm", "ue.") == {"ue.1": {"cell": 1}, "ue.2": {"cell": 2}}
+    sdl.delete("shm", "ue.2")
+    assert sdl.find_keys("shm", "ue.") == ["ue.1"]
+    assert sdl.delete_if("shm", "ue.1", {"cell": 1})
+    sdl.add_member("shm", "cells", 1)
+    sdl.add_member("shm", "cells", 2)
+    sdl.remove_member("shm", "cells", 1)
+    assert sdl.get_members("shm", "cells") == {2} and sdl.is_member("shm", "cells", 2)
+    assert sdl.group_size("shm", "cells") == 1
+    assert sdl.healthcheck()
+    with pytest.raises(RejectedByBackend):
+        sdl.set_and_publish("shm", "channel", "event", "key", 1)
+    with pytest.raises(RejectedByBackend):
+        sdl.enable_cache("shm", channels=["channel"])
+    assert sdl.cache_stats() == {}
+
+    # other processes see and change the same data, and set_if is atomic across them
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_shm_increment, args=(path, 50)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+    assert sdl.get("shm", "counter") == 200
+
+    # workers forked with the storage already open still exclude each other
+    workers = [context.Process(target=_shm_increment, args=(path, 500, sdl)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+    assert sdl.get("shm", "counter") == 2200
+    sdl.set("shm", "counter", 200)
+    assert SDLWrapper(storage=SharedMemoryStorage(path)).get_members("shm", "cells") == {2}
+
+    with pytest.raises(RejectedByBackend):
+        sdl.set("shm", "big", bytes(64 * 1024), usemsgpack=False)
+    assert sdl.get("shm", "big") is None and sdl.get("shm", "counter") == 200
+
+
+def test_sdl_shared_memory_namespaces(tmp_path, monkeypatch):
+    """
+    test that a write encodes only its namespace, and that readers decode only the namespaces that changed
+    """
+    from ricxappframe import xapp_sdl_shm
+
+    path = str(tmp_path / "sdl")
+    writer = SharedMemoryStorage(path)
+    writer.set("a", {"k": b"1"})
+    writer.set("b", {"k": b"2"})
+    reader = SharedMemoryStorage(path)
+    assert reader.get("a", "k") == {"k": b"1"} and reader.get("b", "k") == {"k": b"2"}
+
+    packed, unpacked = [], []
+    monkeypatch.setattr(xapp_sdl_shm, "msgpack", types.SimpleNamespace(
+        packb=lambda obj, **kwargs: (packed.append(obj), msgpack.packb(obj, **kwargs))[1],
+        unpackb=lambda data, **kwargs: (unpacked.append(data), msgpack.unpackb(data, **kwargs))[1]))
+    writer.set("a", {"k": b"3"})
+    assert packed == [({"k": b"3"}, {})]
+    assert reader.get("b", "k") == {"k": b"2"} and unpacked == []
+    assert reader.get("a", "k") == {"k": b"3"} and len(unpacked) == 1
+    assert reader.find_keys("c", "*") == []
+    assert sorted(os.listdir(path)) == ["ns-a", "ns-b"]
+
+
+def test_sdl_update():
+    """
+    test compare-and-set updates, conflicts and batched increments
+    """
+    sdl = SDLWrapper(use_fake_sdl=True)
+    ns = "updatens"
+    assert sdl.update(ns, "agg", lambda value: {"count": 1}) == {"count": 1}
+    assert sdl.update(ns, "agg", lambda value: {"count": value["count"] + 1}) == {"count": 2}
+
+    # another client writes between the read and the set_if: fn runs again on its value
+    calls = []
+
+    def concurrent_fn(value):
+        calls.append(value)
+        if len(calls) == 1:
+            sdl.set(ns, "agg", {"count": 10})
+        return {"count": value["count"] + 1}
+
+    assert sdl.update(ns, "agg", concurrent_fn, backoff=0) == {"count": 11}
+    assert calls == [{"count": 2}, {"count": 10}]
+
+    def always_conflicting(value):
+        sdl.set(ns, "agg", {"count": time.monotonic()})
+        return "lost"
+
+    with pytest.raises(SDLUpdateConflict):
+        sdl.update(ns, "agg", always_conflicting, max_retries=2, backoff=0)
+    assert sdl.update_stats()[ns] == {"updated": 3, "conflicts": 4, "failed": 1, "conflict_rate": 4 / 7}
+
+    # counters are read with one call per attempt; cached values save the read
+    sdl.set(ns, "c2", 5)
+    gets = []
+    backend_get = sdl._sdl._storage.get
+    sdl._sdl._storage.get = lambda ns, keys: (gets.append(sorted(keys)), backend_get(ns, keys))[1]
+    assert sdl.increment(ns, {"c1": 1, "c2": 2}) == {"c1": 1, "c2": 7}
+    assert gets == [["c1", "c2"]]
+    sdl.enable_cache(ns)
+    sdl.get(ns, "c1")
+    del gets[:]
+    assert sdl.increment(ns, {"c1": 3}) == {"c1": 4}
+    assert gets == [] and sdl.get(ns, "c1") == 4
+
+    # an unchanged value from a stale cache is not taken as stored
+    sdl.set(ns, "max", 5)
+    sdl.get(ns, "max")
+    sdl._sdl.set(ns, {"max": msgpack.packb(7, use_bin_type=True)})
+    assert sdl.update(ns, "max", lambda value: max(value, 5), backoff=0) == 7
+    assert sdl.get(ns, "max") == 7
+
+
+def test_sdl_index():
+    """
+    test that secondary indexes follow every write, and that query bulk-gets the members
+    """
+    sdl = SDLWrapper(use_fake_sdl=True)
+    ns = "uens"
+    sdl.set(ns, "ue.0", {"cell": "A"})
+    sdl.add_index(ns, "cell", "cell")
+    sdl.rebuild_index(ns, "cell")
+    sdl.set_many(ns, {"ue.1": {"cell": "A"}, "ue.2": {"cell": "B"}, "ue.3": {"cell": 1}})
+    assert sdl.query(ns, "cell", "A") == {"ue.0": {"cell": "A"}, "ue.1": {"cell": "A"}}
+    assert sdl.query(ns, "cell", 1) == {"ue.3": {"cell": 1}}
+    assert sdl.query(ns, "cell", "1") == {}
+
+    # moving a key between index values, deleting and updating
+    sdl.set(ns, "ue.1", {"cell": "B"})
+    assert sdl.get_members(ns + ".idx", 'cell:"A"', usemsgpack=False) == {b"ue.0"}
+    assert list(sdl.query(ns, "cell", "B")) == ["ue.1", "ue.2"]
+    sdl.delete(ns, "ue.2")
+    sdl.delete_many(ns, ["ue.3"])
+    assert sdl.query(ns, "cell", "B") == {"ue.1": {"cell": "B"}}
+    assert sdl.group_size(ns + ".idx", "cell:1") == 0
+    sdl.update(ns, "ue.0", lambda value: {"cell": "C"})
+    assert sdl.query(ns, "cell", "A") == {} and list(sdl.query(ns, "cell", "C")) == ["ue.0"]
+
+    # conditional and publishing writes maintain the index once they succeed
+    assert not sdl.set_if(ns, "ue.0", {"cell": "X"}, {"cell": "E"})
+    assert sdl.set_if(ns, "ue.0", {"cell": "C"}, {"cell": "D"})
+    assert sdl.query(ns, "cell", "C") == {} and list(sdl.query(ns, "cell", "D")) == ["ue.0"]
+    assert sdl.query(ns, "cell", "E") == {}
+    assert sdl.set_if_not_exists(ns, "ue.4", {"cell": "D"})
+    sdl.set_and_publish(ns, "channel", "event", "ue.5", {"cell": "D"})
+    sdl.handle_events()
+    assert list(sdl.query(ns, "cell", "D")) == ["ue.0", "ue.4", "ue.5"]
+    assert sdl.set_if_and_publish(ns, "channel", "event", "ue.5", {"cell": "D"}, {"cell": "F"})
+    sdl.handle_events()
+    assert sdl.set_if_not_exists_and_publish(ns, "channel", "event", "ue.6", {"cell": "F"})
+    sdl.handle_events()
+    assert list(sdl.query(ns, "cell", "F")) == ["ue.5", "ue.6"]
+    assert sdl.delete_if(ns, "ue.4", {"cell": "D"})
+    sdl.remove_and_publish(ns, "channel", "event", "ue.0")
+    sdl.handle_events()
+    assert sdl.group_size(ns + ".idx", 'cell:"D"') == 0
+    assert sdl.remove_if_and_publish(ns, "channel", "event", "ue.6", {"cell": "F"})
+    sdl.handle_events()
+    assert sdl.get_members(ns + ".idx", 'cell:"F"', usemsgpack=False) == {b"ue.5"}
+    sdl.remove_all_and_publish(ns, "channel", "event")
+    sdl.handle_events()
+    assert sdl.group_size(ns + ".idx", 'cell:"F"') == 0 and sdl.group_size(ns + ".idx", 'cell:"B"') == 0
+
+    # writes by other clients that do not maintain the index are left out of the results
+    sdl.set(ns, "ue.7", {"cell": "G"})
+    sdl._sdl.set(ns, {"ue.7": msgpack.packb({"cell": "H"}, use_bin_type=True)})
+    assert sdl.query(ns, "cell", "G") == {}
+    sdl.remove_index(ns, "cell")
+    with pytest.raises(KeyError):
+        sdl.query(ns, "cell", "G")
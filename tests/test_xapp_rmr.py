@@ -0,0 +1,137 @@
+# ==================================================================================
+#       Copyright (c) 2026 The O-RAN Software Community contributors
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#          http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+# ==================================================================================
+import queue
+import time
+from threading import Thread
+import pytest
+
+from ricxappframe.rmr import rmr
+from ricxappframe.rmr.rmr_mocks import rmr_mocks
+from ricxappframe.xapp_rmr import MeidFairQueue, RcvQueue
+
+
+def _item(meid, n):
+    """builds a (summary, sbuf) tuple as the receive loop does"""
+    sbuf = rmr_mocks.Rmr_mbuf_t()
+    sbuf.contents.meid = meid
+    return ({rmr.RMR_MS_MEID: meid, rmr.RMR_MS_PAYLOAD: n}, sbuf)
+
+
+def _drain(q):
+    result = []
+    while not q.empty():
+        (summary, _) = q.get_nowait()
+        result.append((summary[rmr.RMR_MS_MEID], summary[rmr.RMR_MS_PAYLOAD]))
+    return result
+
+
+def test_fair_queue_round_robin(monkeypatch):
+    rmr_mocks.patch_rmr(monkeypatch)
+    q = MeidFairQueue()
+    for n in range(4):
+        q.put(_item(b"noisy", n))
+    q.put(_item(b"quiet", 0))
+    q.put(_item(b"other", 0))
+    assert q.qsize() == 6
+
+    # the quiet nodes are served after a single message of the noisy node
+    assert _drain(q) == [(b"noisy", 0), (b"quiet", 0), (b"other", 0), (b"noisy", 1), (b"noisy", 2), (b"noisy", 3)]
+    assert q.stats() == {"queued": 0, "meids": 0, "dropped": 0, "dropped_overflow": 0}
+
+    with pytest.raises(queue.Empty):
+        q.get(block=True, timeout=0.01)
+
+
+def test_fair_queue_weights(monkeypatch):
+    rmr_mocks.patch_rmr(monkeypatch)
+    q = MeidFairQueue(weights={b"a": 2})
+    for n in range(3):
+        q.put(_item(b"a", n))
+        q.put(_item(b"b", n))
+    assert _drain(q) == [(b"a", 0), (b"a", 1), (b"b", 0), (b"a", 2), (b"b", 1), (b"b", 2)]
+
+    q.set_weight(b"b", 3)
+    with pytest.raises(ValueError):
+        q.set_weight(b"b", 0)
+
+
+def test_fair_queue_bounded(monkeypatch):
+    freed = []
+    monkeypatch.setattr("ricxappframe.rmr.rmr.rmr_free_msg", freed.append)
+    q = MeidFairQueue(maxsize_per_meid=2)
+    for n in range(5):
+        q.put(_item(b"noisy", n))
+    q.put(_item(b"quiet", 0))
+
+    # the oldest messages of the noisy node were dropped and freed
+    assert len(freed) == 3
+    assert q.stats() == {"queued": 3, "meids": 2, "dropped": 3, "dropped_overflow": 0}
+    assert _drain(q) == [(b"noisy", 3), (b"quiet", 0), (b"noisy", 4)]
+
+    with pytest.raises(ValueError):
+        MeidFairQueue(maxsize_per_meid=0)
+
+
+def test_fair_queue_total_bound(monkeypatch):
+    freed = []
+    monkeypatch.setattr("ricxappframe.rmr.rmr.rmr_free_msg", freed.append)
+    q = MeidFairQueue(maxsize=4)
+    for n in range(3):
+        q.put(_item(b"noisy", n))
+    q.put(_item(b"quiet", 0))
+
+    # a flood of distinct MEIDs takes from the longest sub-queue and keeps the queue at maxsize
+    for n in range(4):
+        q.put(_item("spoofed{}".format(n).encode(), 0))
+    assert len(freed) == 4
+    assert q.stats() == {"queued": 4, "meids": 4, "dropped": 4, "dropped_overflow": 4}
+    assert _drain(q) == [(b"noisy", 2), (b"spoofed1", 0), (b"spoofed2", 0), (b"spoofed3", 0)]
+
+    with pytest.raises(ValueError):
+        MeidFairQueue(maxsize=0)
+
+
+def test_rcv_queue_get_batch():
+    q = RcvQueue()
+    assert q.get_batch(10, timeout=0.01) == []
+
+    def put_later():
+        time.sleep(0.1)
+        for n in range(5):
+            q.put(n)
+
+    putter = Thread(target=put_later)
+    putter.start()
+    # blocks until the first item arrives, then takes what is there
+    batch = q.get_batch(3, timeout=5)
+    while len(batch) < 3:
+        batch += q.get_batch(3 - len(batch), timeout=5)
+    assert batch == [0, 1, 2]
+    putter.join()
+    assert q.get_batch(10, timeout=1) == [3, 4]
+    assert q.empty()
+
+
+def test_fair_queue_get_batch(monkeypatch):
+    rmr_mocks.patch_rmr(monkeypatch)
+    q = MeidFairQueue()
+    assert q.get_batch(10, timeout=0.01) == []
+    for n in range(3):
+        q.put(_item(b"a", n))
+    q.put(_item(b"b", 0))
+    batch = q.get_batch(3, timeout=0)
+    assert [(s[rmr.RMR_MS_MEID], s[rmr.RMR_MS_PAYLOAD]) for (s, _) in batch] == [(b"a", 0), (b"b", 0), (b"a", 1)]
+    assert q.qsize() == 1
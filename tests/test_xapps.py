@@ -20,12 +20,16 @@ from contextlib import suppress
 
 from ricxappframe.util.constants import Constants
 from ricxappframe.xapp_frame import _BaseXapp, Xapp, RMRXapp
+from ricxappframe.xapp_rmr import RMR_MS_CONTEXT
+from ricxappframe.rmr import helpers
 from ricxappframe.constants import sdl_namespaces
 
 import ricxappframe.entities.rnib.nb_identity_pb2 as pb_nb
 
 rmr_xapp = None
 rmr_xapp_health = None
+rmr_xapp_contexts = None
+rmr_xapp_auto_free = None
 gen_xapp = None
 rnib_xapp = None
 
@@ -112,6 +116,63 @@ def test_rmr_healthcheck():
     assert health_pay == b"OK\n"
 
 
+def test_rmr_multiple_contexts():
+    # messages of type 60002 are routed to the second listen port only
+    ctx_seen = None
+
+    def default_handler(self, summary, sbuf):
+        self.rmr_free(sbuf)
+
+    def ctx_handler(self, summary, sbuf):
+        nonlocal ctx_seen
+        ctx_seen = summary[RMR_MS_CONTEXT]
+        self.rmr_free(sbuf)
+
+    global rmr_xapp_contexts
+    rmr_xapp_contexts = RMRXapp(default_handler, rmr_port=[4570, 4571], use_fake_sdl=True)
+    rmr_xapp_contexts.register_callback(ctx_handler, 60002)
+    rmr_xapp_contexts.run(thread=True)  # in unit tests we need to thread here or else execution is not returned!
+
+    time.sleep(1)
+
+    assert rmr_xapp_contexts.healthcheck()
+    assert rmr_xapp_contexts.rmr_send(b"ctx", 60002, context=1)
+
+    time.sleep(1)
+
+    assert ctx_seen == 1
+
+
+def test_rmr_auto_free():
+    # the handler never frees; the framework does, except for the kept buffer
+    kept = []
+
+    def default_handler(self, summary, sbuf):
+        if not kept:
+            self.rmr_keep(sbuf)
+            kept.append(sbuf)
+
+    helpers.sbuf_tracker.enable()
+    try:
+        global rmr_xapp_auto_free
+        rmr_xapp_auto_free = RMRXapp(default_handler, rmr_port=4572, use_fake_sdl=True)
+        rmr_xapp_auto_free.run(thread=True, auto_free=True)  # in unit tests we need to thread here or else execution is not returned!
+
+        time.sleep(1)
+
+        for n in range(5):
+            assert rmr_xapp_auto_free.rmr_send(str(n).encode(), 60003)
+
+        time.sleep(1)
+
+        assert len(kept) == 1
+        assert rmr_xapp_auto_free.stats()["rmr"]["sbufs"]["outstanding"] == 1
+        rmr_xapp_auto_free.rmr_free(kept[0])
+        assert rmr_xapp_auto_free.stats()["rmr"]["sbufs"]["outstanding"] == 0
+    finally:
+        helpers.sbuf_tracker.enable(False)
+
+
 def test_rnib_get_list_nodeb(rnib_information):
     global rnib_xapp
     rnib_xapp = _BaseXapp(rmr_port=4777, rmr_wait_for_ready=False, use_fake_sdl=True)
@@ -295,3 +356,7 @@ def teardown_module():
         rmr_xapp.stop()
     with suppress(Exception):
         rmr_xapp_health.stop()
+    with suppress(Exception):
+        rmr_xapp_contexts.stop()
+    with suppress(Exception):
+        rmr_xapp_auto_free.stop()